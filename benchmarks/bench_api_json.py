@@ -0,0 +1,63 @@
+"""
+Encoding time for /api layout responses (what /api/generate-preview returns).
+
+Encodes {"success": true, "layout": ...} for multi-floor layouts with full-size SVGs
+(benchmarks/seed_data.py) three ways:
+
+    jsonable_encoder   FastAPI's default for a returned dict: jsonable_encoder, then json.dumps
+    typed              validate into LayoutResponse, encode with APIResponse (what the routes do)
+    orjson dict        APIResponse on the plain dict (the floor of what encoding can cost)
+
+    python benchmarks/bench_api_json.py --layouts 50 --floors 3 --runs 20
+"""
+import sys
+import os
+import json
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from benchmarks.seed_data import make_layout, make_floor
+from src.api import APIResponse, Layout, LayoutResponse
+
+def make_payloads(count, floors, seed):
+    rng = random.Random(seed)
+    payloads = []
+    for _ in range(count):
+        layout = make_layout(rng)
+        layout["floors"] = [make_floor(rng, i, rng.randint(8, 14)) for i in range(floors)]
+        payloads.append({"success": True, "layout": layout})
+    return payloads
+
+PATHS = {
+    "jsonable_encoder": lambda payload: JSONResponse(jsonable_encoder(payload)).body,
+    "typed": lambda payload: APIResponse(LayoutResponse(layout=Layout.model_validate(payload["layout"]))).body,
+    "orjson dict": lambda payload: APIResponse(payload).body,
+}
+
+def run(payloads, runs):
+    size = sum(len(json.dumps(payload)) for payload in payloads)
+    print(f"{len(payloads)} layouts, {size / len(payloads) / 1024:.1f} KB per response\n")
+    print(f"{'path':<18}{'us/response':>14}{'MB/s':>10}{'speedup':>10}")
+    baseline = None
+    for name, encode in PATHS.items():
+        started = time.perf_counter()
+        for _ in range(runs):
+            for payload in payloads:
+                encode(payload)
+        elapsed = (time.perf_counter() - started) / runs
+        baseline = baseline or elapsed
+        print(f"{name:<18}{elapsed / len(payloads) * 1e6:>14.0f}{size / elapsed / 1e6:>10.1f}{baseline / elapsed:>9.1f}x")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark /api JSON encoding")
+    parser.add_argument("--layouts", type=int, default=50)
+    parser.add_argument("--floors", type=int, default=3)
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    run(make_payloads(args.layouts, args.floors, args.seed), args.runs)
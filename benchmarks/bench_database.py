@@ -0,0 +1,265 @@
+"""
+Microbenchmarks for src/database.py and the FAISS user index.
+
+Seeds a temporary database (benchmarks/seed_data.py), adds probe users owning
+exactly --project-counts projects each, then times every database function in
+isolation: single-row lookups and writes, listings per project count,
+update_project_status with growing ID lists, archive purge, and FAISS load /
+add_user_to_faiss / search at each --index-sizes.
+
+    python benchmarks/bench_database.py                               # writes bench_database.json
+    python benchmarks/bench_database.py --project-counts 10,1000 --index-sizes 1000,100000
+    python benchmarks/bench_database.py --random-embeddings           # FAISS cost without the model
+    python benchmarks/bench_database.py --compare before.json         # p50 deltas against an earlier run
+
+add_user_to_faiss includes one encode() call; "embeddings.encode" is timed on its
+own so the FAISS share can be read off. --random-embeddings swaps the model for
+random vectors when only the index matters (or the model is not available).
+"""
+import sys
+import os
+import json
+import time
+import random
+import shutil
+import sqlite3
+import argparse
+import platform
+import tempfile
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from src.config import Config
+from benchmarks.seed_data import seed_database, make_layout
+
+class RandomEncoder:
+    """Stands in for the SentenceTransformer when only FAISS costs are being measured"""
+    def __init__(self, seed):
+        self.rng = np.random.default_rng(seed)
+
+    def encode(self, texts):
+        return self.rng.random((len(texts), Config.EMBEDDING_DIMENSION), dtype=np.float32)
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+STAT_KEYS = ("calls", "mean_ms", "p50_ms", "p95_ms", "min_ms")
+results = []
+
+def measure(group, name, fn, iterations, setup=None, **params):
+    """Time `fn(*setup(i))` `iterations` times; setup runs untimed (fresh rows, fresh IDs)"""
+    timings = []
+    for i in range(iterations):
+        args = setup(i) if setup else ()
+        started = time.perf_counter()
+        fn(*args)
+        timings.append(time.perf_counter() - started)
+    result = {
+        "group": group, "name": name, **params, "calls": iterations,
+        "mean_ms": sum(timings) / len(timings) * 1000,
+        "p50_ms": percentile(timings, 50) * 1000,
+        "p95_ms": percentile(timings, 95) * 1000,
+        "min_ms": min(timings) * 1000,
+    }
+    results.append(result)
+    label = " ".join(f"{k}={v}" for k, v in params.items())
+    print(f"  {name:<34} {label:<18} p50 {result['p50_ms']:9.3f} ms   p95 {result['p95_ms']:9.3f} ms   "
+          f"min {result['min_ms']:9.3f} ms")
+    return result
+
+def insert_projects(user_id, layouts, count, rng, archived_share=0.1, deleted_at="2024-01-01 00:00:00"):
+    """Bulk-insert `count` projects for a user; returns the IDs of the live (non-archived) ones"""
+    rows = []
+    for _ in range(count):
+        layout = rng.choice(layouts)
+        archived = rng.random() < archived_share
+        rows.append((
+            user_id, layout["title"], layout["description"], "https://res.cloudinary.invalid/stub/bench.svg",
+            layout["floors"][0]["svg"], json.dumps(layout["floors"]), layout["conversational_response"],
+            "DL-BENCH", int(archived), deleted_at if archived else None, int(rng.random() < 0.1)
+        ))
+    conn = sqlite3.connect(Config.DB_PATH)
+    first_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM projects").fetchone()[0] + 1
+    conn.executemany('''
+        INSERT INTO projects (user_id, title, description, thumbnail, svg_content, rooms, design_philosophy,
+                              design_code, is_deleted, deleted_at, is_favourite)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', rows)
+    conn.commit()
+    live = [row[0] for row in conn.execute(
+        "SELECT id FROM projects WHERE user_id = ? AND id >= ? AND is_deleted = 0", (user_id, first_id)
+    )]
+    conn.close()
+    return live
+
+def bench_sqlite(args, layouts, rng):
+    from src import database
+    print(f"\nSQLite ({args.users} users, {args.projects} seeded projects)")
+    n = args.iterations
+
+    user_ids = [rng.randint(1, args.users) for _ in range(n)]
+    measure("sqlite", "init_db (existing schema)", database.init_db, min(n, 50))
+    measure("sqlite", "get_user_by_id", database.get_user_by_id, n, lambda i: (user_ids[i],))
+    measure("sqlite", "get_user_by_email", database.get_user_by_email, n,
+            lambda i: (f"user{user_ids[i] - 1}@bench.dreamlayout.dev",))
+    measure("sqlite", "create_user", database.create_user, n,
+            lambda i: (f"New User {i}", f"new{i}@bench.dreamlayout.dev", "hash"))
+    measure("sqlite", "update_user", database.update_user, n,
+            lambda i: (user_ids[i], f"Renamed {i}", f"user{user_ids[i] - 1}@bench.dreamlayout.dev", "About", None, "Pune"))
+    created = [database.create_user(f"Doomed {i}", f"doomed{i}@bench.dreamlayout.dev", "hash") for i in range(n)]
+    keys = [database.get_user_by_id(user_id)[6] for user_id in created]
+    measure("sqlite", "delete_user_db", database.delete_user_db, n, lambda i: (keys[i],))
+
+    layout = layouts[0]
+    floors_json = json.dumps(layout["floors"])
+    project_args = (layout["title"], layout["description"], "https://res.cloudinary.invalid/stub/bench.svg",
+                    layout["floors"][0]["svg"], floors_json, layout["conversational_response"])
+    measure("sqlite", "add_user_project", database.add_user_project, n, lambda i: (user_ids[i],) + project_args)
+    max_id = sqlite3.connect(Config.DB_PATH).execute("SELECT MAX(id) FROM projects").fetchone()[0]
+    project_ids = [rng.randint(1, max_id) for _ in range(n)]
+    measure("sqlite", "get_project_by_id", database.get_project_by_id, n, lambda i: (project_ids[i],))
+    measure("sqlite", "update_project", database.update_project, n,
+            lambda i: (project_ids[i], f"Title {i}", "Updated description"))
+    measure("sqlite", "update_project_layout", database.update_project_layout, n,
+            lambda i: (project_ids[i], layout["floors"][0]["svg"], floors_json))
+    doomed = insert_projects(user_ids[0], layouts, n, rng, archived_share=0)
+    for action in ("delete", "restore", "permanent_delete"):
+        measure("sqlite", f"bulk {action} (1 project)", database.bulk_project_action, n,
+                lambda i: ([doomed[i]], action, user_ids[0]))
+    measure("sqlite", "get_public_projects", database.get_public_projects, n)
+
+    print("\nListings by project count")
+    probes = {}
+    for count in args.project_counts:
+        probe_id = database.create_user(f"Probe {count}", f"probe{count}@bench.dreamlayout.dev", "hash")
+        probes[count] = (probe_id, insert_projects(probe_id, layouts, count, rng))
+        iterations = max(5, min(n, n * 100 // count))
+        measure("sqlite", "get_user_projects (dashboard)", database.get_user_projects, iterations,
+                lambda i: (probe_id, 6), projects=count)
+        measure("sqlite", "get_user_projects (all)", database.get_user_projects, iterations,
+                lambda i: (probe_id, count), projects=count)
+        measure("sqlite", "get_favourite_projects", database.get_favourite_projects, iterations,
+                lambda i: (probe_id,), projects=count)
+        measure("sqlite", "get_user_archived_projects", database.get_user_archived_projects, iterations,
+                lambda i: (probe_id,), projects=count)
+
+    print("\nupdate_project_status by ID list size")
+    owner_id, owned = probes[max(probes)]
+    for size in args.id_list_sizes:
+        if size > len(owned):
+            print(f"  (skipping {size} IDs: the largest probe user owns {len(owned)} live projects)")
+            continue
+        ids = owned[:size]
+        measure("sqlite", "update_project_status", database.update_project_status, max(5, n // 4),
+                lambda i: (ids, "is_favourite", i % 2, owner_id), ids=size)
+        measure("sqlite", "bulk_project_action", database.bulk_project_action, max(5, n // 4),
+                lambda i: (ids, ("delete", "restore")[i % 2], owner_id), ids=size)
+
+    print("\npurge_old_archived_projects")
+    measure("sqlite", "purge_old_archived_projects", database.purge_old_archived_projects, n, expired=0)
+    for expired in args.purge_sizes:
+        def add_expired(i):
+            insert_projects(owner_id, layouts, expired, rng, archived_share=1.0)
+            return ()
+        measure("sqlite", "purge_old_archived_projects", database.purge_old_archived_projects, max(5, n // 10),
+                add_expired, expired=expired)
+
+def build_index(size, rng):
+    import faiss
+    from src import database
+    index = faiss.IndexFlatL2(Config.EMBEDDING_DIMENSION)
+    index.add(rng.random((size, Config.EMBEDDING_DIMENSION), dtype=np.float32))
+    database._replace_file(Config.FAISS_INDEX_PATH, lambda path: faiss.write_index(index, path))
+    database.save_user_mapping({i: i + 1 for i in range(size)})
+    return index
+
+def bench_faiss(args):
+    from src import database, embeddings
+    print(f"\nFAISS ({'random embeddings' if args.random_embeddings else 'embedding model: ' + Config.EMBEDDING_MODEL})")
+    rng = np.random.default_rng(args.seed)
+    if args.random_embeddings:
+        embeddings._model = RandomEncoder(args.seed)
+    embeddings.encode(["warm up"])
+    measure("embeddings", "embeddings.encode", lambda i: embeddings.encode([f"Encode {i} enc{i}@bench"]),
+            args.iterations, lambda i: (i,))
+
+    for size in args.index_sizes:
+        index = build_index(size, rng)
+        queries = rng.random((args.iterations, Config.EMBEDDING_DIMENSION), dtype=np.float32)
+        measure("faiss", "load_faiss_index", database.load_faiss_index, max(5, args.iterations // 10), vectors=size)
+        measure("faiss", "load_user_mapping", database.load_user_mapping, max(5, args.iterations // 10), vectors=size)
+        measure("faiss", "search (k=10)", lambda i: index.search(queries[i:i + 1], 10), args.iterations,
+                lambda i: (i,), vectors=size)
+        measure("faiss", "add_user_to_faiss", database.add_user_to_faiss, max(5, args.iterations // 10),
+                lambda i: (10**6 + i, f"faiss{size}-{i}@bench.dreamlayout.dev", f"Faiss User {i}"), vectors=size)
+
+def compare(previous_path):
+    with open(previous_path) as f:
+        previous = {
+            (r["group"], r["name"], json.dumps({k: v for k, v in r.items() if k not in STAT_KEYS}, sort_keys=True)): r
+            for r in json.load(f)["results"]
+        }
+    print(f"\nAgainst {previous_path} (p50):")
+    for r in results:
+        key = (r["group"], r["name"], json.dumps({k: v for k, v in r.items() if k not in STAT_KEYS}, sort_keys=True))
+        before = previous.get(key)
+        if before and before["p50_ms"]:
+            params = " ".join(f"{k}={v}" for k, v in r.items() if k not in STAT_KEYS + ("group", "name"))
+            print(f"  {r['name']:<34} {params:<18} {before['p50_ms']:9.3f} -> {r['p50_ms']:9.3f} ms "
+                  f"({r['p50_ms'] / before['p50_ms'] - 1:+.0%})")
+
+def main(args):
+    workdir = tempfile.mkdtemp(prefix="dreamlayout-bench-db-")
+    Config.FAISS_INDEX_PATH = os.path.join(workdir, "user_embeddings.index")
+    Config.USER_MAPPING_PATH = os.path.join(workdir, "user_id_mapping.pkl")
+    try:
+        started = time.perf_counter()
+        seed_database(os.path.join(workdir, "users.db"), args.users, args.projects, args.seed)
+        print(f"🌱 Seeded {args.users} users / {args.projects} projects in {time.perf_counter() - started:.1f}s")
+        rng = random.Random(args.seed)
+        layouts = [make_layout(rng) for _ in range(50)]
+        if not args.skip_sqlite:
+            bench_sqlite(args, layouts, rng)
+        if not args.skip_faiss:
+            bench_faiss(args)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "recorded_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "params": {k: v for k, v in vars(args).items() if k not in ("output", "compare")},
+        "machine": {"python": platform.python_version(), "platform": platform.platform(),
+                    "cpus": os.cpu_count(), "sqlite": sqlite3.sqlite_version},
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nWrote {len(results)} results to {args.output}")
+    if args.compare:
+        compare(args.compare)
+
+def int_list(value):
+    return [int(v) for v in value.split(",") if v]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Microbenchmarks for the database and FAISS layers")
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--projects", type=int, default=20000, help="background projects seeded before probing")
+    parser.add_argument("--project-counts", type=int_list, default=[10, 100, 1000, 5000],
+                        help="projects owned by each probe user for the listing benchmarks")
+    parser.add_argument("--id-list-sizes", type=int_list, default=[1, 10, 100, 1000],
+                        help="ID list sizes for update_project_status")
+    parser.add_argument("--purge-sizes", type=int_list, default=[10, 100], help="expired rows per purge call")
+    parser.add_argument("--index-sizes", type=int_list, default=[1000, 10000, 100000], help="FAISS vectors")
+    parser.add_argument("--iterations", type=int, default=200, help="calls per single-row benchmark")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--random-embeddings", action="store_true", help="random vectors instead of the model")
+    parser.add_argument("--skip-sqlite", action="store_true")
+    parser.add_argument("--skip-faiss", action="store_true")
+    parser.add_argument("--output", default="bench_database.json", help="JSON results file ('' to skip)")
+    parser.add_argument("--compare", default="", help="earlier results file to diff p50s against")
+    main(parser.parse_args())
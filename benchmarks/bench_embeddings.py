@@ -0,0 +1,83 @@
+"""
+Embedding throughput/latency: per-call encode vs the micro-batched, cached service.
+
+Simulates `--concurrency` request handlers each embedding one short profile
+string at a time (what add_user_to_faiss does) and reports embeddings/sec and
+per-call latency for:
+
+    per-call      model.encode([text]) for every request (the old behaviour)
+    micro-batch   src.embeddings.encode with the cache off
+    cached        src.embeddings.encode on repeated texts (cache hits)
+
+    python benchmarks/bench_embeddings.py --requests 2000 --concurrency 16
+    python benchmarks/bench_embeddings.py --backend onnx
+"""
+import sys
+import os
+import json
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.config import Config
+from src import embeddings
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+def run(name, fn, texts, concurrency):
+    def timed(text):
+        started = time.perf_counter()
+        fn(text)
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        latencies = list(pool.map(timed, texts))
+    wall = time.perf_counter() - started
+    return {
+        "mode": name,
+        "requests": len(texts),
+        "concurrency": concurrency,
+        "embeddings_per_sec": len(texts) / wall,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+    }
+
+def main(args):
+    Config.EMBEDDING_BACKEND = args.backend
+    Config.EMBEDDING_SERVER_ADDRESS = ""
+    model = embeddings.get_embedding_model()
+    texts = [f"User {i} user{i}@example.com" for i in range(args.requests)]
+    model.encode(texts[:8])  # warm up kernels before timing
+
+    results = [run("per-call", lambda text: model.encode([text]), texts, args.concurrency)]
+
+    Config.EMBEDDING_CACHE_SIZE = 0
+    results.append(run("micro-batch", lambda text: embeddings.encode([text]), texts, args.concurrency))
+
+    Config.EMBEDDING_CACHE_SIZE = args.requests
+    embeddings.embedding_cache.max_entries = args.requests
+    embeddings.encode(texts)
+    results.append(run("cached", lambda text: embeddings.encode([text]), texts, args.concurrency))
+
+    for result in results:
+        result["backend"] = args.backend
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    for r in results:
+        print(f"{r['mode']:<12} {r['embeddings_per_sec']:>9.0f} emb/s   p50 {r['p50_ms']:7.2f} ms   "
+              f"p95 {r['p95_ms']:7.2f} ms   p99 {r['p99_ms']:7.2f} ms")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the embedding service against per-call encode")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--backend", choices=["torch", "onnx"], default=Config.EMBEDDING_BACKEND)
+    parser.add_argument("--output", help="write results as JSON to this file")
+    main(parser.parse_args())
@@ -0,0 +1,113 @@
+"""
+Bytes on the wire and repeat-visit latency for pages and static assets.
+
+Boots the app against a small seeded database (as benchmarks/load_test.py does),
+logs in, and for each page simulates a browser:
+
+    cold      page + every /static asset it references, nothing cached
+    repeat    the same visit again with the browser cache from the cold visit
+
+"before" is the old behaviour (no compression, assets revalidated one by one).
+"after" uses the current server: br/gzip pages, ETag revalidation returning 304,
+and fingerprinted assets that are not requested again at all. Sizes are response
+body bytes as received (compressed), so a 304 counts as 0.
+
+    python benchmarks/bench_http_cache.py --runs 20
+"""
+import sys
+import os
+import re
+import time
+import shutil
+import asyncio
+import argparse
+import tempfile
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.seed_data import seed_database, SEED_PASSWORD
+from benchmarks.load_test import start_server, wait_until_ready
+
+PAGES = ["/", "/login", "/signup", "/dashboard", "/generate", "/my-projects", "/templates", "/profile"]
+ASSET_PATTERN = re.compile(r"/static/[^\"')\s?]+")
+
+async def visit(client, path, encoding, cache):
+    """One page view; `cache` maps URL -> validators/immutability from earlier visits (updated in place)"""
+    started = time.perf_counter()
+    wire = 0
+    headers = {"Accept-Encoding": encoding}
+    if encoding != "identity" and path in cache:
+        headers["If-None-Match"] = cache[path]["etag"]
+    res = await client.get(path, headers=headers)
+    wire += res.num_bytes_downloaded
+    if res.status_code == 200:
+        cache[path] = {"etag": res.headers.get("etag", ""), "assets": sorted(set(ASSET_PATTERN.findall(res.text)))}
+
+    for asset in cache[path]["assets"]:
+        cached = cache.get(asset)
+        if cached and cached["immutable"]:
+            continue
+        asset_headers = {"Accept-Encoding": encoding}
+        if cached and cached["etag"]:
+            asset_headers["If-None-Match"] = cached["etag"]
+        res = await client.get(asset, headers=asset_headers)
+        wire += res.num_bytes_downloaded
+        if res.status_code == 200:
+            cache[asset] = {
+                "etag": res.headers.get("etag", ""),
+                "immutable": encoding != "identity" and "immutable" in res.headers.get("cache-control", ""),
+            }
+    return time.perf_counter() - started, wire
+
+async def measure(base_url, runs):
+    async with httpx.AsyncClient(base_url=base_url, timeout=60) as client:
+        await client.post("/login", data={"email": "user0@bench.dreamlayout.dev", "password": SEED_PASSWORD})
+        rows = []
+        for path in PAGES:
+            row = {"page": path}
+            # "identity" stands in for the old server: no compression and plain asset URLs revalidated each time
+            for label, encoding in (("before", "identity"), ("after", "br, gzip")):
+                cold, repeat = [], []
+                for _ in range(runs):
+                    cache = {}
+                    cold.append(await visit(client, path, encoding, cache))
+                    repeat.append(await visit(client, path, encoding, cache))
+                row[label] = {
+                    "cold_kb": cold[0][1] / 1024, "repeat_kb": repeat[0][1] / 1024,
+                    "cold_ms": sorted(t for t, _ in cold)[runs // 2] * 1000,
+                    "repeat_ms": sorted(t for t, _ in repeat)[runs // 2] * 1000,
+                }
+            rows.append(row)
+        return rows
+
+def main(args):
+    workdir = tempfile.mkdtemp(prefix="dreamlayout-http-")
+    try:
+        seed_database(os.path.join(workdir, "users.db"), users=50, projects=500, seed=args.seed)
+        server = start_server(workdir, args.port, args)
+        try:
+            base_url = f"http://127.0.0.1:{args.port}"
+            asyncio.run(wait_until_ready(base_url))
+            rows = asyncio.run(measure(base_url, args.runs))
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"\n{'page':<14} {'cold KB':>17} {'repeat KB':>17} {'cold ms':>17} {'repeat ms':>17}")
+    print(f"{'':<14} {'before':>8} {'after':>8} {'before':>8} {'after':>8} {'before':>8} {'after':>8} {'before':>8} {'after':>8}")
+    for row in rows:
+        b, a = row["before"], row["after"]
+        print(f"{row['page']:<14} {b['cold_kb']:>8.1f} {a['cold_kb']:>8.1f} {b['repeat_kb']:>8.1f} {a['repeat_kb']:>8.1f} "
+              f"{b['cold_ms']:>8.1f} {a['cold_ms']:>8.1f} {b['repeat_ms']:>8.1f} {a['repeat_ms']:>8.1f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure compression and HTTP caching on pages and static assets")
+    parser.add_argument("--runs", type=int, default=10, help="visits per page and mode (median reported)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--llm-latency", default="fixed:0")
+    main(parser.parse_args())
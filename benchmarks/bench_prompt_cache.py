@@ -0,0 +1,72 @@
+"""
+Input tokens and local overhead of a layout generation call. Runs offline against the
+stub backend. Reports how much of the prompt is the static system prefix, the part a
+provider can reuse by prefix matching (Gemini implicit caching, vLLM prefix caching),
+and how much is the per-request part.
+
+Also times building the prompt template on every call (as layout generation used to)
+against formatting the template compiled once.
+
+    python benchmarks/bench_prompt_cache.py --points 40 --calls 200
+"""
+import sys
+import os
+import time
+import random
+import asyncio
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ["LLM_BACKEND"] = "stub"
+
+from src.layout_generator import LayoutGenerator, LAYOUT_SYSTEM_PROMPT, LAYOUT_REQUEST_TEMPLATE
+
+def make_request(rng, points):
+    outline = [{"x": rng.uniform(0, 800), "y": rng.uniform(0, 400)} for _ in range(points)]
+    return ("Restaurant", "2400 sq ft", outline, "Open kitchen, 40 covers, a bar and two restrooms. REQUIRED FLOORS: 2")
+
+async def measure(request, calls):
+    generator = LayoutGenerator()
+    generator.warm()
+    messages = generator.layout_prompt.format_messages(**generator._build_inputs(*request))
+    usage = (await generator.json_llm.ainvoke(messages)).usage_metadata
+    started = time.perf_counter()
+    for _ in range(calls):
+        await generator.agenerate_layout(*request)
+    latency = (time.perf_counter() - started) / calls
+    return usage["input_tokens"], len(LAYOUT_SYSTEM_PROMPT) // 4, latency
+
+def time_prompt_build(request, calls):
+    from langchain_core.messages import SystemMessage
+    from langchain_core.prompts import ChatPromptTemplate
+    inputs = LayoutGenerator()._build_inputs(*request)
+
+    def build():
+        return ChatPromptTemplate.from_messages([SystemMessage(content=LAYOUT_SYSTEM_PROMPT), ("human", LAYOUT_REQUEST_TEMPLATE)])
+
+    started = time.perf_counter()
+    for _ in range(calls):
+        build().format_messages(**inputs)
+    per_call = (time.perf_counter() - started) / calls
+    compiled = build()
+    started = time.perf_counter()
+    for _ in range(calls):
+        compiled.format_messages(**inputs)
+    return per_call, (time.perf_counter() - started) / calls
+
+async def main(args):
+    request = make_request(random.Random(args.seed), args.points)
+    input_tokens, prefix_tokens, latency = await measure(request, args.calls)
+    print(f"\nLayout request with a {args.points}-point outline, {args.calls} calls (stub backend)\n")
+    print(f"{'input tokens':>14}{'static prefix':>15}{'per request':>13}{'us/call':>10}")
+    print(f"{input_tokens:>14}{prefix_tokens:>15}{input_tokens - prefix_tokens:>13}{latency * 1e6:>10.0f}")
+
+    per_call, compiled = time_prompt_build(request, args.calls)
+    print(f"\nprompt template built per call {per_call * 1e6:.0f} us, compiled once {compiled * 1e6:.0f} us")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark prompt prefix caching with the stub LLM")
+    parser.add_argument("--points", type=int, default=40, help="points in the sketched site outline")
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=1)
+    asyncio.run(main(parser.parse_args()))
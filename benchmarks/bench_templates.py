@@ -0,0 +1,114 @@
+"""
+Server-side render time for project grids, and template compile time.
+
+Renders each grid page for a user with --projects projects (full-size SVGs from
+benchmarks/seed_data.py) through the app's own Jinja environment:
+
+    uncached      every project card rendered on every view (FRAGMENT_CACHE_MB=0)
+    fragments     cards served from the fragment cache (steady state)
+
+and compiles every template in a fresh environment with and without the
+bytecode cache (what a restart or a new worker pays on its first views).
+
+    python benchmarks/bench_templates.py --projects 100 --runs 50
+"""
+import sys
+import os
+import time
+import random
+import shutil
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from jinja2 import Environment, FileSystemLoader, FileSystemBytecodeCache
+from starlette.requests import Request
+from benchmarks.seed_data import make_layout
+
+PAGES = {
+    "dashboard.html": "projects",
+    "my_projects.html": "projects",
+    "favourites.html": "projects",
+    "profile.html": "projects",
+    "templates.html": "public_projects",
+}
+
+def make_projects(count, seed):
+    rng = random.Random(seed)
+    projects = []
+    for i in range(count):
+        layout = make_layout(rng)
+        projects.append({
+            "id": i + 1, "title": layout["title"], "description": layout["description"],
+            "thumbnail": "https://res.cloudinary.invalid/stub/bench.svg", "svg_content": layout["floors"][0]["svg"],
+            "rooms": "[]", "design_philosophy": layout["conversational_response"],
+            "updated_at": f"2025-01-{i % 28 + 1:02d} 10:00:00", "design_code": f"DL-{10000 + i}",
+            "is_favourite": int(i % 7 == 0), "is_public": int(i % 5 == 0),
+        })
+    return projects
+
+def make_request(app, user):
+    scope = {
+        "type": "http", "method": "GET", "path": "/dashboard", "root_path": "", "scheme": "http",
+        "query_string": b"", "headers": [], "server": ("bench", 80), "app": app, "router": app.router,
+    }
+    request = Request(scope)
+    request.state.session = {}
+    request.state.user = user
+    return request
+
+def time_renders(render, runs):
+    render()
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        render()
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    return timings[len(timings) // 2] * 1000
+
+def time_compile(template_dir, bytecode_dir=None):
+    env = Environment(loader=FileSystemLoader(template_dir), autoescape=True,
+                      bytecode_cache=FileSystemBytecodeCache(bytecode_dir) if bytecode_dir else None)
+    started = time.perf_counter()
+    for name in env.list_templates(extensions=["html"]):
+        env.get_template(name)
+    return (time.perf_counter() - started) * 1000
+
+def main(args):
+    from src.app import app, templates
+    from src.models import User
+    from src.fragment_cache import fragment_cache
+    from src.fastapi_utils import render_template
+
+    user = User(1, "Bench User", "bench@example.com", about="", profile_pic="https://res.cloudinary.invalid/a.png",
+                location="Pune", user_key="00000000-0000-0000-0000-000000000000")
+    projects = make_projects(args.projects, args.seed)
+    print(f"Render time, median of {args.runs} ({args.projects} projects)")
+    print(f"{'page':<18} {'uncached ms':>12} {'fragments ms':>13} {'speedup':>8}")
+    max_bytes = fragment_cache.max_bytes
+    for page, key in PAGES.items():
+        render = lambda: render_template(make_request(app, user), page, {key: projects})
+        fragment_cache.max_bytes = 0
+        uncached = time_renders(render, args.runs)
+        fragment_cache.max_bytes = max(max_bytes, 1024 ** 3)
+        fragments = time_renders(render, args.runs)
+        print(f"{page:<18} {uncached:>12.2f} {fragments:>13.2f} {uncached / fragments:>7.1f}x")
+
+    template_dir = templates.env.loader.searchpath[0]
+    bytecode_dir = tempfile.mkdtemp(prefix="dreamlayout-jinja-")
+    try:
+        cold = time_compile(template_dir)
+        time_compile(template_dir, bytecode_dir)
+        warm = time_compile(template_dir, bytecode_dir)
+    finally:
+        shutil.rmtree(bytecode_dir, ignore_errors=True)
+    print(f"\nCompile all templates: {cold:.1f} ms from source, {warm:.1f} ms from the bytecode cache")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark project-grid rendering and template compilation")
+    parser.add_argument("--projects", type=int, default=100)
+    parser.add_argument("--runs", type=int, default=30)
+    parser.add_argument("--seed", type=int, default=42)
+    main(parser.parse_args())
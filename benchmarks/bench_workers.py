@@ -0,0 +1,119 @@
+"""
+Throughput scaling of serve.py from 1 to N worker processes.
+
+For each worker count, starts `serve.py --workers N` on a local port (stub LLM
+backend, models not preloaded), waits for /readyz, then keeps `--concurrency`
+requests in flight against `--path` for `--duration` seconds:
+
+    python benchmarks/bench_workers.py --max-workers 4
+    python benchmarks/bench_workers.py --workers 1,2,4,8 --path /login --concurrency 64
+
+Reports requests/sec, p50/p95 latency and scaling efficiency relative to one worker.
+"""
+import sys
+import os
+import json
+import time
+import asyncio
+import argparse
+import subprocess
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))] if ordered else 0.0
+
+def start_server(workers, port, gunicorn):
+    env = dict(os.environ, LLM_BACKEND=os.getenv("LLM_BACKEND", "stub"), PRELOAD_MODELS="False")
+    cmd = [sys.executable, os.path.join(ROOT, "serve.py"), "--workers", str(workers), "--bind", f"127.0.0.1:{port}"]
+    if not gunicorn:
+        cmd.append("--no-gunicorn")
+    return subprocess.Popen(cmd, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+async def wait_until_ready(base_url, workers, timeout=180):
+    """Wait for /readyz, so background model warmup is not competing with the measurement"""
+    deadline = time.monotonic() + timeout
+    streak = 0
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                # Each probe lands on an arbitrary worker: require a run of ready answers
+                streak = streak + 1 if (await client.get(f"{base_url}/readyz")).status_code == 200 else 0
+                if streak >= 4 * workers:
+                    return
+            except httpx.HTTPError:
+                streak = 0
+            await asyncio.sleep(0.1)
+    raise RuntimeError(f"server at {base_url} did not become ready")
+
+async def drive(base_url, path, concurrency, duration):
+    latencies = []
+    errors = 0
+    stop_at = time.monotonic() + duration
+
+    async def client_loop(client):
+        nonlocal errors
+        while time.monotonic() < stop_at:
+            started = time.perf_counter()
+            try:
+                res = await client.get(path)
+                if res.status_code >= 500:
+                    errors += 1
+                else:
+                    latencies.append(time.perf_counter() - started)
+            except httpx.HTTPError:
+                errors += 1
+
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(client_loop(client) for _ in range(concurrency)))
+        wall = time.perf_counter() - started
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": len(latencies) / wall,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+    }
+
+def run(workers, args):
+    port = args.port + workers
+    base_url = f"http://127.0.0.1:{port}"
+    proc = start_server(workers, port, not args.no_gunicorn)
+    try:
+        asyncio.run(wait_until_ready(base_url, workers))
+        asyncio.run(drive(base_url, args.path, args.concurrency, 1))  # warm up every worker
+        return {"workers": workers, **asyncio.run(drive(base_url, args.path, args.concurrency, args.duration))}
+    finally:
+        proc.terminate()
+        proc.wait(timeout=30)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure serve.py throughput for 1..N workers")
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--workers", default="", help="comma-separated worker counts (overrides --max-workers)")
+    parser.add_argument("--path", default="/login")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--port", type=int, default=8700)
+    parser.add_argument("--no-gunicorn", action="store_true", help="use uvicorn's process manager")
+    parser.add_argument("--output", default="", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    counts = [int(n) for n in args.workers.split(",")] if args.workers else list(range(1, args.max_workers + 1))
+    results = []
+    print(f"{'workers':>7} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'errors':>6} {'scaling':>8}")
+    for workers in counts:
+        result = run(workers, args)
+        baseline = results[0]["rps"] if results else result["rps"]
+        result["efficiency"] = result["rps"] / (baseline * workers) if baseline else 0.0
+        results.append(result)
+        print(f"{workers:>7} {result['rps']:>9.1f} {result['p50_ms']:>8.1f} {result['p95_ms']:>8.1f} "
+              f"{result['errors']:>6} {result['efficiency']:>7.0%}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
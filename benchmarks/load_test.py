@@ -0,0 +1,309 @@
+"""
+End-to-end load test: boots the app on a temporary, seeded SQLite database and
+drives a mixed workload of logged-in users against it.
+
+The server runs in its own process with the stub LLM backend, stubbed Cloudinary
+uploads and no Resend key (emails are only printed), so nothing leaves the
+machine. Virtual users log in as seeded accounts and then pick workloads by weight:
+
+    login          POST /login (password check + session)
+    dashboard      GET /dashboard
+    my_projects    GET /my-projects
+    templates      GET /templates
+    archive        GET /archive
+    bulk_action    POST /api/projects/bulk-action (favourite 5 own projects)
+    generate_save  POST /api/generate-preview, then /api/save-project with a full-size layout
+
+    python benchmarks/load_test.py                                  # 2000 users, 20000 projects, 30 s
+    python benchmarks/load_test.py --duration 60 --concurrency 32
+    python benchmarks/load_test.py --save-baseline benchmarks/baseline.json
+    python benchmarks/load_test.py --baseline benchmarks/baseline.json --fail-on-regression
+
+Reports throughput, p50/p95/p99 latency and errors per workload, plus the server's
+RSS. With --baseline each workload is compared against a stored run and flagged
+when p95 grows or throughput drops by more than --tolerance.
+"""
+import sys
+import os
+import json
+import time
+import random
+import shutil
+import asyncio
+import argparse
+import platform
+import tempfile
+import subprocess
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.seed_data import seed_database, make_layout, SEED_PASSWORD
+
+WORKLOAD_WEIGHTS = {
+    "dashboard": 30,
+    "my_projects": 20,
+    "templates": 15,
+    "archive": 10,
+    "bulk_action": 10,
+    "generate_save": 10,
+    "login": 5,
+}
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))] if ordered else 0.0
+
+def read_rss_mb(pid):
+    """(current, peak) resident set size of `pid` in MB, from /proc (Linux) or psutil"""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            fields = dict(line.split(":", 1) for line in f if ":" in line)
+        return int(fields["VmRSS"].split()[0]) / 1024, int(fields["VmHWM"].split()[0]) / 1024
+    except (OSError, KeyError):
+        try:
+            import psutil
+            rss = psutil.Process(pid).memory_info().rss / 1024 / 1024
+            return rss, None
+        except Exception:
+            return None, None
+
+def start_server(workdir, port, args):
+    env = dict(
+        os.environ,
+        DB_PATH=os.path.join(workdir, "users.db"),
+        FAISS_INDEX_PATH=os.path.join(workdir, "user_embeddings.index"),
+        USER_MAPPING_PATH=os.path.join(workdir, "user_id_mapping.pkl"),
+        SECRET_KEY="load-test-secret",
+        LLM_BACKEND="stub",
+        LLM_STUB_LATENCY=args.llm_latency,
+        CLOUDINARY_BACKEND="stub",
+        RESEND_API_KEY="",
+        TRACING_ENABLED="False",
+    )
+    cmd = [sys.executable, "-m", "uvicorn", "src.app:app", "--host", "127.0.0.1", "--port", str(port),
+           "--log-level", "warning", "--no-access-log"]
+    log = open(os.path.join(workdir, "server.log"), "w")
+    return subprocess.Popen(cmd, cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+async def wait_until_ready(base_url, timeout=180):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get(f"{base_url}/readyz")).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError("server did not become ready (see server.log in the work directory)")
+
+class VirtualUser:
+    def __init__(self, base_url, account, project_ids, rng, layouts):
+        self.base_url = base_url
+        self.email = account[1]
+        self.project_ids = project_ids
+        self.rng = rng
+        self.layouts = layouts
+        self.client = None
+
+    async def login(self):
+        if self.client:
+            await self.client.aclose()
+        self.client = httpx.AsyncClient(base_url=self.base_url, timeout=60)
+        res = await self.client.post("/login", data={"email": self.email, "password": SEED_PASSWORD})
+        return res.status_code == 303 and res.headers.get("location", "").endswith("/dashboard")
+
+    async def page(self, path):
+        res = await self.client.get(path)
+        return res.status_code == 200
+
+    async def bulk_action(self):
+        if not self.project_ids:
+            return await self.page("/dashboard")
+        ids = self.rng.sample(self.project_ids, min(5, len(self.project_ids)))
+        res = await self.client.post("/api/projects/bulk-action", json={
+            "project_ids": ids, "action": "favourite", "value": self.rng.randint(0, 1)
+        })
+        return res.status_code == 200 and res.json().get("success") is True
+
+    async def generate_save(self):
+        res = await self.client.post("/api/generate-preview", json={
+            "venture_type": "Residential", "area": "1800 sq ft",
+            "dimensions": [[0, 0], [800, 0], [800, 400], [0, 400]], "prompt": "3BHK with a home office"
+        })
+        if res.status_code != 200 or not res.json().get("success"):
+            return False
+        # Save a full-size layout: the stub's own SVGs are much smaller than real model output
+        layout = dict(res.json()["layout"], floors=self.rng.choice(self.layouts)["floors"])
+        res = await self.client.post("/api/save-project", json={"layout": layout})
+        return res.status_code == 200 and res.json().get("success") is True
+
+    async def run(self, workload):
+        if workload == "login":
+            return await self.login()
+        if workload == "bulk_action":
+            return await self.bulk_action()
+        if workload == "generate_save":
+            return await self.generate_save()
+        return await self.page({
+            "dashboard": "/dashboard", "my_projects": "/my-projects",
+            "templates": "/templates", "archive": "/archive"
+        }[workload])
+
+async def drive(base_url, seeded, args, server_pid):
+    rng = random.Random(args.seed)
+    layouts = [make_layout(rng) for _ in range(20)]
+    names, weights = zip(*WORKLOAD_WEIGHTS.items())
+    latencies = {name: [] for name in names}
+    errors = {name: 0 for name in names}
+    rss_samples = []
+
+    async def user_loop(index, stop_at):
+        user_rng = random.Random(args.seed * 1000 + index)
+        account = user_rng.choice(seeded["users"])
+        user = VirtualUser(base_url, account, seeded["projects"][account[0]], user_rng, layouts)
+        await user.login()
+        try:
+            while time.monotonic() < stop_at:
+                workload = user_rng.choices(names, weights)[0]
+                started = time.perf_counter()
+                try:
+                    ok = await user.run(workload)
+                except (httpx.HTTPError, ValueError):
+                    ok = False
+                if ok:
+                    latencies[workload].append(time.perf_counter() - started)
+                else:
+                    errors[workload] += 1
+        finally:
+            await user.client.aclose()
+
+    async def sample_memory(stop_at):
+        while time.monotonic() < stop_at:
+            rss_samples.append(read_rss_mb(server_pid)[0])
+            await asyncio.sleep(0.5)
+
+    # Short warm-up so first-request costs (template compile, imports) are not measured
+    await asyncio.gather(*(user_loop(-i - 1, time.monotonic() + args.warmup) for i in range(args.concurrency)))
+    for name in names:
+        latencies[name].clear()
+        errors[name] = 0
+
+    stop_at = time.monotonic() + args.duration
+    started = time.perf_counter()
+    await asyncio.gather(sample_memory(stop_at), *(user_loop(i, stop_at) for i in range(args.concurrency)))
+    wall = time.perf_counter() - started
+
+    workloads = {}
+    for name in names:
+        values = latencies[name]
+        workloads[name] = {
+            "requests": len(values),
+            "errors": errors[name],
+            "rps": len(values) / wall,
+            "p50_ms": percentile(values, 50) * 1000,
+            "p95_ms": percentile(values, 95) * 1000,
+            "p99_ms": percentile(values, 99) * 1000,
+        }
+    rss, peak = read_rss_mb(server_pid)
+    samples = [value for value in rss_samples if value is not None]
+    return {
+        "workloads": workloads,
+        "total_rps": sum(w["requests"] for w in workloads.values()) / wall,
+        "total_errors": sum(w["errors"] for w in workloads.values()),
+        "server_rss_mb": rss,
+        "server_rss_avg_mb": sum(samples) / len(samples) if samples else None,
+        "server_peak_rss_mb": peak,
+    }
+
+def compare(result, baseline, tolerance):
+    """Print per-workload deltas against a stored run; returns the workloads that regressed"""
+    regressions = []
+    print(f"\nAgainst baseline ({baseline.get('recorded_at', 'unknown date')}), tolerance {tolerance:.0%}:")
+    print(f"{'workload':<14} {'rps':>18} {'p95 ms':>20}")
+    for name, current in result["workloads"].items():
+        base = baseline["workloads"].get(name)
+        if not base or not base["requests"]:
+            continue
+        rps_delta = current["rps"] / base["rps"] - 1 if base["rps"] else 0.0
+        p95_delta = current["p95_ms"] / base["p95_ms"] - 1 if base["p95_ms"] else 0.0
+        regressed = rps_delta < -tolerance or p95_delta > tolerance
+        if regressed:
+            regressions.append(name)
+        print(f"{name:<14} {current['rps']:>8.1f} ({rps_delta:+6.1%}) {current['p95_ms']:>9.1f} ({p95_delta:+6.1%})"
+              f"{'  <-- REGRESSION' if regressed else ''}")
+    return regressions
+
+def print_report(result, args):
+    print(f"\n{args.users} users, {args.projects} projects, {args.concurrency} virtual users, {args.duration:.0f}s")
+    print(f"{'workload':<14} {'requests':>8} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>6}")
+    for name, w in result["workloads"].items():
+        print(f"{name:<14} {w['requests']:>8} {w['rps']:>8.1f} {w['p50_ms']:>8.1f} {w['p95_ms']:>8.1f} "
+              f"{w['p99_ms']:>8.1f} {w['errors']:>6}")
+    print(f"{'total':<14} {'':>8} {result['total_rps']:>8.1f} {'':>8} {'':>8} {'':>8} {result['total_errors']:>6}")
+    if result["server_rss_mb"] is not None:
+        peak = f", peak {result['server_peak_rss_mb']:.0f} MB" if result["server_peak_rss_mb"] else ""
+        print(f"server RSS: {result['server_rss_mb']:.0f} MB at the end{peak}")
+
+def main(args):
+    workdir = tempfile.mkdtemp(prefix="dreamlayout-load-")
+    port = args.port
+    try:
+        started = time.perf_counter()
+        seeded = seed_database(os.path.join(workdir, "users.db"), args.users, args.projects, args.seed)
+        print(f"🌱 Seeded {args.users} users / {args.projects} projects in {time.perf_counter() - started:.1f}s "
+              f"({os.path.getsize(os.path.join(workdir, 'users.db')) / 1024 / 1024:.0f} MB) at {workdir}")
+
+        server = start_server(workdir, port, args)
+        try:
+            base_url = f"http://127.0.0.1:{port}"
+            asyncio.run(wait_until_ready(base_url))
+            result = asyncio.run(drive(base_url, seeded, args, server.pid))
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+    finally:
+        if args.keep:
+            print(f"Kept work directory {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    result.update({
+        "recorded_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "params": {k: getattr(args, k) for k in ("users", "projects", "concurrency", "duration", "seed", "llm_latency")},
+        "machine": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()},
+    })
+    print_report(result, args)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"Saved baseline to {args.save_baseline}")
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(result, json.load(f), args.tolerance)
+        if regressions and args.fail_on_regression:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mixed-workload load test against a seeded, stubbed DreamLayout server")
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--projects", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=16, help="virtual users")
+    parser.add_argument("--duration", type=float, default=30, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=3, help="unmeasured seconds before the run")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--llm-latency", default="fixed:0", help="stub LLM latency spec, e.g. lognormal:0,0.5")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--output", default="", help="write this run's results as JSON")
+    parser.add_argument("--save-baseline", default="", help="store this run as the baseline")
+    parser.add_argument("--baseline", default="", help="compare against a stored baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed p95 growth / throughput drop")
+    parser.add_argument("--fail-on-regression", action="store_true", help="exit 1 if any workload regressed")
+    parser.add_argument("--keep", action="store_true", help="keep the temporary database and server log")
+    main(parser.parse_args())
@@ -0,0 +1,139 @@
+"""
+Synthetic data for benchmarks: users and projects with realistic, full-size layouts.
+
+    from benchmarks.seed_data import seed_database
+    summary = seed_database("/tmp/bench/users.db", users=2000, projects=20000)
+
+Every seeded user has the password SEED_PASSWORD. Project counts per user are
+skewed (a few heavy users, many light ones), a share of projects is archived,
+public or favourited, and each layout is one to three floors of ~12 KB SVG.
+"""
+import sys
+import os
+import json
+import uuid
+import random
+import sqlite3
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from werkzeug.security import generate_password_hash
+from src.config import Config
+
+SEED_PASSWORD = "benchmark-pass"
+
+ROOM_TYPES = [
+    ("Living Room", "#EBF4FF"), ("Kitchen", "#F0FFF4"), ("Master Bedroom", "#FFF5F7"), ("Bedroom", "#FFFAF0"),
+    ("Bathroom", "#E6FFFA"), ("Dining", "#FEFCBF"), ("Study", "#EDF2F7"), ("Utility", "#F7FAFC"),
+    ("Balcony", "#F0FFF4"), ("Foyer", "#EBF8FF"), ("Store", "#FAF5FF"), ("Pooja Room", "#FFF5F5"),
+]
+
+def make_floor(rng, floor_idx, room_count):
+    """One floor in the shape the LLM returns: numbered rooms plus an SVG with walls, labels and furniture"""
+    rooms = []
+    shapes = ['<rect x="50" y="50" width="800" height="500" fill="none" stroke="#1f2937" stroke-width="3"/>']
+    cols = 4
+    for idx in range(room_count):
+        name, fill = ROOM_TYPES[(idx + floor_idx) % len(ROOM_TYPES)]
+        w, h = 200, 500 // ((room_count + cols - 1) // cols)
+        x, y = 50 + (idx % cols) * w, 50 + (idx // cols) * h
+        rooms.append({
+            "id": idx + 1, "name": name,
+            "size": f"{rng.randint(8, 18)}' x {rng.randint(8, 16)}'",
+            "position": f"Row {idx // cols + 1}, column {idx % cols + 1}"
+        })
+        shapes.append(f'<rect x="{x}" y="{y}" width="{w}" height="{h}" fill="{fill}" stroke="#1f2937" stroke-width="2"/>')
+        for _ in range(6):
+            fx, fy = x + rng.randint(10, w - 40), y + rng.randint(10, max(11, h - 30))
+            shapes.append(f'<rect x="{fx}" y="{fy}" width="{rng.randint(15, 30)}" height="{rng.randint(10, 20)}" '
+                          f'fill="none" stroke="#9ca3af" stroke-width="1" stroke-dasharray="4 2"/>')
+        shapes.append(f'<line x1="{x + w // 2 - 15}" y1="{y + h}" x2="{x + w // 2 + 15}" y2="{y + h}" stroke="#ffffff" stroke-width="4"/>')
+        shapes.append(f'<circle cx="{x + w // 2}" cy="{y + h // 2}" r="14" fill="#ffffff" stroke="#1f2937" stroke-width="1.5"/>')
+        shapes.append(f'<text x="{x + w // 2}" y="{y + h // 2 + 5}" font-size="14" font-weight="bold" '
+                      f'text-anchor="middle" font-family="Inter, sans-serif">{idx + 1}</text>')
+    svg = ('<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 900 600" width="900" height="600">'
+           + "".join(shapes) + "</svg>")
+    return {"floor_name": "Ground Floor" if floor_idx == 0 else f"Floor {floor_idx}", "rooms": rooms, "svg": svg}
+
+def make_layout(rng, title=None):
+    """A layout dict as /api/save-project receives it"""
+    floors = [make_floor(rng, i, rng.randint(8, 14)) for i in range(rng.choice((1, 1, 2, 3)))]
+    legend = "\n".join(f"{room['id']}. {room['name']}: {room['size']}" for room in floors[0]["rooms"])
+    return {
+        "title": title or f"{rng.choice(['Modern', 'Compact', 'Airy', 'Courtyard'])} {rng.choice(['Villa', 'Office', 'Studio', 'Home'])} {rng.randint(1, 999)}",
+        "description": "Open-plan layout with a central circulation spine and daylight on three sides.",
+        "conversational_response": "Great news! I've successfully crafted a custom architectural layout.\n" + legend,
+        "floors": floors
+    }
+
+def projects_per_user(rng, users, projects):
+    """Skewed split of `projects` over `users` (Pareto-ish: most users have a few, some have hundreds)"""
+    weights = [rng.paretovariate(1.8) for _ in range(users)]
+    total = sum(weights)
+    counts = [int(projects * w / total) for w in weights]
+    for i in rng.sample(range(users), projects - sum(counts)):
+        counts[i] += 1
+    return counts
+
+def seed_database(db_path, users=2000, projects=20000, seed=42, layout_pool=200):
+    """
+    Create (or extend) the app database at `db_path` with synthetic data.
+    Returns {"users": [(user_id, email)], "projects": {user_id: [project_ids]}}.
+    """
+    from src import database
+    rng = random.Random(seed)
+    Config.DB_PATH = db_path
+    database.init_db()
+
+    # Hashing is deliberately slow; every seeded user shares the one hash
+    password_hash = generate_password_hash(SEED_PASSWORD)
+    # Building a layout costs more than inserting it: reuse a pool of distinct ones
+    pool = []
+    for _ in range(layout_pool):
+        layout = make_layout(rng)
+        pool.append((layout, json.dumps(layout["floors"])))
+
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    user_rows = []
+    for i in range(users):
+        email = f"user{i}@bench.dreamlayout.dev"
+        cursor.execute(
+            "INSERT INTO users (name, email, password_hash, user_key, about, location) VALUES (?, ?, ?, ?, ?, ?)",
+            (f"Bench User {i}", email, password_hash, str(uuid.uuid4()), "Seeded for benchmarks", "Pune")
+        )
+        user_rows.append((cursor.lastrowid, email))
+
+    owned = {user_id: [] for user_id, _ in user_rows}
+    for (user_id, _), count in zip(user_rows, projects_per_user(rng, users, projects)):
+        for _ in range(count):
+            layout, rooms = rng.choice(pool)
+            archived = rng.random() < 0.1
+            cursor.execute('''
+                INSERT INTO projects (user_id, title, description, thumbnail, svg_content, rooms, design_philosophy,
+                                      design_code, is_deleted, deleted_at, is_public, is_favourite)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (
+                user_id, layout["title"], layout["description"],
+                f"https://res.cloudinary.invalid/stub/dreamlayout_projects/{user_id}/{rng.randint(0, 10**9)}.svg",
+                layout["floors"][0]["svg"], rooms, layout["conversational_response"],
+                f"DL-{rng.randint(10000, 99999)}", int(archived),
+                "2024-01-01 00:00:00" if archived else None,
+                int(rng.random() < 0.05), int(rng.random() < 0.1)
+            ))
+            if not archived:
+                owned[user_id].append(cursor.lastrowid)
+    conn.commit()
+    conn.close()
+    return {"users": user_rows, "projects": owned}
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Seed a DreamLayout database with synthetic users and projects")
+    parser.add_argument("db_path")
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--projects", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    summary = seed_database(args.db_path, args.users, args.projects, args.seed)
+    print(f"Seeded {len(summary['users'])} users and {args.projects} projects into {args.db_path}")
@@ -0,0 +1,16 @@
+"""
+Precompress static text assets ahead of time (the app also does this at startup).
+
+    python scripts/build_static.py
+"""
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.config import Config
+from src.static_assets import manifest, precompress_static
+
+if __name__ == "__main__":
+    written = precompress_static()
+    print(f"✅ {len(manifest.hashes)} static files hashed, {written} compressed variants written to {Config.STATIC_CACHE_DIR}")
@@ -0,0 +1,68 @@
+"""
+Drive the LLM gateway against the fake LLM server, fully offline.
+
+The fake server runs in-process behind httpx's ASGI transport, so no port or
+API key is needed. Prints how many calls succeeded, the latency spread and the
+breaker state, e.g.:
+
+    LLM_MAX_CONCURRENCY=4 python scripts/check_llm_gateway.py --calls 40 --error-rate 0.3
+"""
+import sys
+import os
+import time
+import asyncio
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from src.llm_gateway import llm_gateway
+from scripts.fake_llm_server import create_fake_app
+
+class FakeProviderError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"fake provider returned {status_code}")
+        self.status_code = status_code
+
+async def main(args):
+    app = create_fake_app(args.latency_ms, args.jitter_ms, args.error_rate, args.rate_limit_rate, args.hang_rate)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://fake-llm") as client:
+        async def make_call():
+            res = await client.post("/v1/chat/completions", json={"messages": [{"role": "user", "content": "hi"}]})
+            if res.status_code != 200:
+                raise FakeProviderError(res.status_code)
+            return res.json()
+
+        async def one(i):
+            started = time.monotonic()
+            try:
+                await llm_gateway.call(make_call, user_id=i % args.users, timeout=args.timeout)
+                return "ok", time.monotonic() - started
+            except Exception as e:
+                return type(e).__name__, time.monotonic() - started
+
+        started = time.monotonic()
+        results = await asyncio.gather(*(one(i) for i in range(args.calls)))
+        wall = time.monotonic() - started
+
+    outcomes = {}
+    for outcome, _ in results:
+        outcomes[outcome] = outcomes.get(outcome, 0) + 1
+    latencies = sorted(latency for _, latency in results)
+    print(f"calls={args.calls} provider_requests={app.state.calls} wall={wall:.2f}s")
+    print(f"outcomes={outcomes}")
+    print(f"p50={latencies[len(latencies) // 2]:.3f}s p95={latencies[int(len(latencies) * 0.95) - 1]:.3f}s")
+    print(f"gateway={llm_gateway.stats()}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Exercise the LLM gateway against the fake LLM server")
+    parser.add_argument("--calls", type=int, default=20)
+    parser.add_argument("--users", type=int, default=5)
+    parser.add_argument("--timeout", type=float, default=10)
+    parser.add_argument("--latency-ms", type=float, default=200)
+    parser.add_argument("--jitter-ms", type=float, default=100)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--hang-rate", type=float, default=0.0)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,24 @@
+"""
+Run the shared embedding process.
+
+Loads the SentenceTransformer once and serves encode requests from every app
+worker over a local socket, batching requests that arrive together. Point the
+workers at it with EMBEDDING_SERVER_ADDRESS:
+
+    python scripts/embedding_server.py --address 127.0.0.1:8765
+    EMBEDDING_SERVER_ADDRESS=127.0.0.1:8765 python run.py
+"""
+import sys
+import os
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.config import Config
+from src.embeddings import run_embedding_server
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Shared embedding server for DreamLayout workers")
+    parser.add_argument("--address", default=Config.EMBEDDING_SERVER_ADDRESS or "127.0.0.1:8765")
+    args = parser.parse_args()
+    run_embedding_server(args.address)
@@ -0,0 +1,78 @@
+"""
+Local stand-in for an LLM provider, for exercising the LLM gateway offline.
+
+Speaks the OpenAI-compatible /v1/chat/completions API and answers with a canned
+layout after a configurable delay. A share of requests can be made to fail with
+503/429 or to hang, so retries, timeouts, hedging and the circuit breaker can be
+observed without touching the real model.
+
+    python scripts/fake_llm_server.py --port 8099 --latency-ms 800 --jitter-ms 400 --error-rate 0.2
+"""
+import sys
+import os
+import json
+import time
+import random
+import asyncio
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from src.llm_backends import stub_layout
+
+def create_fake_app(latency_ms=500, jitter_ms=0, error_rate=0.0, rate_limit_rate=0.0, hang_rate=0.0):
+    app = FastAPI(title="Fake LLM")
+    app.state.calls = 0
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        app.state.calls += 1
+
+        roll = random.random()
+        if roll < hang_rate:
+            await asyncio.sleep(3600)
+        if roll < hang_rate + error_rate:
+            return JSONResponse({"error": {"message": "fake overload"}}, status_code=503)
+        if roll < hang_rate + error_rate + rate_limit_rate:
+            return JSONResponse({"error": {"message": "fake rate limit"}}, status_code=429)
+
+        await asyncio.sleep(max(0, latency_ms + random.uniform(-jitter_ms, jitter_ms)) / 1000)
+        prompt = "\n".join(str(m.get("content", "")) for m in body.get("messages", []))
+        content = json.dumps(stub_layout(prompt))
+        prompt_chars = len(prompt)
+        return {
+            "id": f"fake-{app.state.calls}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "fake"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {
+                "prompt_tokens": prompt_chars // 4,
+                "completion_tokens": len(content) // 4,
+                "total_tokens": (prompt_chars + len(content)) // 4
+            }
+        }
+
+    @app.get("/calls")
+    async def calls():
+        return {"calls": app.state.calls}
+
+    return app
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--latency-ms", type=float, default=500)
+    parser.add_argument("--jitter-ms", type=float, default=0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered with 503")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="share of requests answered with 429")
+    parser.add_argument("--hang-rate", type=float, default=0.0, help="share of requests that never answer")
+    args = parser.parse_args()
+
+    app = create_fake_app(args.latency_ms, args.jitter_ms, args.error_rate, args.rate_limit_rate, args.hang_rate)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
@@ -0,0 +1,76 @@
+"""
+Measure app startup time and per-worker memory.
+
+Each scenario runs in a fresh interpreter and reports how long `import src.app`
+took, how long the first embedding took, and the peak RSS of that process:
+
+    python scripts/measure_startup.py
+    python scripts/measure_startup.py --embedding-server 127.0.0.1:8765
+
+With --embedding-server the first-embedding scenario goes through the shared
+embedding process (start it first with scripts/embedding_server.py), which is
+the per-worker footprint in a multi-worker deployment.
+"""
+import sys
+import os
+import json
+import argparse
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = r'''
+import sys, time, json
+sys.path.insert(0, {root!r})
+started = time.perf_counter()
+import src.app
+imported = time.perf_counter()
+first_embedding = None
+if {embed!r}:
+    from src.embeddings import encode
+    encode(["warmup"])
+    first_embedding = time.perf_counter() - imported
+try:
+    import resource
+    rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    rss_mb = rss_kb / 1024 / (1024 if sys.platform == "darwin" else 1)
+except ImportError:
+    rss_mb = None
+print(json.dumps({{"import_s": imported - started, "first_embedding_s": first_embedding, "peak_rss_mb": rss_mb}}))
+'''
+
+def run_scenario(name, embed, env_overrides):
+    env = dict(os.environ, **env_overrides)
+    proc = subprocess.run(
+        [sys.executable, "-c", CHILD.format(root=ROOT, embed=embed)],
+        cwd=ROOT, env=env, capture_output=True, text=True
+    )
+    lines = [line for line in proc.stdout.splitlines() if line.startswith("{")]
+    if proc.returncode != 0 or not lines:
+        return {"scenario": name, "error": proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "no output"}
+    return {"scenario": name, **json.loads(lines[-1])}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure DreamLayout startup time and per-worker RSS")
+    parser.add_argument("--embedding-server", default="", help="address of a running embedding server")
+    parser.add_argument("--json", action="store_true", help="print raw JSON results")
+    args = parser.parse_args()
+
+    scenarios = [
+        ("import only", False, {"EMBEDDING_SERVER_ADDRESS": ""}),
+        ("import + in-process model", True, {"EMBEDDING_SERVER_ADDRESS": ""}),
+    ]
+    if args.embedding_server:
+        scenarios.append(("import + embedding server", True, {"EMBEDDING_SERVER_ADDRESS": args.embedding_server}))
+
+    results = [run_scenario(*scenario) for scenario in scenarios]
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for result in results:
+            if "error" in result:
+                print(f"{result['scenario']:<28} error: {result['error']}")
+                continue
+            first = f"{result['first_embedding_s']:.2f}s" if result["first_embedding_s"] is not None else "-"
+            rss = f"{result['peak_rss_mb']:.0f} MB" if result["peak_rss_mb"] is not None else "n/a"
+            print(f"{result['scenario']:<28} import {result['import_s']:.2f}s  first embedding {first:<7} peak RSS {rss}")
@@ -0,0 +1,31 @@
+"""
+Run the background cleanup queue to completion from the command line (the app's workers
+also do this on their own).
+
+    python scripts/run_cleanup.py              # run every due job, then print what is left
+    python scripts/run_cleanup.py --backfill   # first queue cascades for accounts deleted before
+                                               # the cleanup queue existed (orphaned projects/vectors)
+"""
+import sys
+import os
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src import database
+from src.cleanup import cleanup_worker
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run queued cleanup jobs")
+    parser.add_argument("--backfill", action="store_true", help="queue cleanup for already-deleted users' leftovers")
+    args = parser.parse_args()
+
+    database.init_db()
+    if args.backfill:
+        orphans = database.get_orphaned_user_ids()
+        for user_id in orphans:
+            database.enqueue_cleanup_job("account", {"user_id": user_id, "user_key": None})
+        print(f"🧹 Queued cleanup for {len(orphans)} deleted accounts")
+    ran = cleanup_worker.run_pending()
+    stats = database.get_cleanup_stats()
+    print(f"✅ Ran {ran} cleanup jobs ({cleanup_worker.failed} failed); still queued: {stats['pending'] or 'none'}")
@@ -0,0 +1,81 @@
+"""
+Local stand-in for an OTLP collector, for looking at request traces without a tracing backend.
+
+Accepts OTLP/HTTP JSON on /v1/traces (what the app sends with TRACE_EXPORT=otlp),
+appends each payload to a JSON-lines file and prints a per-request breakdown:
+
+    python scripts/trace_collector.py --port 4318 --output collected_traces.jsonl
+    TRACING_ENABLED=True TRACE_EXPORT=otlp python run.py
+"""
+import sys
+import os
+import json
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import uvicorn
+from fastapi import FastAPI, Request
+
+def span_ms(span):
+    return (int(span["endTimeUnixNano"]) - int(span["startTimeUnixNano"])) / 1e6
+
+def attribute(span, key):
+    for attr in span.get("attributes", []):
+        if attr["key"] == key:
+            return next(iter(attr["value"].values()))
+    return None
+
+def summarize(payload):
+    """One line for the request, then its spans in start order, indented by depth"""
+    spans = [
+        span
+        for resource in payload.get("resourceSpans", [])
+        for scope in resource.get("scopeSpans", [])
+        for span in scope.get("spans", [])
+    ]
+    by_id = {span["spanId"]: span for span in spans}
+
+    def depth(span):
+        level = 0
+        while span.get("parentSpanId") in by_id:
+            span = by_id[span["parentSpanId"]]
+            level += 1
+        return level
+
+    lines = []
+    for span in sorted(spans, key=lambda s: int(s["startTimeUnixNano"])):
+        detail = attribute(span, "db.statement") or attribute(span, "template") or ""
+        rows = attribute(span, "db.rows")
+        if rows is not None:
+            detail += f" [{rows} rows]"
+        lines.append(f"{'  ' * depth(span)}{span['name']:<40} {span_ms(span):9.2f} ms  {detail[:80]}")
+    return "\n".join(lines)
+
+def create_collector_app(output):
+    app = FastAPI(title="Trace collector")
+    app.state.received = 0
+
+    @app.post("/v1/traces")
+    async def receive(request: Request):
+        payload = await request.json()
+        app.state.received += 1
+        with open(output, "a") as f:
+            f.write(json.dumps(payload) + "\n")
+        print(summarize(payload) + "\n")
+        return {}
+
+    @app.get("/received")
+    async def received():
+        return {"traces": app.state.received}
+
+    return app
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=4318)
+    parser.add_argument("--output", default="collected_traces.jsonl")
+    args = parser.parse_args()
+
+    uvicorn.run(create_collector_app(args.output), host=args.host, port=args.port, log_level="warning")
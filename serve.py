@@ -0,0 +1,70 @@
+"""
+Production entry point: several worker processes behind one port.
+
+    python serve.py                      # WEB_CONCURRENCY workers on BIND_ADDRESS
+    python serve.py --workers 4 --bind 0.0.0.0:8000
+
+On Linux/macOS with gunicorn installed the app (and, with PRELOAD_MODELS, the
+embedding model) is loaded once in the master and forked, so the read-only
+weights are shared copy-on-write between workers. Elsewhere it falls back to
+uvicorn's process manager, where every worker loads its own copy; point
+EMBEDDING_SERVER_ADDRESS at scripts/embedding_server.py to share one instead.
+"""
+import sys
+import os
+import argparse
+
+# Add the project root to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from src.config import Config
+
+def load_app():
+    from src.app import app
+    if Config.PRELOAD_MODELS and not Config.EMBEDDING_SERVER_ADDRESS:
+        from src.embeddings import get_embedding_model
+        try:
+            get_embedding_model()
+        except Exception as e:
+            print(f"⚠️  Model preload failed, workers will load it themselves: {e}")
+    return app
+
+def run_gunicorn(bind, workers, timeout):
+    from gunicorn.app.base import BaseApplication
+
+    class ProductionServer(BaseApplication):
+        def load_config(self):
+            self.cfg.set("bind", bind)
+            self.cfg.set("workers", workers)
+            self.cfg.set("worker_class", "uvicorn.workers.UvicornWorker")
+            self.cfg.set("preload_app", True)
+            self.cfg.set("timeout", timeout)
+
+        def load(self):
+            return load_app()
+
+    ProductionServer().run()
+
+def run_uvicorn(bind, workers):
+    import uvicorn
+    host, _, port = bind.rpartition(":")
+    uvicorn.run("src.app:app", host=host or "0.0.0.0", port=int(port), workers=workers)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run DreamLayout with multiple worker processes")
+    parser.add_argument("--bind", default=Config.BIND_ADDRESS, help="host:port to listen on")
+    parser.add_argument("--workers", type=int, default=Config.WEB_CONCURRENCY)
+    parser.add_argument("--timeout", type=int, default=int(Config.LLM_TIMEOUT_SECONDS) + 30,
+                        help="seconds before gunicorn restarts a silent worker")
+    parser.add_argument("--no-gunicorn", action="store_true", help="use uvicorn's process manager")
+    args = parser.parse_args()
+
+    print(f"🚀 DreamLayout: {args.workers} worker(s) on {args.bind}")
+    try:
+        if args.no_gunicorn:
+            raise ImportError
+        import gunicorn  # noqa: F401  (Linux/macOS only)
+    except ImportError:
+        run_uvicorn(args.bind, args.workers)
+    else:
+        run_gunicorn(args.bind, args.workers, args.timeout)
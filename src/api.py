@@ -0,0 +1,164 @@
+from typing import Any, Dict, List, Literal, Optional, Union
+from fastapi import Request
+from fastapi.exceptions import RequestValidationError
+from fastapi.exception_handlers import request_validation_exception_handler
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, ConfigDict, Field, ValidationError
+
+try:
+    import orjson
+except ImportError:  # optional: the stdlib encoder is used without it
+    orjson = None
+    import json
+
+from src.database import BULK_PROJECT_ACTIONS
+from src.usage import QuotaExceededError
+
+def dumps(content):
+    """Encode JSON-compatible data to bytes (orjson when installed)"""
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+class APIResponse(JSONResponse):
+    """
+    JSON response for the /api routes. Models are encoded straight to bytes by pydantic-core
+    and plain dicts by orjson, skipping FastAPI's jsonable_encoder walk over every nested value
+    (slow for layouts carrying whole SVG documents). Handlers return it directly.
+    """
+    def render(self, content):
+        if isinstance(content, BaseModel):
+            return content.__pydantic_serializer__.to_json(content)
+        return dumps(content)
+
+class APIError(Exception):
+    """Raised from an /api handler to answer with {"success": false, "error": ...} and `status_code`"""
+    def __init__(self, status_code, error, headers=None):
+        super().__init__(error)
+        self.status_code = status_code
+        self.error = error
+        self.headers = headers
+
+async def api_error_handler(request: Request, exc: APIError):
+    return APIResponse(ErrorResponse(error=exc.error), status_code=exc.status_code, headers=exc.headers)
+
+def llm_error(exc):
+    """APIError for a failed LLM call: 429 with Retry-After when the user is over quota, otherwise 502"""
+    if isinstance(exc, QuotaExceededError):
+        return APIError(429, str(exc), headers={"Retry-After": str(int(exc.retry_after) + 1)})
+    return APIError(502, str(exc))
+
+async def validation_error_handler(request: Request, exc: RequestValidationError):
+    """Bad /api bodies get a 422 in the shape the pages already read (`data.error`)"""
+    if not request.url.path.startswith("/api/"):
+        return await request_validation_exception_handler(request, exc)
+    error = exc.errors()[0]
+    field = ".".join(str(part) for part in error["loc"] if part != "body")
+    return APIResponse(ErrorResponse(error=f"{field}: {error['msg']}" if field else error["msg"]), status_code=422)
+
+def api_user(request: Request):
+    """Dependency for /api routes: the signed-in user, or a 401 before the body is parsed"""
+    if not request.state.user:
+        raise APIError(401, "Unauthorized")
+    return request.state.user
+
+class LenientModel(BaseModel):
+    # Layouts come from the LLM and the browser; fields we do not know about are kept as they are
+    model_config = ConfigDict(extra="allow")
+
+class Floor(LenientModel):
+    floor_name: str = ""
+    svg: str = ""
+    rooms: List[Dict[str, Any]] = []
+
+class Layout(LenientModel):
+    title: str = "New Proposal"
+    description: str = ""
+    floors: List[Floor] = []
+    # Legacy single-floor layouts carry the SVG and room list at the top level
+    svg: Optional[str] = None
+    rooms: Optional[List[Dict[str, Any]]] = None
+    conversational_response: str = ""
+    design_code: Optional[str] = None
+
+def generated(model, result):
+    """Type LLM output (a Layout or Floor); a failed or malformed generation becomes a 502"""
+    if "error" in result:
+        raise APIError(502, result["error"])
+    try:
+        return model.model_validate(result)
+    except ValidationError:
+        raise APIError(502, "Failed to parse layout data")
+
+# Requests
+
+class GenerateRequest(BaseModel):
+    venture_type: Optional[str] = None
+    area: Union[float, str, None] = None
+    dimensions: List[Any] = []
+    prompt: Optional[str] = None
+
+class GenerateVariantsRequest(GenerateRequest):
+    count: int = 3
+
+class SaveProjectRequest(BaseModel):
+    layout: Layout
+
+class BulkActionRequest(BaseModel):
+    project_ids: List[int] = Field(min_length=1)
+    action: Literal[tuple(BULK_PROJECT_ACTIONS) + ("favourite", "public")]
+    # 1 for public/favourite, 0 for private/unfavourite
+    value: Literal[0, 1] = 1
+
+class ChatRequest(BaseModel):
+    message: str = Field(min_length=1)
+    mode: Optional[Literal["chat", "edit"]] = None
+    # Saved projects are keyed by project_id; previews send their layout once, then reuse session_id
+    project_id: Optional[int] = None
+    session_id: Optional[str] = None
+    layout: Optional[Layout] = None
+    floor_index: int = 0
+
+# Responses
+
+class ErrorResponse(BaseModel):
+    success: bool = False
+    error: str
+
+class SuccessResponse(BaseModel):
+    success: bool = True
+
+class LayoutResponse(SuccessResponse):
+    layout: Layout
+
+class GenerateLayoutResponse(LayoutResponse):
+    project_id: int
+    cloudinary_url: Optional[str] = None
+
+class SaveProjectResponse(SuccessResponse):
+    project_id: int
+
+class BulkActionResponse(SuccessResponse):
+    # Per project ID for delete/restore/permanent_delete
+    results: Dict[int, Literal["ok", "unchanged", "not_found"]] = {}
+    changed: int = 0
+    error: Optional[str] = None
+
+class ChatResponse(SuccessResponse):
+    response: str
+    session_id: Optional[str] = None
+
+class UsageResponse(BaseModel):
+    day: str
+    tokens_used: int
+    daily_token_budget: Optional[int] = None
+    calls_last_minute: int
+    calls_per_minute_limit: Optional[int] = None
+
+class ChatEditResponse(SuccessResponse):
+    response: str
+    floor_index: int
+    floor: Floor
+
+# Error statuses documented on every /api route (body: ErrorResponse)
+API_ERRORS = {status: {"model": ErrorResponse} for status in (400, 401, 403, 409, 422, 429, 502)}
@@ -1,37 +1,86 @@
 import os
 import time
+import threading
+from contextlib import asynccontextmanager
+
+from src.config import Config
+from src.startup import startup
+
+if Config.STARTUP_PROFILE:
+    # Installed before the imports below so they show up in the report
+    startup.enable_profiling()
+_imports_started = time.perf_counter()
+
 from fastapi import FastAPI, Request, Response, Depends, HTTPException, status
-from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
+from jinja2 import FileSystemBytecodeCache
 from fastapi.responses import RedirectResponse
+from fastapi.exceptions import RequestValidationError
 from itsdangerous import URLSafeSerializer
 
-import cloudinary
-import cloudinary.uploader
-import cloudinary.api
-
-from src.config import Config
-
-cloudinary.config(
-    cloud_name=Config.CLOUDINARY_CLOUD_NAME,
-    api_key=Config.CLOUDINARY_API_KEY,
-    api_secret=Config.CLOUDINARY_API_SECRET,
-    secure=True
-)
+# faiss, torch, langchain and cloudinary are imported on first use, not here
 from src.database import get_user_by_id, init_db, init_faiss
+from src.embeddings import warm_embeddings
+from src.layout_generator import layout_generator
 from src.models import User
 from src.fastapi_utils import SessionManager, get_flashed_messages, current_user_func, url_for
+from src.metrics import http_requests, http_latency
+from src.tracing import should_sample, start_trace, finish_trace, span
+from src.profiling import profile_trigger, start_profile, save_profile
+from src.static_assets import FingerprintedStaticFiles, manifest, precompress_static
+from src.compression import CompressionMiddleware
+from src.fragment_cache import project_card_renderer
+from src.cleanup import cleanup_worker
+from src.email_outbox import email_outbox
+from src.usage import usage_ledger
+from src.avatars import avatar_url
+from src.api import APIError, api_error_handler, validation_error_handler
 
-def create_app():
-    # Initialize Databases
-    init_db()
-    init_faiss()
+def warm_components():
+    """Initialize the ML side of the app in the background; /readyz reports progress"""
+    startup.run("static", precompress_static)
+    startup.run("templates", precompile_templates)
+    startup.run("faiss", init_faiss)
+    startup.run("embeddings", warm_embeddings)
+    startup.run("llm", layout_generator.warm)
+    if Config.STARTUP_PROFILE:
+        print(startup.report())
+
+def precompile_templates():
+    """Compile every template now (from the bytecode cache when it is warm) instead of on first view"""
+    for name in templates.env.list_templates(extensions=["html"]):
+        templates.env.get_template(name)
 
-    app = FastAPI(title="DreamLayout")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # The SQLite schema is quick and auth needs it, so it is ready before the first request
+    startup.run("database", init_db)
+    startup.expect("static", "templates", "faiss", "embeddings", "llm")
+    # Daemon thread: a slow model download must not hold up shutdown or a reload
+    threading.Thread(target=warm_components, name="warmup", daemon=True).start()
+    if Config.CLEANUP_WORKER:
+        cleanup_worker.start()
+    if Config.EMAIL_WORKER:
+        email_outbox.start()
+    usage_ledger.start()
+    yield
+    await email_outbox.stop()
+    usage_ledger.flush()
 
-    # Static files & Templates
-    app.mount("/static", StaticFiles(directory="static"), name="static")
+def create_app():
+    app = FastAPI(title="DreamLayout", lifespan=lifespan)
+
+    # Static files & Templates: fingerprinted URLs (static_url) are cached for a year
+    manifest.build()
+    app.mount("/static", FingerprintedStaticFiles(
+        directory=Config.STATIC_DIR, manifest=manifest, compressed_dir=Config.STATIC_CACHE_DIR
+    ), name="static")
     templates = Jinja2Templates(directory="templates")
+    if Config.TEMPLATE_CACHE_DIR:
+        os.makedirs(Config.TEMPLATE_CACHE_DIR, exist_ok=True)
+        templates.env.bytecode_cache = FileSystemBytecodeCache(Config.TEMPLATE_CACHE_DIR)
+    # Outside debug, skip the per-render stat() that checks templates for edits
+    templates.env.auto_reload = Config.DEBUG
     
     # Session Manager
     session_manager = SessionManager(Config.SECRET_KEY)
@@ -40,11 +89,22 @@ def create_app():
     templates.env.globals['get_flashed_messages'] = get_flashed_messages
     templates.env.globals['current_user'] = current_user_func
     templates.env.globals['url_for'] = url_for
+    templates.env.globals['static_url'] = manifest.url
+    templates.env.globals['project_card'] = project_card_renderer(templates.env)
+    templates.env.globals['avatar_url'] = avatar_url
     import json
     templates.env.filters['tojson'] = lambda d: json.dumps(d, default=str)
 
+    if Config.COMPRESSION_ENABLED:
+        # Innermost, so the metrics and traces below include compression time
+        app.add_middleware(CompressionMiddleware)
+
     @app.middleware("http")
     async def session_middleware(request: Request, call_next):
+        if request.url.path.startswith("/static/"):
+            # No user lookup, and no Set-Cookie that would keep shared caches from storing assets
+            return await call_next(request)
+
         # 1. Load Session
         request.state.session = session_manager.get_session(request)
         
@@ -52,7 +112,8 @@ def create_app():
         user_id = request.state.session.get("user_id")
         request.state.user = None
         if user_id:
-            user_data = get_user_by_id(user_id)
+            with span("session.user_lookup"):
+                user_data = get_user_by_id(user_id)
             if user_data:
                 # SELECT id, name, email, about, profile_pic, location, user_key FROM users
                 request.state.user = User(
@@ -67,17 +128,69 @@ def create_app():
         session_manager.save_session(response, request.state.session)
         return response
 
+    if Config.METRICS_ENABLED:
+        # Registered last so it wraps the session middleware too
+        @app.middleware("http")
+        async def metrics_middleware(request: Request, call_next):
+            started = time.perf_counter()
+            status_code = 500
+            try:
+                response = await call_next(request)
+                status_code = response.status_code
+                return response
+            finally:
+                # Label by route template (/project/{project_id}), never the raw path
+                route = request.scope.get("route")
+                path = getattr(route, "path", None)
+                if path is None:
+                    path = "/static" if request.url.path.startswith("/static/") else "unmatched"
+                http_latency.observe(time.perf_counter() - started, method=request.method, route=path)
+                http_requests.inc(method=request.method, route=path, status=str(status_code))
+
+    # Registered after metrics so a trace covers the whole request, including the other middleware
+    if Config.TRACING_ENABLED or Config.ADMIN_TOKEN:
+        @app.middleware("http")
+        async def tracing_middleware(request: Request, call_next):
+            profile = profile_trigger.should_profile(request)
+            if not profile and not should_sample(request):
+                return await call_next(request)
+
+            trace, tokens = start_trace(f"{request.method} {request.url.path}")
+            sampler = start_profile() if profile else None
+            status_code = 500
+            try:
+                response = await call_next(request)
+                status_code = response.status_code
+                response.headers["X-Trace-Id"] = trace.trace_id
+                return response
+            finally:
+                route = getattr(request.scope.get("route"), "path", None)
+                if route:
+                    trace.name = f"{request.method} {route}"
+                trace.attrs.update({"http.method": request.method, "http.target": request.url.path,
+                                    "http.route": route or "", "http.status_code": status_code})
+                if sampler:
+                    trace.attrs["profile.file"] = save_profile(sampler.stop(), trace.name)
+                finish_trace(trace, tokens)
+
+    # /api errors answer {"success": false, "error": ...} with a real status code
+    app.add_exception_handler(APIError, api_error_handler)
+    app.add_exception_handler(RequestValidationError, validation_error_handler)
+
     # Attach templates to app for routers to use
     app.state.templates = templates
 
     # Include Routers
     from src.routes import auth_router
     from src.main_routes import main_router
+    from src.health_routes import health_router
     
     app.include_router(auth_router)
     app.include_router(main_router)
+    app.include_router(health_router)
 
     return app, templates
 
 app, templates = create_app()
+startup.record("import src.app", time.perf_counter() - _imports_started)
 
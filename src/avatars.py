@@ -0,0 +1,124 @@
+import io
+import re
+import asyncio
+import hashlib
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+from starlette.requests import Request
+from starlette.concurrency import run_in_threadpool
+from src.config import Config
+from src.utils import get_cloudinary, cloudinary_public_id
+from src.metrics import stage_timer
+
+# Square WebP sizes stored per avatar: nav bubble, settings preview, profile header (all at 2x)
+AVATAR_SIZES = (320, 192, 96)
+# Content-addressed names, e.g. .../u_<key>/avatar_3f9a0c12de_320.webp
+AVATAR_NAME = re.compile(r"/avatar_([0-9a-f]+)_(\d+)\.webp$")
+
+_pool = None
+
+class AvatarError(Exception):
+    """The upload cannot become an avatar (too large, not an image); the message is shown to the user"""
+
+def _get_pool():
+    # Threads rather than processes: Pillow releases the GIL while decoding, resizing and encoding,
+    # and the pool size bounds how many decoded images are in memory at once
+    global _pool
+    if _pool is None:
+        _pool = ThreadPoolExecutor(max_workers=Config.AVATAR_WORKERS, thread_name_prefix="avatar")
+    return _pool
+
+async def read_limited_form(request: Request, max_bytes):
+    """
+    Parse a multipart form with the body capped at `max_bytes`. File parts are streamed into
+    spooled temp files (1 MB in memory, the rest on disk) and never held in memory whole.
+    """
+    limit_message = f"Image is too large (max {max_bytes / (1024 * 1024):g} MB)."
+    content_length = request.headers.get("content-length", "")
+    if content_length.isdigit() and int(content_length) > max_bytes:
+        raise AvatarError(limit_message)
+    received = 0
+
+    async def receive():
+        nonlocal received
+        message = await request.receive()
+        received += len(message.get("body", b""))
+        if received > max_bytes:
+            raise AvatarError(limit_message)
+        return message
+
+    return await Request(request.scope, receive).form(max_files=1, max_fields=10)
+
+def render_avatar_sizes(file):
+    """Decode an uploaded image once and return {size: WebP bytes} for AVATAR_SIZES (runs in the pool)"""
+    from PIL import Image, ImageOps
+    Image.MAX_IMAGE_PIXELS = Config.AVATAR_MAX_PIXELS
+    largest = max(AVATAR_SIZES)
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("error", Image.DecompressionBombWarning)
+            image = Image.open(file)
+            # JPEG decodes straight to a 1/2..1/8 scale instead of inflating every pixel of a camera photo
+            image.draft("RGB", (largest * 2, largest * 2))
+            image = ImageOps.exif_transpose(image)
+    except (Image.DecompressionBombError, Image.DecompressionBombWarning):
+        raise AvatarError("Image dimensions are too large.")
+    except (OSError, SyntaxError, ValueError):
+        raise AvatarError("Could not read that image. Please upload a PNG, JPG, GIF or WebP.")
+
+    has_alpha = image.mode in ("RGBA", "LA", "PA") or (image.mode == "P" and "transparency" in image.info)
+    image = image.convert("RGBA" if has_alpha else "RGB")
+    square = ImageOps.fit(image, (largest, largest), Image.LANCZOS)
+    variants = {}
+    for size in AVATAR_SIZES:
+        resized = square if size == largest else square.resize((size, size), Image.LANCZOS)
+        buffer = io.BytesIO()
+        resized.save(buffer, "WEBP", quality=Config.AVATAR_WEBP_QUALITY, method=4)
+        variants[size] = buffer.getvalue()
+    return variants
+
+async def store_avatar(upload, user_key):
+    """Resize an uploaded avatar and upload every size; returns the URL to save on the user"""
+    upload.file.seek(0)
+    loop = asyncio.get_running_loop()
+    with stage_timer("avatar.resize"):
+        variants = await loop.run_in_executor(_get_pool(), render_avatar_sizes, upload.file)
+
+    digest = hashlib.blake2b(variants[max(AVATAR_SIZES)], digest_size=5).hexdigest()
+
+    def upload_size(size):
+        return get_cloudinary().uploader.upload(
+            variants[size],
+            folder=f"dreamlayout_profiles/u_{user_key}",
+            public_id=f"avatar_{digest}_{size}",
+            format="webp",
+            overwrite=True,
+            resource_type="image"
+        )["secure_url"]
+
+    with stage_timer("cloudinary.upload_avatar"):
+        urls = await asyncio.gather(*(run_in_threadpool(upload_size, size) for size in AVATAR_SIZES))
+    # Names change with the content, so the version segment is not needed to bust caches
+    return re.sub(r"/v\d+/", "/", urls[0], count=1)
+
+def avatar_url(user, size):
+    """Jinja global: URL of the user's avatar for a `size`-pixel slot (avatars from before resizing are returned as is)"""
+    url = user.profile_pic
+    if not url:
+        return ""
+    match = AVATAR_NAME.search(url)
+    if match is None:
+        return (url if 'http' in url else '/static/' + url) + '?v=' + (user.user_key or '')[:8]
+    fitting = min((s for s in AVATAR_SIZES if s >= size), default=max(AVATAR_SIZES))
+    return f"{url[:match.start()]}/avatar_{match.group(1)}_{fitting}.webp"
+
+def avatar_public_ids(url):
+    """Every stored size of the avatar behind `url` (for deleting a replaced avatar)"""
+    public_id = cloudinary_public_id(url)
+    if not public_id:
+        return []
+    match = AVATAR_NAME.search("/" + public_id + ".webp")
+    if match is None:
+        return [public_id]
+    prefix = public_id[:public_id.rindex("_")]
+    return [f"{prefix}_{size}" for size in AVATAR_SIZES]
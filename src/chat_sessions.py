@@ -0,0 +1,127 @@
+import time
+import threading
+from collections import OrderedDict
+from src.config import Config
+
+def estimate_tokens(text):
+    """Cheap token estimate (~4 characters per token) used for history budgeting"""
+    return len(text) // 4 + 1
+
+def compact_layout_context(layout):
+    """Build the static system prompt for a layout once, so every turn shares the same prefix"""
+    lines = []
+    for floor in layout.get("floors") or []:
+        lines.append(f"Floor: {floor.get('floor_name')}")
+        for room in floor.get("rooms", []):
+            lines.append(f"- {room.get('id')}. {room.get('name')} ({room.get('size')})")
+    if not lines and layout.get("rooms"):
+        lines.extend(f"- {room.get('id')}. {room.get('name')} ({room.get('size')})" for room in layout["rooms"])
+    rooms_summary = "\n".join(lines)
+
+    return f"""You are an expert architect assistant. You are discussing a specific layout you just generated.
+
+LAYOUT CONTEXT:
+Venture: {layout.get('venture_type') or layout.get('title') or 'Custom Project'}
+Area: {layout.get('area', 'Optimal')}
+Description: {layout.get('description', '')}
+
+ROOMS & COMPONENTS:
+{rooms_summary}
+
+The user has a question or comment about this specific design.
+Answer professionally, keeping the architectural context in mind.
+If they ask for changes, explain how they might be implemented or give professional advice.
+Keep responses concise but helpful."""
+
+class ChatSession:
+    """Conversation about one layout: a fixed context prefix, recent turns and a rolling summary"""
+    def __init__(self, key, layout):
+        self.key = key
+        self.context = compact_layout_context(layout)
+        self.summary = ""
+        self.history = []
+        self.last_used = time.time()
+
+    def set_layout(self, layout):
+        """Recompute the context after the layout changed; history is kept"""
+        self.context = compact_layout_context(layout)
+
+    def build_messages(self, message):
+        messages = [("system", self.context)]
+        if self.summary:
+            messages.append(("system", f"Summary of the earlier conversation:\n{self.summary}"))
+        messages.extend(self.history)
+        messages.append(("human", message))
+        return messages
+
+    def add_turn(self, message, reply):
+        self.history.append(("human", message))
+        self.history.append(("ai", reply))
+        self.last_used = time.time()
+        self._compact()
+
+    def _compact(self):
+        """Fold the oldest turns into the summary until the history fits the token budget"""
+        budget = Config.CHAT_HISTORY_TOKEN_BUDGET
+        while len(self.history) > 2 and sum(estimate_tokens(text) for _, text in self.history) > budget:
+            (_, question), (_, answer) = self.history[0], self.history[1]
+            self.history = self.history[2:]
+            self.summary += f"- User asked: {_first_sentence(question)} You answered: {_first_sentence(answer)}\n"
+
+        # Keep the summary itself bounded, dropping the oldest lines first
+        max_chars = Config.CHAT_SUMMARY_TOKEN_BUDGET * 4
+        while len(self.summary) > max_chars and "\n" in self.summary[:-1]:
+            self.summary = self.summary.split("\n", 1)[1]
+
+def _first_sentence(text, limit=160):
+    text = " ".join(text.split())
+    for stop in (". ", "? ", "! "):
+        if stop in text:
+            text = text.split(stop, 1)[0] + stop.strip()
+            break
+    return text if len(text) <= limit else text[:limit].rstrip() + "..."
+
+class ChatSessionStore:
+    """In-memory LRU of chat sessions with idle expiry"""
+    def __init__(self, max_sessions, ttl_seconds):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def get(self, key):
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is None:
+                return None
+            if time.time() - session.last_used > self.ttl_seconds:
+                del self._sessions[key]
+                return None
+            self._sessions.move_to_end(key)
+            return session
+
+    def create(self, key, layout):
+        session = ChatSession(key, layout)
+        with self._lock:
+            self._sessions[key] = session
+            self._sessions.move_to_end(key)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        return session
+
+    def refresh_layout(self, key, layout):
+        session = self.get(key)
+        if session:
+            session.set_layout(layout)
+
+def project_session_key(user_id, project_id):
+    return f"u{user_id}:p{project_id}"
+
+def preview_session_key(user_id, session_id):
+    """Key for chats about unsaved previews, identified by a server-issued session id"""
+    return f"u{user_id}:s{session_id}"
+
+chat_sessions = ChatSessionStore(Config.CHAT_MAX_SESSIONS, Config.CHAT_SESSION_TTL_SECONDS)
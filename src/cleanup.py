@@ -0,0 +1,115 @@
+import threading
+from src.config import Config
+from src import database
+from src.utils import get_cloudinary
+
+# Cloudinary's Admin API takes at most 100 public IDs per delete_resources call
+ASSET_DELETE_BATCH = 100
+# delete_resources_by_prefix removes up to 1000 resources per call and reports "partial" while more remain
+MAX_PREFIX_CALLS = 100
+
+class PartialCleanup(Exception):
+    """A job failed part-way; `remaining` is the payload still left to do"""
+    def __init__(self, error, remaining):
+        super().__init__(str(error))
+        self.remaining = remaining
+
+def delete_assets(public_ids):
+    """Delete uploads in batches; on failure, the IDs not yet deleted travel with the retry"""
+    api = get_cloudinary().api
+    for start in range(0, len(public_ids), ASSET_DELETE_BATCH):
+        try:
+            api.delete_resources(public_ids[start:start + ASSET_DELETE_BATCH], resource_type="image")
+        except Exception as e:
+            raise PartialCleanup(e, {"public_ids": public_ids[start:]})
+
+def delete_folder(folder):
+    """Delete everything under a Cloudinary folder, then the (now empty) folder itself"""
+    api = get_cloudinary().api
+    for _ in range(MAX_PREFIX_CALLS):
+        if not api.delete_resources_by_prefix(folder + "/").get("partial"):
+            break
+    try:
+        api.delete_folder(folder)
+    except Exception as e:
+        # An empty folder costs no storage; missing or non-empty folders are not worth a retry
+        print(f"Cloudinary cleanup notice: {e}")
+
+def delete_account(payload):
+    """Cascade for a deleted user: projects in batches, their FAISS vector, then their Cloudinary folders"""
+    user_id, user_key = payload["user_id"], payload.get("user_key")
+    # With the user_key, the folder deletes below remove every upload at once; accounts found by
+    # the backfill have no key, so their projects' uploads are queued one by one instead
+    while database.delete_user_projects_batch(user_id, Config.CLEANUP_BATCH_SIZE, enqueue_assets=not user_key):
+        pass
+    database.remove_users_from_faiss([user_id])
+    if user_key:
+        delete_folder(f"dreamlayout_profiles/u_{user_key}")
+        delete_folder(f"dreamlayout_projects/u_{user_key}")
+
+def index_user(payload):
+    """Add a new account's FAISS vector when the add after signup failed (e.g. the model could not load)"""
+    user = database.get_user_by_id(payload["user_id"])
+    if user is None or user[0] in database.load_user_mapping().values():
+        return
+    database.add_user_to_faiss(user[0], user[2], user[1])
+
+HANDLERS = {
+    "account": delete_account,
+    "index_user": index_user,
+    "assets": lambda payload: delete_assets(payload["public_ids"]),
+}
+
+class CleanupWorker:
+    """
+    Runs queued cleanup jobs (the cleanup_jobs table) on a daemon thread in each worker process.
+    A claimed job is leased, so two workers never run it at once, and a failed one is retried
+    with exponential backoff. Every job is safe to run again from the start.
+    """
+    def __init__(self):
+        self.completed = 0
+        self.failed = 0
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="cleanup", daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        while True:
+            database.cleanup_queued.clear()
+            try:
+                self.run_pending()
+            except Exception as e:
+                print(f"⚠️  Cleanup worker: {e}")
+            database.cleanup_queued.wait(Config.CLEANUP_POLL_SECONDS)
+
+    def run_pending(self, limit=None):
+        """Run due jobs until none are left (or `limit` have run); returns how many ran"""
+        ran = 0
+        while limit is None or ran < limit:
+            job = database.claim_cleanup_job(Config.CLEANUP_LEASE_SECONDS)
+            if job is None:
+                break
+            self.run_job(*job)
+            ran += 1
+        return ran
+
+    def run_job(self, job_id, kind, payload, attempts):
+        try:
+            HANDLERS[kind](payload)
+        except Exception as e:
+            self.failed += 1
+            delay = min(Config.CLEANUP_MAX_BACKOFF_SECONDS, 10 * 2 ** (attempts - 1))
+            print(f"⚠️  Cleanup job {job_id} ({kind}) failed on attempt {attempts}, retrying in {delay}s: {e}")
+            remaining = e.remaining if isinstance(e, PartialCleanup) else None
+            database.retry_cleanup_job(job_id, str(e), delay, remaining)
+        else:
+            database.finish_cleanup_job(job_id)
+            self.completed += 1
+
+cleanup_worker = CleanupWorker()
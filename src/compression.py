@@ -0,0 +1,113 @@
+import gzip
+import hashlib
+from starlette.datastructures import Headers, MutableHeaders
+from src.config import Config
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+COMPRESSIBLE_TYPES = ("text/", "application/json", "application/javascript", "application/x-ndjson", "image/svg+xml")
+
+def accepted_encoding(accept_encoding):
+    """Best encoding the client accepts: "br", "gzip" or None"""
+    offered = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        offered[name.strip()] = quality
+    if brotli is not None and offered.get("br", 0) > 0:
+        return "br"
+    if offered.get("gzip", 0) > 0:
+        return "gzip"
+    return None
+
+def compress(body, encoding):
+    if encoding == "br":
+        return brotli.compress(body, quality=Config.COMPRESSION_BROTLI_QUALITY)
+    return gzip.compress(body, Config.COMPRESSION_GZIP_LEVEL, mtime=0)
+
+def etag_matches(if_none_match, etag):
+    if if_none_match.strip() == "*":
+        return True
+    # Weak comparison (RFC 9110): W/"x" and "x" are the same validator
+    def opaque(tag):
+        tag = tag.strip()
+        return tag[2:] if tag.startswith("W/") else tag
+    return opaque(etag) in {opaque(tag) for tag in if_none_match.split(",")}
+
+class CompressionMiddleware:
+    """
+    gzip/brotli for buffered text responses, and ETag + If-None-Match for HTML pages.
+
+    Only single-message bodies (rendered templates, JSON) are touched; streamed
+    responses (NDJSON variants, static files) pass through as they are.
+    """
+    def __init__(self, app, minimum_size=None):
+        self.app = app
+        self.minimum_size = Config.COMPRESSION_MIN_SIZE if minimum_size is None else minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_headers = Headers(scope=scope)
+        encoding = accepted_encoding(request_headers.get("accept-encoding", ""))
+        if_none_match = request_headers.get("if-none-match")
+        # HEAD bodies are empty, so they cannot carry a body hash
+        is_get = scope["method"] == "GET"
+        start = None
+        streaming = False
+
+        async def buffered_send(message):
+            nonlocal start, streaming
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            if message["type"] != "http.response.body" or streaming:
+                await send(message)
+                return
+            if message.get("more_body"):
+                # A streamed body: send what was held back and stay out of the way
+                streaming = True
+                await send(start)
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            headers = MutableHeaders(raw=start["headers"])
+            content_type = headers.get("content-type", "")
+
+            if is_get and start["status"] == 200 and content_type.startswith("text/html") \
+                    and "etag" not in headers:
+                etag = 'W/"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+                headers["ETag"] = etag
+                if "cache-control" not in headers:
+                    # Pages are per user: the browser may keep a copy but must revalidate it
+                    headers["Cache-Control"] = "private, no-cache"
+                if if_none_match and etag_matches(if_none_match, etag):
+                    del headers["content-type"]
+                    del headers["content-length"]
+                    await send({"type": "http.response.start", "status": 304, "headers": headers.raw})
+                    await send({"type": "http.response.body", "body": b""})
+                    return
+
+            if len(body) >= self.minimum_size and "content-encoding" not in headers \
+                    and content_type.startswith(COMPRESSIBLE_TYPES):
+                headers.add_vary_header("Accept-Encoding")
+                if encoding:
+                    body = compress(body, encoding)
+                    headers["Content-Encoding"] = encoding
+                    headers["Content-Length"] = str(len(body))
+
+            await send(start)
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, buffered_send)
@@ -1,16 +1,42 @@
 import os
+import time
+import secrets
 from dotenv import load_dotenv
 
 load_dotenv()
 
+def load_or_create_secret_key(path):
+    """
+    Session signing key shared by every worker: read from `path`, or created there
+    by whichever process gets to it first (a per-process random key breaks sessions
+    as soon as a request lands on another worker).
+    """
+    try:
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        for _ in range(100):
+            with open(path) as f:
+                key = f.read().strip()
+            if key:
+                return key
+            time.sleep(0.01)  # another worker created the file and is still writing it
+        raise RuntimeError(f"Secret key file {path} is empty")
+    key = secrets.token_hex(32)
+    with os.fdopen(fd, "w") as f:
+        f.write(key)
+    return key
+
 class Config:
     """Application configuration"""
-    SECRET_KEY = os.getenv('SECRET_KEY', os.urandom(24))
+    SECRET_KEY_FILE = os.getenv('SECRET_KEY_FILE', '.secret_key')
+    SECRET_KEY = os.getenv('SECRET_KEY') or load_or_create_secret_key(SECRET_KEY_FILE)
     
     # Database paths
     DB_PATH = os.getenv('DB_PATH', 'users.db')
     FAISS_INDEX_PATH = os.getenv('FAISS_INDEX_PATH', 'user_embeddings.index')
     USER_MAPPING_PATH = os.getenv('USER_MAPPING_PATH', 'user_id_mapping.pkl')
+    # Seconds a connection waits for another worker's write lock before "database is locked"
+    SQLITE_BUSY_TIMEOUT = float(os.getenv('SQLITE_BUSY_TIMEOUT', '30'))
     
     # Flask settings
     DEBUG = os.getenv('DEBUG', 'True') == 'True'
@@ -19,24 +45,142 @@ class Config:
     # Embedding model
     EMBEDDING_MODEL = 'all-MiniLM-L6-v2'
     EMBEDDING_DIMENSION = 384
+    # Optional shared embedding process ("127.0.0.1:8765" or a unix socket path); empty = load in-process
+    EMBEDDING_SERVER_ADDRESS = os.getenv('EMBEDDING_SERVER_ADDRESS', '')
+    # Shared secret for the embedding socket; empty = read (or create, mode 0600) EMBEDDING_SERVER_AUTHKEY_FILE
+    EMBEDDING_SERVER_AUTHKEY = os.getenv('EMBEDDING_SERVER_AUTHKEY', '')
+    EMBEDDING_SERVER_AUTHKEY_FILE = os.getenv('EMBEDDING_SERVER_AUTHKEY_FILE', '.embedding_authkey')
+    EMBEDDING_BATCH_SIZE = int(os.getenv('EMBEDDING_BATCH_SIZE', '64'))
+    EMBEDDING_BATCH_WAIT_MS = float(os.getenv('EMBEDDING_BATCH_WAIT_MS', '5'))
+    EMBEDDING_MICRO_BATCH = os.getenv('EMBEDDING_MICRO_BATCH', 'True') == 'True'
+    EMBEDDING_CACHE_SIZE = int(os.getenv('EMBEDDING_CACHE_SIZE', '10000'))  # 0 disables the cache
+    # "torch" or "onnx" (quantized int8 on CPU, needs sentence-transformers[onnx])
+    EMBEDDING_BACKEND = os.getenv('EMBEDDING_BACKEND', 'torch')
+    EMBEDDING_ONNX_FILE = os.getenv('EMBEDDING_ONNX_FILE', 'onnx/model_qint8_avx2.onnx')
     
     # Upload Settings
     UPLOAD_FOLDER = 'static/uploads/profiles'
-    ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
+    # Avatars: the settings form body is capped, and images are decoded/resized to WebP in a small thread pool
+    AVATAR_MAX_UPLOAD_MB = float(os.getenv('AVATAR_MAX_UPLOAD_MB', '10'))
+    AVATAR_MAX_PIXELS = int(os.getenv('AVATAR_MAX_PIXELS', '40000000'))  # larger images are refused undecoded
+    AVATAR_WORKERS = int(os.getenv('AVATAR_WORKERS', '2'))
+    AVATAR_WEBP_QUALITY = int(os.getenv('AVATAR_WEBP_QUALITY', '82'))
+    STATIC_DIR = 'static'
+    # Precompressed .gz/.br copies of static text assets, keyed by content hash
+    STATIC_CACHE_DIR = os.getenv('STATIC_CACHE_DIR', '.static_cache')
+
+    # Compiled templates are cached on disk so restarts and new workers skip the Jinja compile step
+    TEMPLATE_CACHE_DIR = os.getenv('TEMPLATE_CACHE_DIR', '.template_cache')
+    # Rendered project cards kept per worker, keyed by (project, updated_at); 0 disables
+    FRAGMENT_CACHE_MB = float(os.getenv('FRAGMENT_CACHE_MB', '16'))
+
+    # Parsed project rows kept per worker for views and chat turns, bounded by size; 0 disables
+    PROJECT_CACHE_MB = float(os.getenv('PROJECT_CACHE_MB', '32'))
+
+    # Newest public projects shown on /templates, served from an in-memory snapshot
+    GALLERY_SIZE = int(os.getenv('GALLERY_SIZE', '50'))
+
+    # gzip/brotli for HTML and JSON responses (brotli when the Brotli package is installed)
+    COMPRESSION_ENABLED = os.getenv('COMPRESSION_ENABLED', 'True') == 'True'
+    COMPRESSION_MIN_SIZE = int(os.getenv('COMPRESSION_MIN_SIZE', '500'))
+    COMPRESSION_GZIP_LEVEL = int(os.getenv('COMPRESSION_GZIP_LEVEL', '6'))
+    COMPRESSION_BROTLI_QUALITY = int(os.getenv('COMPRESSION_BROTLI_QUALITY', '4'))
+    ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
     
     # Cloudinary Settings
     CLOUDINARY_CLOUD_NAME = os.getenv('CLOUDINARY_CLOUD_NAME', 'dys7uqgs8')
     CLOUDINARY_API_KEY = os.getenv('CLOUDINARY_API_KEY', '499189479929149')
     CLOUDINARY_API_SECRET = os.getenv('CLOUDINARY_API_SECRET', 'EpzRI8Q9EyACpEugEFd97id3XIY')
+    # "cloudinary", or "stub" to fake uploads offline (benchmarks, local dev)
+    CLOUDINARY_BACKEND = os.getenv('CLOUDINARY_BACKEND', 'cloudinary')
+
+    # Background cleanup (account cascades, Cloudinary deletes of removed projects), queued in SQLite
+    CLEANUP_WORKER = os.getenv('CLEANUP_WORKER', 'True') == 'True'
+    CLEANUP_POLL_SECONDS = float(os.getenv('CLEANUP_POLL_SECONDS', '30'))
+    CLEANUP_BATCH_SIZE = int(os.getenv('CLEANUP_BATCH_SIZE', '200'))  # projects deleted per transaction
+    CLEANUP_LEASE_SECONDS = int(os.getenv('CLEANUP_LEASE_SECONDS', '300'))  # a crashed worker's job is retried after this
+    CLEANUP_MAX_BACKOFF_SECONDS = int(os.getenv('CLEANUP_MAX_BACKOFF_SECONDS', '3600'))
+
+    # Email (Resend); without an API key emails are printed to the console instead of sent
+    RESEND_API_KEY = os.getenv('RESEND_API_KEY', '')
+    MAIL_DEFAULT_SENDER = os.getenv('MAIL_DEFAULT_SENDER', 'onboarding@resend.dev')
+    # "resend", "console" (print instead of sending) or "capture" (keep in memory / EMAIL_CAPTURE_FILE, for tests)
+    EMAIL_BACKEND = os.getenv('EMAIL_BACKEND', 'resend' if RESEND_API_KEY else 'console')
+    EMAIL_CAPTURE_FILE = os.getenv('EMAIL_CAPTURE_FILE', '')
+    # Emails are queued in SQLite and sent by an async task in each worker
+    EMAIL_WORKER = os.getenv('EMAIL_WORKER', 'True') == 'True'
+    EMAIL_POLL_SECONDS = float(os.getenv('EMAIL_POLL_SECONDS', '10'))
+    EMAIL_TIMEOUT_SECONDS = float(os.getenv('EMAIL_TIMEOUT_SECONDS', '10'))
+    EMAIL_MAX_ATTEMPTS = int(os.getenv('EMAIL_MAX_ATTEMPTS', '6'))
+    EMAIL_LEASE_SECONDS = int(os.getenv('EMAIL_LEASE_SECONDS', '60'))
     
     # Gemini Settings
     _raw_gemini_key = os.getenv('GEMINI_API_KEY', '')
     GEMINI_API_KEY = _raw_gemini_key.strip().strip('"').strip("'")
     
-    if not GEMINI_API_KEY:
+    if not GEMINI_API_KEY and os.getenv('LLM_BACKEND', 'gemini') == 'gemini':
         print("⚠️  WARNING: GEMINI_API_KEY is empty or missing in .env")
-    else:
+    elif GEMINI_API_KEY:
         print(f"✅ GEMINI_API_KEY loaded successfully ({len(GEMINI_API_KEY)} chars)")
-    
 
+    # LLM backend: "gemini", "openai" (any OpenAI-compatible server) or "stub" (offline, canned layouts)
+    LLM_BACKEND = os.getenv('LLM_BACKEND', 'gemini')
+    LLM_MODEL = os.getenv('LLM_MODEL', 'gemini-2.5-flash')
+    LLM_TEMPERATURE = float(os.getenv('LLM_TEMPERATURE', '0.7'))
+    LLM_BASE_URL = os.getenv('LLM_BASE_URL', 'http://127.0.0.1:8099/v1')
+    LLM_API_KEY = os.getenv('LLM_API_KEY', '')
+    LLM_STUB_LATENCY = os.getenv('LLM_STUB_LATENCY', 'fixed:0')  # e.g. uniform:0.5,2 or lognormal:0,0.5
+    LLM_STUB_SEED = int(os.getenv('LLM_STUB_SEED', '0'))
+    LLM_JSON_MODE = os.getenv('LLM_JSON_MODE', 'True') == 'True'
+
+    # Layout generation
+    LLM_TIMEOUT_SECONDS = float(os.getenv('LLM_TIMEOUT_SECONDS', '90'))
+    LAYOUT_VARIANTS_MAX = int(os.getenv('LAYOUT_VARIANTS_MAX', '4'))
+    LAYOUT_VARIANT_CONCURRENCY = int(os.getenv('LAYOUT_VARIANT_CONCURRENCY', '4'))
+
+    # LLM gateway: concurrency, deadlines, retries, hedging and circuit breaker
+    LLM_MAX_CONCURRENCY = int(os.getenv('LLM_MAX_CONCURRENCY', '16'))
+    LLM_PER_USER_CONCURRENCY = int(os.getenv('LLM_PER_USER_CONCURRENCY', '4'))
+    LLM_ATTEMPT_TIMEOUT_SECONDS = float(os.getenv('LLM_ATTEMPT_TIMEOUT_SECONDS', '60'))
+    LLM_MAX_RETRIES = int(os.getenv('LLM_MAX_RETRIES', '2'))
+    LLM_RETRY_BASE_DELAY = float(os.getenv('LLM_RETRY_BASE_DELAY', '0.5'))
+    LLM_RETRY_MAX_DELAY = float(os.getenv('LLM_RETRY_MAX_DELAY', '8'))
+    LLM_HEDGE_ENABLED = os.getenv('LLM_HEDGE_ENABLED', 'False') == 'True'
+    LLM_BREAKER_THRESHOLD = int(os.getenv('LLM_BREAKER_THRESHOLD', '5'))
+    LLM_BREAKER_COOLDOWN_SECONDS = float(os.getenv('LLM_BREAKER_COOLDOWN_SECONDS', '30'))
+
+    # Per-user LLM quotas, checked before each call (0 turns a limit off); usage is flushed to SQLite in batches
+    LLM_USER_CALLS_PER_MINUTE = int(os.getenv('LLM_USER_CALLS_PER_MINUTE', '30'))  # per worker process
+    LLM_USER_DAILY_TOKENS = int(os.getenv('LLM_USER_DAILY_TOKENS', '1000000'))  # UTC day, across workers
+    LLM_USAGE_FLUSH_SECONDS = float(os.getenv('LLM_USAGE_FLUSH_SECONDS', '10'))
+
+    # Layout chat sessions
+    CHAT_HISTORY_TOKEN_BUDGET = int(os.getenv('CHAT_HISTORY_TOKEN_BUDGET', '1500'))
+    CHAT_SUMMARY_TOKEN_BUDGET = int(os.getenv('CHAT_SUMMARY_TOKEN_BUDGET', '400'))
+    CHAT_MAX_SESSIONS = int(os.getenv('CHAT_MAX_SESSIONS', '1000'))
+    CHAT_SESSION_TTL_SECONDS = int(os.getenv('CHAT_SESSION_TTL_SECONDS', '3600'))
+
+    # Prometheus-style /metrics endpoint plus request and stage timers
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'True') == 'True'
+
+    # Request tracing (opt-in): spans for DB queries, templates, LLM and HTTP calls
+    TRACING_ENABLED = os.getenv('TRACING_ENABLED', 'False') == 'True'
+    TRACE_SAMPLE_RATE = float(os.getenv('TRACE_SAMPLE_RATE', '1.0'))  # an "X-Trace: 1" header always traces
+    TRACE_EXPORT = os.getenv('TRACE_EXPORT', 'file')  # "file" (JSON lines) or "otlp" (OTLP/HTTP JSON)
+    TRACE_FILE = os.getenv('TRACE_FILE', 'traces.jsonl')
+    TRACE_OTLP_ENDPOINT = os.getenv('TRACE_OTLP_ENDPOINT', 'http://127.0.0.1:4318/v1/traces')
+    # SQLite statements slower than this are logged (opt-in: 0 disables the log and the statement timing)
+    SQLITE_SLOW_QUERY_MS = float(os.getenv('SQLITE_SLOW_QUERY_MS', '0'))
+    # Per-request sampling profiler: "X-Profile: <ADMIN_TOKEN>" or POST /admin/profile (disabled without a token)
+    ADMIN_TOKEN = os.getenv('ADMIN_TOKEN', '')
+    PROFILE_DIR = os.getenv('PROFILE_DIR', 'profiles')
+    PROFILE_INTERVAL_MS = float(os.getenv('PROFILE_INTERVAL_MS', '5'))
+
+    # Print a startup profile (phase timings, import time by package) once background warmup finishes
+    STARTUP_PROFILE = os.getenv('STARTUP_PROFILE', 'False') == 'True'
 
+    # Production server (serve.py)
+    BIND_ADDRESS = os.getenv('BIND_ADDRESS', '0.0.0.0:8000')
+    WEB_CONCURRENCY = int(os.getenv('WEB_CONCURRENCY', str(os.cpu_count() or 1)))
+    # Load the embedding model in the master before forking so workers share its pages copy-on-write
+    PRELOAD_MODELS = os.getenv('PRELOAD_MODELS', 'True') == 'True'
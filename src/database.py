@@ -1,19 +1,97 @@
 import sqlite3
-import faiss
 import numpy as np
 import pickle
 import os
+import json
+import time
 import uuid
-from sentence_transformers import SentenceTransformer
+import threading
+from contextlib import contextmanager
+from starlette.concurrency import run_in_threadpool
 from src.config import Config
+from src.embeddings import encode, aencode
+from src.metrics import timed_stage
+from src.tracing import TracedConnection
+from src.fragment_cache import fragment_cache
+from src.gallery import public_gallery
+from src.project_cache import project_cache
+from src.utils import cloudinary_public_id
 
-# Initialize sentence transformer model
-embedding_model = SentenceTransformer(Config.EMBEDDING_MODEL)
+try:
+    import fcntl
+except ImportError:  # Windows: no flock, so only the single-process dev server is safe
+    fcntl = None
 
+_faiss_thread_lock = threading.Lock()
+# Set when this process queues a cleanup job, so the cleanup worker runs it without waiting for its next poll
+cleanup_queued = threading.Event()
+
+# IDs per statement, well under SQLite's bound-parameter limit (999 before 3.32)
+SQL_CHUNK_SIZE = 500
+
+# Bulk project actions: (statement, is_deleted value a project must have to change; None = any)
+BULK_PROJECT_ACTIONS = {
+    "delete": ("UPDATE projects SET is_deleted = 1, deleted_at = CURRENT_TIMESTAMP", 0),
+    "restore": ("UPDATE projects SET is_deleted = 0, deleted_at = NULL", 1),
+    "permanent_delete": ("DELETE FROM projects", None),
+}
+
+def get_connection():
+    """Open a SQLite connection that waits for other workers' write locks instead of failing"""
+    if Config.TRACING_ENABLED or Config.SQLITE_SLOW_QUERY_MS:
+        # Statements are timed for the slow-query log and request traces
+        return sqlite3.connect(Config.DB_PATH, timeout=Config.SQLITE_BUSY_TIMEOUT, factory=TracedConnection)
+    return sqlite3.connect(Config.DB_PATH, timeout=Config.SQLITE_BUSY_TIMEOUT)
+
+@contextmanager
+def faiss_write_lock():
+    """Serialize FAISS index/mapping updates across threads and worker processes"""
+    with _faiss_thread_lock:
+        if fcntl is None:
+            yield
+        else:
+            with open(Config.FAISS_INDEX_PATH + ".lock", "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def _projects_changed(project_ids, publish_flag_changed=False):
+    """After a committed project write: evict rendered cards and update the public gallery"""
+    project_cache.invalidate(project_ids)
+    fragment_cache.invalidate_projects(project_ids)
+    public_gallery.projects_changed(project_ids, publish_flag_changed)
+
+def _chunks(items, size=SQL_CHUNK_SIZE):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+def _enqueue_cleanup(cursor, kind, payload):
+    """Queue a background cleanup job as part of the caller's transaction"""
+    cursor.execute("INSERT INTO cleanup_jobs (kind, payload) VALUES (?, ?)", (kind, json.dumps(payload)))
+    # This transaction now holds the write lock, so a woken worker's claim waits for our commit
+    cleanup_queued.set()
+
+def _enqueue_asset_cleanup(cursor, thumbnails):
+    """Queue deletion of the Cloudinary uploads behind these thumbnail URLs"""
+    public_ids = sorted({public_id for public_id in map(cloudinary_public_id, thumbnails) if public_id})
+    if public_ids:
+        _enqueue_cleanup(cursor, "assets", {"public_ids": public_ids})
+
+def _replace_file(path, write):
+    """Write to a temp file and rename it over `path` so readers never see a partial file"""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    write(tmp_path)
+    os.replace(tmp_path, path)
+
+@timed_stage("db")
 def init_db():
     """Initialize SQLite database"""
-    conn = sqlite3.connect(Config.DB_PATH)
+    conn = get_connection()
     cursor = conn.cursor()
+    # WAL lets readers in other workers carry on while one of them writes
+    cursor.execute("PRAGMA journal_mode=WAL")
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS users (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -65,28 +143,100 @@ def init_db():
         ('deleted_at', 'TIMESTAMP'),
         ('is_favourite', 'INTEGER DEFAULT 0'),
         ('is_public', 'INTEGER DEFAULT 0'),
-        ('design_code', 'TEXT')
+        ('design_code', 'TEXT'),
+        ('version', 'INTEGER DEFAULT 0')
     ]:
         try:
             cursor.execute(f"ALTER TABLE projects ADD COLUMN {col} {type_info}")
         except sqlite3.OperationalError:
             pass
+    # Every change to a project row bumps its version (keys the rendered card cache across workers;
+    # updated_at only has one-second resolution). Triggers do not fire recursively by default.
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS projects_version AFTER UPDATE ON projects
+        FOR EACH ROW WHEN NEW.version IS OLD.version
+        BEGIN
+            UPDATE projects SET version = COALESCE(OLD.version, 0) + 1 WHERE id = NEW.id;
+        END
+    ''')
+    # The public gallery is rebuilt with one indexed range scan instead of a full table scan
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_projects_public ON projects (is_public, is_deleted, updated_at)")
+    # Per-user listings and the account-deletion cascade look projects up by owner
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_projects_user ON projects (user_id, is_deleted, updated_at)")
+
+    # Durable background cleanup (see src/cleanup.py); run_after doubles as the worker's lease
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS cleanup_jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,
+            payload TEXT NOT NULL,
+            attempts INTEGER DEFAULT 0,
+            run_after REAL DEFAULT 0,
+            last_error TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    # Outgoing email, sent by the async delivery task in src/email_outbox.py; rows go once sent
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS email_outbox (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            message TEXT NOT NULL,
+            status TEXT DEFAULT 'queued',
+            attempts INTEGER DEFAULT 0,
+            run_after REAL DEFAULT 0,
+            last_error TEXT,
+            batch_key TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    try:
+        cursor.execute("ALTER TABLE email_outbox ADD COLUMN batch_key TEXT")
+    except sqlite3.OperationalError:
+        pass
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_email_outbox_due ON email_outbox (status, run_after)")
+
+    # Per-user LLM usage by UTC day and call kind, added up in memory and flushed in batches (src/usage.py)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS llm_usage (
+            user_id INTEGER NOT NULL,
+            day TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            calls INTEGER DEFAULT 0,
+            errors INTEGER DEFAULT 0,
+            input_tokens INTEGER DEFAULT 0,
+            output_tokens INTEGER DEFAULT 0,
+            latency_ms INTEGER DEFAULT 0,
+            PRIMARY KEY (user_id, day, kind)
+        )
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_llm_usage_day ON llm_usage (day)")
     conn.commit()
     conn.close()
 
 
+@timed_stage("db")
 def init_faiss():
     """Initialize FAISS index"""
-    if not os.path.exists(Config.FAISS_INDEX_PATH):
-        index = faiss.IndexFlatL2(Config.EMBEDDING_DIMENSION)
-        faiss.write_index(index, Config.FAISS_INDEX_PATH)
-        with open(Config.USER_MAPPING_PATH, 'wb') as f:
-            pickle.dump({}, f)
+    import faiss
+    if os.path.exists(Config.FAISS_INDEX_PATH):
+        return
+    with faiss_write_lock():
+        # Another worker may have created it while we waited for the lock
+        if not os.path.exists(Config.FAISS_INDEX_PATH):
+            index = faiss.IndexFlatL2(Config.EMBEDDING_DIMENSION)
+            save_user_mapping({})
+            _replace_file(Config.FAISS_INDEX_PATH, lambda path: faiss.write_index(index, path))
 
+@timed_stage("db")
 def load_faiss_index():
     """Load FAISS index"""
+    # faiss is imported on first use; startup initializes it in the background
+    import faiss
+    init_faiss()
     return faiss.read_index(Config.FAISS_INDEX_PATH)
 
+@timed_stage("db")
 def load_user_mapping():
     """Load user ID mapping"""
     if os.path.exists(Config.USER_MAPPING_PATH):
@@ -94,53 +244,94 @@ def load_user_mapping():
             return pickle.load(f)
     return {}
 
+@timed_stage("db")
 def save_user_mapping(mapping):
     """Save user ID mapping"""
-    with open(Config.USER_MAPPING_PATH, 'wb') as f:
-        pickle.dump(mapping, f)
+    def write(path):
+        with open(path, 'wb') as f:
+            pickle.dump(mapping, f)
+    _replace_file(Config.USER_MAPPING_PATH, write)
 
+def user_profile_text(name, email):
+    # Create user profile text for embedding
+    return f"{name} {email}"
+
+@timed_stage("db")
 def add_user_to_faiss(user_id, email, name):
     """Add user embedding to FAISS"""
-    # Create user profile text for embedding
-    user_text = f"{name} {email}"
-    embedding = embedding_model.encode([user_text])[0]
-    
-    # Load index and mapping
-    index = load_faiss_index()
-    mapping = load_user_mapping()
-    
-    # Add embedding to index
-    index.add(np.array([embedding], dtype=np.float32))
-    
-    # Update mapping
-    mapping[index.ntotal - 1] = user_id
-    
-    # Save index and mapping
-    faiss.write_index(index, Config.FAISS_INDEX_PATH)
-    save_user_mapping(mapping)
+    add_user_embedding(user_id, encode([user_profile_text(name, email)])[0])
+
+@timed_stage("db")
+async def aadd_user_to_faiss(user_id, email, name):
+    """add_user_to_faiss for request handlers: encodes without blocking the event loop"""
+    embedding = (await aencode([user_profile_text(name, email)]))[0]
+    await run_in_threadpool(add_user_embedding, user_id, embedding)
+
+def add_user_embedding(user_id, embedding):
+    import faiss
+    init_faiss()
+
+    with faiss_write_lock():
+        # Load index and mapping under the lock so another worker's additions are not overwritten
+        index = faiss.read_index(Config.FAISS_INDEX_PATH)
+        mapping = load_user_mapping()
+        
+        # Add embedding to index
+        index.add(np.array([embedding], dtype=np.float32))
+        
+        # Update mapping
+        mapping[index.ntotal - 1] = user_id
+        
+        # Save index and mapping
+        _replace_file(Config.FAISS_INDEX_PATH, lambda path: faiss.write_index(index, path))
+        save_user_mapping(mapping)
+
+@timed_stage("db")
+def remove_users_from_faiss(user_ids):
+    """Drop these users' vectors from the index and renumber the position -> user mapping"""
+    import faiss
+    user_ids = set(user_ids)
+    if not user_ids or not os.path.exists(Config.FAISS_INDEX_PATH):
+        return 0
+    with faiss_write_lock():
+        mapping = load_user_mapping()
+        doomed = sorted(position for position, user_id in mapping.items() if user_id in user_ids)
+        if not doomed:
+            return 0
+        index = faiss.read_index(Config.FAISS_INDEX_PATH)
+        index.remove_ids(np.array(doomed, dtype=np.int64))
+        # A flat index closes the gaps, so every later vector moves down by the number removed before it
+        keep = sorted(position for position in mapping if position not in set(doomed))
+        new_mapping = {new: mapping[old] for new, old in enumerate(keep)}
+        _replace_file(Config.FAISS_INDEX_PATH, lambda path: faiss.write_index(index, path))
+        save_user_mapping(new_mapping)
+    return len(doomed)
 
+@timed_stage("db")
 def get_user_by_id(user_id):
     """Get user from database by ID"""
-    conn = sqlite3.connect(Config.DB_PATH)
+    conn = get_connection()
     cursor = conn.cursor()
     cursor.execute('SELECT id, name, email, about, profile_pic, location, user_key FROM users WHERE id = ?', (user_id,))
     user_data = cursor.fetchone()
     conn.close()
     return user_data
 
+@timed_stage("db")
 def get_user_by_email(email):
     """Get user from database by email"""
-    conn = sqlite3.connect(Config.DB_PATH)
+    conn = get_connection()
     cursor = conn.cursor()
     cursor.execute('SELECT id, name, email, password_hash, about, profile_pic, location, user_key FROM users WHERE email = ?', (email,))
     user_data = cursor.fetchone()
     conn.close()
     return user_data
 
+@timed_stage("db")
 def create_user(name, email, password_hash):
     """Create new user in database with a unique user_key"""
     user_key = str(uuid.uuid4())
-    conn = sqlite3.connect(Config.DB_PATH)
+    conn = get_connection()
     cursor = conn.cursor()
     cursor.execute('INSERT INTO users (name, email, password_hash, user_key) VALUES (?, ?, ?, ?)',
                  (name, email, password_hash, user_key))
@@ -148,9 +339,10 @@ def create_user(name, email, password_hash):
     conn.commit()
     conn.close()
     return user_id
+@timed_stage("db")
 def update_user(user_id, name, email, about, profile_pic=None, location=None):
     """Update user information in database"""
-    conn = sqlite3.connect(Config.DB_PATH)
+    conn = get_connection()
     cursor = conn.cursor()
     
     # Identify the target user_key correctly
@@ -175,15 +367,263 @@ def update_user(user_id, name, email, about, profile_pic=None, location=None):
     return True
 
 
+@timed_stage("db")
 def delete_user_db(user_key):
-    """Delete user from database by user_key"""
-    conn = sqlite3.connect(Config.DB_PATH)
+    """
+    Delete user from database by user_key. Their projects, FAISS vector and Cloudinary
+    folders are removed by a queued background job; public projects leave the gallery now.
+    """
+    conn = get_connection()
     cursor = conn.cursor()
-    cursor.execute('DELETE FROM users WHERE user_key = ?', (user_key,))
+    cursor.execute("BEGIN IMMEDIATE")
+    row = cursor.execute('SELECT id FROM users WHERE user_key = ?', (user_key,)).fetchone()
+    unpublished = []
+    if row:
+        user_id = row[0]
+        unpublished = [r[0] for r in cursor.execute(
+            'SELECT id FROM projects WHERE user_id = ? AND is_public = 1', (user_id,)
+        ).fetchall()]
+        cursor.execute('UPDATE projects SET is_public = 0 WHERE user_id = ? AND is_public = 1', (user_id,))
+        cursor.execute('DELETE FROM users WHERE id = ?', (user_id,))
+        _enqueue_cleanup(cursor, "account", {"user_id": user_id, "user_key": user_key})
     conn.commit()
     conn.close()
+    if unpublished:
+        _projects_changed(unpublished, publish_flag_changed=True)
     return True
 
+@timed_stage("db")
+def delete_user_projects_batch(user_id, limit, enqueue_assets=True):
+    """Permanently delete up to `limit` projects of a (deleted) user; returns the deleted IDs"""
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("BEGIN IMMEDIATE")
+    rows = cursor.execute('SELECT id, thumbnail FROM projects WHERE user_id = ? LIMIT ?', (user_id, limit)).fetchall()
+    project_ids = [row[0] for row in rows]
+    if project_ids:
+        placeholders = ','.join(['?'] * len(project_ids))
+        cursor.execute(f'DELETE FROM projects WHERE id IN ({placeholders})', project_ids)
+        if enqueue_assets:
+            _enqueue_asset_cleanup(cursor, [row[1] for row in rows])
+    conn.commit()
+    conn.close()
+    if project_ids:
+        _projects_changed(project_ids)
+    return project_ids
+
+@timed_stage("db")
+def get_orphaned_user_ids():
+    """IDs of deleted users that still own projects or a FAISS vector (accounts deleted before the cleanup queue)"""
+    conn = get_connection()
+    cursor = conn.cursor()
+    orphans = {row[0] for row in cursor.execute(
+        'SELECT DISTINCT user_id FROM projects WHERE user_id NOT IN (SELECT id FROM users)'
+    )}
+    existing = {row[0] for row in cursor.execute('SELECT id FROM users')}
+    conn.close()
+    orphans.update(user_id for user_id in load_user_mapping().values() if user_id not in existing)
+    return sorted(orphans)
+
+@timed_stage("db")
+def enqueue_cleanup_job(kind, payload):
+    """Queue a background cleanup job on its own"""
+    conn = get_connection()
+    _enqueue_cleanup(conn.cursor(), kind, payload)
+    conn.commit()
+    conn.close()
+
+@timed_stage("db")
+def claim_cleanup_job(lease_seconds):
+    """Lease the oldest due cleanup job to this worker; returns (id, kind, payload, attempts) or None"""
+    now = time.time()
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("BEGIN IMMEDIATE")
+    row = cursor.execute(
+        'SELECT id, kind, payload, attempts FROM cleanup_jobs WHERE run_after <= ? ORDER BY id LIMIT 1', (now,)
+    ).fetchone()
+    if row:
+        # Not due again until the lease runs out, so a crashed worker's job is picked up later
+        cursor.execute('UPDATE cleanup_jobs SET run_after = ?, attempts = attempts + 1 WHERE id = ?',
+                       (now + lease_seconds, row[0]))
+    conn.commit()
+    conn.close()
+    if row is None:
+        return None
+    return row[0], row[1], json.loads(row[2]), row[3] + 1
+
+@timed_stage("db")
+def finish_cleanup_job(job_id):
+    conn = get_connection()
+    conn.execute('DELETE FROM cleanup_jobs WHERE id = ?', (job_id,))
+    conn.commit()
+    conn.close()
+
+@timed_stage("db")
+def retry_cleanup_job(job_id, error, delay_seconds, payload=None):
+    """Record a failure and make the job due again after `delay_seconds` (optionally with a narrowed payload)"""
+    conn = get_connection()
+    if payload is None:
+        conn.execute('UPDATE cleanup_jobs SET run_after = ?, last_error = ? WHERE id = ?',
+                     (time.time() + delay_seconds, error, job_id))
+    else:
+        conn.execute('UPDATE cleanup_jobs SET run_after = ?, last_error = ?, payload = ? WHERE id = ?',
+                     (time.time() + delay_seconds, error, json.dumps(payload), job_id))
+    conn.commit()
+    conn.close()
+
+@timed_stage("db")
+def get_cleanup_stats():
+    """Queued cleanup jobs by kind, and how many of them have failed at least once"""
+    conn = get_connection()
+    rows = conn.execute(
+        'SELECT kind, COUNT(*), SUM(last_error IS NOT NULL) FROM cleanup_jobs GROUP BY kind'
+    ).fetchall()
+    conn.close()
+    return {
+        "pending": {kind: count for kind, count, _ in rows},
+        "failing": sum(failing or 0 for _, _, failing in rows)
+    }
+
+@timed_stage("db")
+def enqueue_email(message):
+    """Queue an email (Resend message dict: from, to, subject, html); returns its outbox ID"""
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("INSERT INTO email_outbox (message) VALUES (?)", (json.dumps(message),))
+    email_id = cursor.lastrowid
+    conn.commit()
+    conn.close()
+    return email_id
+
+@timed_stage("db")
+def claim_emails(limit, lease_seconds):
+    """
+    Lease up to `limit` due emails, oldest first; returns ([(id, message, attempts)], batch_key).
+    Emails sent together are tagged with a batch key on their first attempt, and a retry claims
+    exactly that batch again, so the provider sees the same request under the same idempotency key.
+    """
+    now = time.time()
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("BEGIN IMMEDIATE")
+    first = cursor.execute(
+        "SELECT batch_key FROM email_outbox WHERE status = 'queued' AND run_after <= ? ORDER BY id LIMIT 1", (now,)
+    ).fetchone()
+    rows, batch_key = [], None
+    if first is not None and first[0]:
+        batch_key = first[0]
+        rows = cursor.execute(
+            "SELECT id, message, attempts FROM email_outbox WHERE status = 'queued' AND batch_key = ? ORDER BY id",
+            (batch_key,)
+        ).fetchall()
+    elif first is not None:
+        rows = cursor.execute(
+            "SELECT id, message, attempts FROM email_outbox "
+            "WHERE status = 'queued' AND run_after <= ? AND batch_key IS NULL ORDER BY id LIMIT ?",
+            (now, limit)
+        ).fetchall()
+        if len(rows) > 1:
+            batch_key = f"outbox-batch-{uuid.uuid4().hex}"
+    if rows:
+        placeholders = ','.join(['?'] * len(rows))
+        cursor.execute(
+            f'UPDATE email_outbox SET run_after = ?, attempts = attempts + 1, batch_key = ? WHERE id IN ({placeholders})',
+            [now + lease_seconds, batch_key] + [row[0] for row in rows]
+        )
+    conn.commit()
+    conn.close()
+    return [(row[0], json.loads(row[1]), row[2] + 1) for row in rows], batch_key
+
+@timed_stage("db")
+def unbatch_emails(email_ids):
+    """Send these emails on their own from now on (their batch was rejected as a whole)"""
+    conn = get_connection()
+    for chunk in _chunks(list(email_ids)):
+        conn.execute(f"UPDATE email_outbox SET batch_key = NULL WHERE id IN ({','.join(['?'] * len(chunk))})", chunk)
+    conn.commit()
+    conn.close()
+
+@timed_stage("db")
+def finish_emails(email_ids):
+    """Drop sent emails (they carry verification codes, so nothing is kept)"""
+    conn = get_connection()
+    for chunk in _chunks(list(email_ids)):
+        conn.execute(f"DELETE FROM email_outbox WHERE id IN ({','.join(['?'] * len(chunk))})", chunk)
+    conn.commit()
+    conn.close()
+
+@timed_stage("db")
+def retry_email(email_id, error, delay_seconds):
+    conn = get_connection()
+    conn.execute('UPDATE email_outbox SET run_after = ?, last_error = ? WHERE id = ?',
+                 (time.time() + delay_seconds, error, email_id))
+    conn.commit()
+    conn.close()
+
+@timed_stage("db")
+def fail_email(email_id, error):
+    """Give up on an email; it stays in the outbox with status 'failed' for inspection"""
+    conn = get_connection()
+    conn.execute("UPDATE email_outbox SET status = 'failed', last_error = ? WHERE id = ?", (error, email_id))
+    conn.commit()
+    conn.close()
+
+@timed_stage("db")
+def get_outbox_stats():
+    conn = get_connection()
+    rows = conn.execute('SELECT status, COUNT(*) FROM email_outbox GROUP BY status').fetchall()
+    conn.close()
+    return {"queued": 0, "failed": 0, **dict(rows)}
+
+@timed_stage("db")
+def add_llm_usage(rows):
+    """Add a batch of [(user_id, day, kind, calls, errors, input_tokens, output_tokens, latency_ms)] to the ledger"""
+    conn = get_connection()
+    conn.executemany('''
+        INSERT INTO llm_usage (user_id, day, kind, calls, errors, input_tokens, output_tokens, latency_ms)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT (user_id, day, kind) DO UPDATE SET
+            calls = calls + excluded.calls,
+            errors = errors + excluded.errors,
+            input_tokens = input_tokens + excluded.input_tokens,
+            output_tokens = output_tokens + excluded.output_tokens,
+            latency_ms = latency_ms + excluded.latency_ms
+    ''', rows)
+    conn.commit()
+    conn.close()
+
+@timed_stage("db")
+def get_llm_tokens(user_id, day):
+    """Tokens a user has used on `day` (UTC, YYYY-MM-DD) as flushed by every worker"""
+    conn = get_connection()
+    row = conn.execute(
+        'SELECT COALESCE(SUM(input_tokens + output_tokens), 0) FROM llm_usage WHERE user_id = ? AND day = ?',
+        (user_id, day)
+    ).fetchone()
+    conn.close()
+    return row[0]
+
+@timed_stage("db")
+def get_llm_usage_report(since_day, top_users=20):
+    """Usage from `since_day` on: totals per day and call kind, plus the heaviest users by tokens"""
+    conn = get_connection()
+    conn.row_factory = sqlite3.Row
+    days = conn.execute('''
+        SELECT day, kind, SUM(calls) AS calls, SUM(errors) AS errors, SUM(input_tokens) AS input_tokens,
+               SUM(output_tokens) AS output_tokens, SUM(latency_ms) AS latency_ms, COUNT(DISTINCT user_id) AS users
+        FROM llm_usage WHERE day >= ? GROUP BY day, kind ORDER BY day, kind
+    ''', (since_day,)).fetchall()
+    users = conn.execute('''
+        SELECT user_id, SUM(calls) AS calls, SUM(input_tokens) AS input_tokens, SUM(output_tokens) AS output_tokens,
+               SUM(latency_ms) AS latency_ms
+        FROM llm_usage WHERE day >= ? GROUP BY user_id
+        ORDER BY SUM(input_tokens + output_tokens) DESC LIMIT ?
+    ''', (since_day, top_users)).fetchall()
+    conn.close()
+    return {"days": [dict(row) for row in days], "top_users": [dict(row) for row in users]}
+
+@timed_stage("db")
 def add_user_project(user_id, title, description, thumbnail, svg_content, rooms, design_philosophy, design_code=None):
     """Add a new project to the database"""
     if not design_code:
@@ -192,7 +632,7 @@ def add_user_project(user_id, title, description, thumbnail, svg_content, rooms,
         suffix = ''.join(random.choices(string.ascii_uppercase + string.digits, k=5))
         design_code = f"DL-{suffix}"
         
-    conn = sqlite3.connect(Config.DB_PATH)
+    conn = get_connection()
     cursor = conn.cursor()
     cursor.execute('''
         INSERT INTO projects (user_id, title, description, thumbnail, svg_content, rooms, design_philosophy, design_code)
@@ -203,13 +643,14 @@ def add_user_project(user_id, title, description, thumbnail, svg_content, rooms,
     conn.close()
     return project_id
 
+@timed_stage("db")
 def get_user_projects(user_id, limit=6):
     """Return list of user's projects"""
-    conn = sqlite3.connect(Config.DB_PATH)
+    conn = get_connection()
     conn.row_factory = sqlite3.Row
     cursor = conn.cursor()
     cursor.execute('''
-        SELECT id, title, description, thumbnail, svg_content, rooms, design_philosophy, updated_at, is_favourite, is_public 
+        SELECT id, title, description, thumbnail, svg_content, rooms, design_philosophy, updated_at, is_favourite, is_public, version 
         FROM projects 
         WHERE user_id = ? AND is_deleted = 0
         ORDER BY updated_at DESC 
@@ -219,13 +660,14 @@ def get_user_projects(user_id, limit=6):
     conn.close()
     return projects
 
+@timed_stage("db")
 def get_favourite_projects(user_id):
     """Return list of user's favourite projects"""
-    conn = sqlite3.connect(Config.DB_PATH)
+    conn = get_connection()
     conn.row_factory = sqlite3.Row
     cursor = conn.cursor()
     cursor.execute('''
-        SELECT id, title, description, thumbnail, svg_content, rooms, updated_at, design_code 
+        SELECT id, title, description, thumbnail, svg_content, rooms, updated_at, design_code, version 
         FROM projects 
         WHERE user_id = ? AND is_deleted = 0 AND is_favourite = 1
         ORDER BY updated_at DESC
@@ -234,13 +676,14 @@ def get_favourite_projects(user_id):
     conn.close()
     return projects
 
+@timed_stage("db")
 def get_public_projects(limit=50):
     """Return list of public templates"""
-    conn = sqlite3.connect(Config.DB_PATH)
+    conn = get_connection()
     conn.row_factory = sqlite3.Row
     cursor = conn.cursor()
     cursor.execute('''
-        SELECT id, title, description, thumbnail, svg_content, rooms, updated_at, design_code 
+        SELECT id, title, description, thumbnail, svg_content, rooms, updated_at, design_code, version 
         FROM projects 
         WHERE is_public = 1 AND is_deleted = 0
         ORDER BY updated_at DESC
@@ -250,30 +693,106 @@ def get_public_projects(limit=50):
     conn.close()
     return projects
 
+@timed_stage("db")
+def get_public_projects_by_ids(project_ids):
+    """Public, non-archived projects among `project_ids` (gallery updates)"""
+    conn = get_connection()
+    conn.row_factory = sqlite3.Row
+    cursor = conn.cursor()
+    projects = []
+    for chunk in _chunks(project_ids):
+        placeholders = ','.join(['?'] * len(chunk))
+        cursor.execute(f'''
+            SELECT id, title, description, thumbnail, svg_content, rooms, updated_at, design_code, version 
+            FROM projects 
+            WHERE id IN ({placeholders}) AND is_public = 1 AND is_deleted = 0
+        ''', chunk)
+        projects.extend(dict(row) for row in cursor.fetchall())
+    conn.close()
+    return projects
+
+@timed_stage("db")
 def update_project_status(project_ids, status_field, value, user_id):
     """Update status field (is_favourite/is_public) for multiple projects belonging to user_id"""
     if not project_ids:
         return True
-    conn = sqlite3.connect(Config.DB_PATH)
+    conn = get_connection()
     cursor = conn.cursor()
-    placeholders = ','.join(['?'] * len(project_ids))
-    # Add user_id check for security
-    cursor.execute(f'''
-        UPDATE projects 
-        SET {status_field} = ?, updated_at = CURRENT_TIMESTAMP 
-        WHERE id IN ({placeholders}) AND user_id = ?
-    ''', [value] + project_ids + [user_id])
-    
-    updated_count = cursor.rowcount
+    updated_count = 0
+    # One transaction; chunked so long ID lists stay under SQLite's parameter limit
+    for chunk in _chunks(list(project_ids)):
+        placeholders = ','.join(['?'] * len(chunk))
+        # Add user_id check for security
+        cursor.execute(f'''
+            UPDATE projects 
+            SET {status_field} = ?, updated_at = CURRENT_TIMESTAMP 
+            WHERE id IN ({placeholders}) AND user_id = ?
+        ''', [value] + chunk + [user_id])
+        updated_count += cursor.rowcount
     conn.commit()
     conn.close()
+    _projects_changed(project_ids, publish_flag_changed=status_field == 'is_public')
     
     # Return true only if all projects were updated (means user owned all of them)
     return updated_count == len(project_ids)
 
+@timed_stage("db")
+def bulk_project_action(project_ids, action, user_id):
+    """
+    Soft-delete, restore or permanently delete a user's projects in one transaction.
+    Returns {project_id: "ok" | "unchanged" | "not_found"}; other users' projects are "not_found".
+    """
+    statement, required_state = BULK_PROJECT_ACTIONS[action]
+    project_ids = list(dict.fromkeys(int(project_id) for project_id in project_ids))
+    results = {project_id: "not_found" for project_id in project_ids}
+    conn = get_connection()
+    try:
+        # Take the write lock up front so the ownership read and the write see the same rows
+        conn.execute("BEGIN IMMEDIATE")
+        for chunk in _chunks(project_ids):
+            placeholders = ','.join(['?'] * len(chunk))
+            rows = conn.execute(
+                f"SELECT id, is_deleted, thumbnail FROM projects WHERE id IN ({placeholders}) AND user_id = ?",
+                chunk + [user_id]
+            ).fetchall()
+            for project_id, is_deleted, _ in rows:
+                results[project_id] = "ok" if required_state is None or is_deleted == required_state else "unchanged"
+            state_check = "" if required_state is None else f" AND is_deleted = {required_state}"
+            conn.execute(f"{statement} WHERE id IN ({placeholders}) AND user_id = ?{state_check}", chunk + [user_id])
+            if action == "permanent_delete":
+                _enqueue_asset_cleanup(conn.cursor(), [row[2] for row in rows])
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+    changed = [project_id for project_id, outcome in results.items() if outcome == "ok"]
+    if changed:
+        _projects_changed(changed)
+    return results
+
 def get_project_by_id(project_id):
-    """Get a single project by ID"""
-    conn = sqlite3.connect(Config.DB_PATH)
+    """
+    Get a single project by ID, with its rooms JSON parsed into `rooms_data` (read-only).
+    Served from the per-worker project cache when possible.
+    """
+    try:
+        project_id = int(project_id)
+    except (TypeError, ValueError):
+        return None
+    project = project_cache.get(project_id)
+    if project is None:
+        project = _load_project(project_id)
+        if project is not None:
+            project_cache.put(project_id, project)
+            project = dict(project)
+    return project
+
+@timed_stage("db")
+def _load_project(project_id):
+    conn = get_connection()
     conn.row_factory = sqlite3.Row
     cursor = conn.cursor()
     cursor.execute('''
@@ -283,11 +802,19 @@ def get_project_by_id(project_id):
     ''', (project_id,))
     row = cursor.fetchone()
     conn.close()
-    return dict(row) if row else None
+    if row is None:
+        return None
+    project = dict(row)
+    try:
+        project['rooms_data'] = json.loads(project['rooms'])
+    except (TypeError, ValueError):
+        project['rooms_data'] = []
+    return project
 
+@timed_stage("db")
 def update_project(project_id, title, description):
     """Update project metadata"""
-    conn = sqlite3.connect(Config.DB_PATH)
+    conn = get_connection()
     cursor = conn.cursor()
     cursor.execute('''
         UPDATE projects 
@@ -296,49 +823,43 @@ def update_project(project_id, title, description):
     ''', (title, description, project_id))
     conn.commit()
     conn.close()
+    _projects_changed([project_id])
     return True
 
-def soft_delete_project(project_id):
-    """Move project to recycle bin"""
-    conn = sqlite3.connect(Config.DB_PATH)
+@timed_stage("db")
+def update_project_layout(project_id, svg_content, rooms, thumbnail=None):
+    """Update the stored layout (primary SVG and floors JSON) of a project"""
+    conn = get_connection()
     cursor = conn.cursor()
-    cursor.execute('''
-        UPDATE projects 
-        SET is_deleted = 1, deleted_at = CURRENT_TIMESTAMP 
-        WHERE id = ?
-    ''', (project_id,))
-    conn.commit()
-    conn.close()
-    return True
-
-def restore_project(project_id):
-    """Restore project from recycle bin"""
-    conn = sqlite3.connect(Config.DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute('''
-        UPDATE projects 
-        SET is_deleted = 0, deleted_at = NULL 
-        WHERE id = ?
-    ''', (project_id,))
-    conn.commit()
-    conn.close()
-    return True
-
-def hard_delete_project(project_id):
-    """Permanently delete project"""
-    conn = sqlite3.connect(Config.DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute('DELETE FROM projects WHERE id = ?', (project_id,))
+    if thumbnail:
+        cursor.execute("BEGIN IMMEDIATE")
+        row = cursor.execute('SELECT thumbnail FROM projects WHERE id = ?', (project_id,)).fetchone()
+        cursor.execute('''
+            UPDATE projects 
+            SET svg_content = ?, rooms = ?, thumbnail = ?, updated_at = CURRENT_TIMESTAMP 
+            WHERE id = ?
+        ''', (svg_content, rooms, thumbnail, project_id))
+        # Every edit uploads a new SVG; the one it replaces is deleted in the background
+        if row and row[0] != thumbnail:
+            _enqueue_asset_cleanup(cursor, [row[0]])
+    else:
+        cursor.execute('''
+            UPDATE projects 
+            SET svg_content = ?, rooms = ?, updated_at = CURRENT_TIMESTAMP 
+            WHERE id = ?
+        ''', (svg_content, rooms, project_id))
     conn.commit()
     conn.close()
+    _projects_changed([project_id])
     return True
 
+@timed_stage("db")
 def get_user_archived_projects(user_id):
     """Get soft-deleted projects for a user"""
     # Auto-purge old items first
     purge_old_archived_projects()
     
-    conn = sqlite3.connect(Config.DB_PATH)
+    conn = get_connection()
     conn.row_factory = sqlite3.Row
     cursor = conn.cursor()
     cursor.execute('''
@@ -351,11 +872,19 @@ def get_user_archived_projects(user_id):
     conn.close()
     return projects
 
+@timed_stage("db")
 def purge_old_archived_projects():
     """Permanently delete projects older than 5 days in recycle bin"""
-    conn = sqlite3.connect(Config.DB_PATH)
+    conn = get_connection()
     cursor = conn.cursor()
     # SQLITE logic for 5 days: datetime('now', '-5 days')
-    cursor.execute("DELETE FROM projects WHERE is_deleted = 1 AND deleted_at < datetime('now', '-5 days')")
+    expired = "is_deleted = 1 AND deleted_at < datetime('now', '-5 days')"
+    cursor.execute("BEGIN IMMEDIATE")
+    rows = cursor.execute(f"SELECT id, thumbnail FROM projects WHERE {expired}").fetchall()
+    if rows:
+        cursor.execute(f"DELETE FROM projects WHERE {expired}")
+        _enqueue_asset_cleanup(cursor, [row[1] for row in rows])
     conn.commit()
     conn.close()
+    if rows:
+        _projects_changed([row[0] for row in rows])
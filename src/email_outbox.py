@@ -0,0 +1,199 @@
+import re
+import json
+import asyncio
+from starlette.concurrency import run_in_threadpool
+from src.config import Config
+from src import database
+from src.metrics import stage_timer
+
+RESEND_URL = "https://api.resend.com/emails"
+RESEND_BATCH_URL = "https://api.resend.com/emails/batch"
+# Resend's batch endpoint takes up to 100 emails per request
+BATCH_SIZE = 100
+MAX_BACKOFF_SECONDS = 1800
+
+class PermanentEmailError(Exception):
+    """The provider rejected the email itself (bad address, validation); retrying will not help"""
+
+class ResendBackend:
+    """Resend over one pooled HTTP/1.1 client, so the TLS connection is reused between sends"""
+    def __init__(self):
+        self._client = None
+
+    def _get_client(self):
+        if self._client is None:
+            import httpx
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(Config.EMAIL_TIMEOUT_SECONDS, connect=5.0),
+                limits=httpx.Limits(max_connections=4, max_keepalive_connections=2, keepalive_expiry=60),
+                headers={"Authorization": f"Bearer {Config.RESEND_API_KEY}"}
+            )
+        return self._client
+
+    async def send(self, messages, idempotency_key):
+        # Resend drops a repeat of an accepted request with the same key (e.g. a retry after a timeout)
+        headers = {"Idempotency-Key": idempotency_key}
+        if len(messages) == 1:
+            response = await self._get_client().post(RESEND_URL, json=messages[0], headers=headers)
+        else:
+            response = await self._get_client().post(RESEND_BATCH_URL, json=messages, headers=headers)
+        if response.status_code in (200, 201):
+            return
+        error = f"Resend API {response.status_code}: {response.text[:300]}"
+        if response.status_code == 429 or response.status_code >= 500:
+            raise RuntimeError(error)
+        raise PermanentEmailError(error)
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+class ConsoleBackend:
+    """Development: print emails instead of sending them"""
+    async def send(self, messages, idempotency_key):
+        for message in messages:
+            print(f"--- DEV MODE: EMAIL NOT SENT (EMAIL_BACKEND=console) ---")
+            print(f"To: {', '.join(message['to'])}")
+            print(f"Subject: {message['subject']}")
+            print(" ".join(re.sub(r"<[^>]+>", " ", message["html"]).split()))
+
+    async def close(self):
+        pass
+
+class CaptureBackend:
+    """
+    Offline tests: keep sent emails in `messages` and, if EMAIL_CAPTURE_FILE is set, append them
+    as JSON lines. Like Resend, a request repeating an idempotency key already seen is dropped.
+    """
+    def __init__(self):
+        self.messages = []
+        self.idempotency_keys = set()
+
+    async def send(self, messages, idempotency_key):
+        if idempotency_key in self.idempotency_keys:
+            return
+        self.idempotency_keys.add(idempotency_key)
+        self.messages.extend(messages)
+        if Config.EMAIL_CAPTURE_FILE:
+            with open(Config.EMAIL_CAPTURE_FILE, "a") as f:
+                for message in messages:
+                    f.write(json.dumps(message) + "\n")
+
+    async def close(self):
+        pass
+
+def idempotency_key(email_ids, batch_key=None):
+    """Provider idempotency key for a send: the outbox row for one email, the stored batch key for several"""
+    if len(email_ids) == 1:
+        return f"outbox-{email_ids[0]}"
+    return batch_key
+
+BACKENDS = {"resend": ResendBackend, "console": ConsoleBackend, "capture": CaptureBackend}
+
+class EmailOutbox:
+    """
+    Emails are written to the SQLite outbox by the request and sent by an async task on
+    the worker's event loop: up to 100 per provider call, retried with exponential backoff
+    on timeouts, 429s and 5xx, and marked failed after EMAIL_MAX_ATTEMPTS.
+    """
+    def __init__(self):
+        self.backend = None
+        self.sent = 0
+        self.retried = 0
+        self.failed = 0
+        self._loop = None
+        self._wake = None
+        self._task = None
+
+    def get_backend(self):
+        if self.backend is None:
+            self.backend = BACKENDS[Config.EMAIL_BACKEND]()
+        return self.backend
+
+    def enqueue(self, recipient, subject, html):
+        """Queue an email for delivery; cheap enough to call from a request handler"""
+        email_id = database.enqueue_email({
+            "from": f"DreamLayout <{Config.MAIL_DEFAULT_SENDER}>",
+            "to": [recipient],
+            "subject": subject,
+            "html": html
+        })
+        self.wake()
+        return email_id
+
+    def wake(self):
+        """Deliver now rather than at the next poll (safe from any thread)"""
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+    def start(self):
+        """Start the delivery task on the running event loop (called from the app lifespan)"""
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        self._task = self._loop.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._loop = None
+        if self.backend is not None:
+            await self.backend.close()
+
+    async def _run(self):
+        while True:
+            self._wake.clear()
+            try:
+                while await self.deliver_pending() == BATCH_SIZE:
+                    pass
+            except Exception as e:
+                print(f"⚠️  Email outbox: {e}")
+            try:
+                await asyncio.wait_for(self._wake.wait(), Config.EMAIL_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+
+    async def deliver_pending(self):
+        """Send one batch of due emails; returns how many were claimed"""
+        emails, batch_key = await run_in_threadpool(database.claim_emails, BATCH_SIZE, Config.EMAIL_LEASE_SECONDS)
+        if emails:
+            await self._deliver(emails, batch_key)
+        return len(emails)
+
+    async def _deliver(self, emails, batch_key=None):
+        try:
+            with stage_timer("email.send"):
+                await self.get_backend().send(
+                    [message for _, message, _ in emails],
+                    idempotency_key([email_id for email_id, _, _ in emails], batch_key)
+                )
+        except PermanentEmailError as e:
+            if len(emails) > 1:
+                # A batch is rejected as a whole; send one by one so only the bad email fails
+                await run_in_threadpool(database.unbatch_emails, [email_id for email_id, _, _ in emails])
+                for email in emails:
+                    await self._deliver([email])
+                return
+            self.failed += 1
+            print(f"❌ Email {emails[0][0]} rejected: {e}")
+            await run_in_threadpool(database.fail_email, emails[0][0], str(e))
+        except Exception as e:
+            for email_id, _, attempts in emails:
+                if attempts >= Config.EMAIL_MAX_ATTEMPTS:
+                    self.failed += 1
+                    print(f"❌ Email {email_id} failed after {attempts} attempts: {e}")
+                    await run_in_threadpool(database.fail_email, email_id, str(e))
+                else:
+                    self.retried += 1
+                    delay = min(MAX_BACKOFF_SECONDS, 5 * 3 ** (attempts - 1))
+                    await run_in_threadpool(database.retry_email, email_id, str(e) or type(e).__name__, delay)
+        else:
+            self.sent += len(emails)
+            await run_in_threadpool(database.finish_emails, [email_id for email_id, _, _ in emails])
+
+email_outbox = EmailOutbox()
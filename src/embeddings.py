@@ -0,0 +1,276 @@
+import os
+import time
+import queue
+import asyncio
+import hashlib
+import ipaddress
+import threading
+import numpy as np
+from collections import OrderedDict
+from concurrent.futures import Future
+from multiprocessing.connection import Client, Listener
+from src.config import Config, load_or_create_secret_key
+from src.metrics import timed_stage
+
+_model = None
+_model_lock = threading.Lock()
+
+def load_model():
+    """Build the SentenceTransformer for the configured backend (torch, or quantized ONNX on CPU)"""
+    # Imported here: torch + sentence_transformers cost seconds and hundreds of MB
+    from sentence_transformers import SentenceTransformer
+    if Config.EMBEDDING_BACKEND == "onnx":
+        # Needs `pip install sentence-transformers[onnx]`; the int8 file ships with the MiniLM repo
+        return SentenceTransformer(
+            Config.EMBEDDING_MODEL,
+            backend="onnx",
+            model_kwargs={"file_name": Config.EMBEDDING_ONNX_FILE}
+        )
+    return SentenceTransformer(Config.EMBEDDING_MODEL)
+
+def get_embedding_model():
+    """Load the embedding model on first use; every caller in the process shares one copy"""
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                started = time.time()
+                _model = load_model()
+                print(f"🧬 Embedding model loaded ({Config.EMBEDDING_BACKEND}) in {time.time() - started:.1f}s")
+    return _model
+
+def _encode_with_model(texts):
+    return np.asarray(get_embedding_model().encode(texts), dtype=np.float32)
+
+class MicroBatcher:
+    """
+    Coalesces concurrent encode calls into one model call. A request that finds
+    others already queued waits up to `max_wait_ms` for more to join, up to
+    `max_batch` texts; a lone request is encoded straight away.
+    """
+    def __init__(self, encode_fn, max_batch, max_wait_ms):
+        self.encode_fn = encode_fn
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.pending = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def _enqueue(self, texts):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, daemon=True)
+                    self._thread.start()
+        future = Future()
+        self.pending.put((list(texts), future))
+        return future
+
+    def submit(self, texts):
+        """Encode `texts` as part of the next batch; blocks until the vectors are ready"""
+        return self._enqueue(texts).result()
+
+    async def asubmit(self, texts):
+        """Like submit, but waits without blocking the event loop"""
+        return await asyncio.wrap_future(self._enqueue(texts))
+
+    def _run(self):
+        while True:
+            batch = [self.pending.get()]
+            size = len(batch[0][0])
+            # Only wait for company when there is concurrent traffic
+            deadline = time.monotonic() + (self.max_wait if not self.pending.empty() else 0)
+            while size < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self.pending.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                batch.append(item)
+                size += len(item[0])
+
+            texts = [text for item_texts, _ in batch for text in item_texts]
+            try:
+                vectors = self.encode_fn(texts)
+                offset = 0
+                for item_texts, future in batch:
+                    future.set_result(vectors[offset:offset + len(item_texts)])
+                    offset += len(item_texts)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+
+    def reset(self):
+        """Forget the worker thread and queue (threads do not survive a fork)"""
+        self.pending = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+class EmbeddingCache:
+    """Thread-safe LRU of embeddings keyed by a hash of the text"""
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(text):
+        return hashlib.sha1(text.encode("utf-8")).digest()
+
+    def get(self, text):
+        key = self.key(text)
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return vector
+
+    def put(self, text, vector):
+        key = self.key(text)
+        # Copy so a cached row does not keep its whole batch array alive
+        vector = np.array(vector, dtype=np.float32)
+        with self._lock:
+            self._entries[key] = vector
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
+
+batcher = MicroBatcher(_encode_with_model, Config.EMBEDDING_BATCH_SIZE, Config.EMBEDDING_BATCH_WAIT_MS)
+embedding_cache = EmbeddingCache(Config.EMBEDDING_CACHE_SIZE)
+
+if hasattr(os, "register_at_fork"):
+    # Workers forked from a preloading master keep the model but start their own batcher
+    os.register_at_fork(after_in_child=batcher.reset)
+
+def parse_address(address):
+    """
+    "host:port" -> (host, port); anything else is treated as a unix socket path.
+    Requests are pickles, so TCP addresses must be loopback: anything else raises ValueError.
+    """
+    host, sep, port = address.rpartition(":")
+    if not (sep and port.isdigit()):
+        return address
+    host = host.strip("[]") or "127.0.0.1"
+    try:
+        loopback = host == "localhost" or ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        loopback = False
+    if not loopback:
+        raise ValueError(f"Embedding server address {address} is not a loopback address")
+    return (host, int(port))
+
+def _authkey():
+    key = Config.EMBEDDING_SERVER_AUTHKEY or load_or_create_secret_key(Config.EMBEDDING_SERVER_AUTHKEY_FILE)
+    return key.encode("utf-8")
+
+def _encode_remote(texts):
+    with Client(parse_address(Config.EMBEDDING_SERVER_ADDRESS), authkey=_authkey()) as conn:
+        conn.send(list(texts))
+        result = conn.recv()
+    if isinstance(result, Exception):
+        raise result
+    return result
+
+def _encode_uncached(texts):
+    if Config.EMBEDDING_SERVER_ADDRESS:
+        return _encode_remote(texts)
+    if Config.EMBEDDING_MICRO_BATCH:
+        return batcher.submit(texts)
+    return _encode_with_model(texts)
+
+async def _aencode_uncached(texts):
+    if Config.EMBEDDING_MICRO_BATCH and not Config.EMBEDDING_SERVER_ADDRESS:
+        return await batcher.asubmit(texts)
+    return await asyncio.get_running_loop().run_in_executor(None, _encode_uncached, texts)
+
+def _cached(texts):
+    vectors = [embedding_cache.get(text) for text in texts]
+    return vectors, [i for i, vector in enumerate(vectors) if vector is None]
+
+def _fill(texts, vectors, missing, computed):
+    for i, vector in zip(missing, computed):
+        vectors[i] = vector
+        embedding_cache.put(texts[i], vector)
+    return np.stack(vectors) if vectors else np.empty((0, Config.EMBEDDING_DIMENSION), dtype=np.float32)
+
+@timed_stage("embeddings")
+def encode(texts):
+    """
+    Embed a list of strings as a float32 array of shape (len(texts), EMBEDDING_DIMENSION).
+    Cached texts are served from the LRU; the rest go to the shared embedding server
+    when EMBEDDING_SERVER_ADDRESS is set, otherwise to the in-process model through
+    the micro-batcher.
+    """
+    texts = list(texts)
+    if not Config.EMBEDDING_CACHE_SIZE:
+        return _encode_uncached(texts)
+
+    vectors, missing = _cached(texts)
+    computed = _encode_uncached([texts[i] for i in missing]) if missing else []
+    return _fill(texts, vectors, missing, computed)
+
+@timed_stage("embeddings")
+async def aencode(texts):
+    """encode() for the event loop: the model runs on the batcher thread (or a worker thread)"""
+    texts = list(texts)
+    if not Config.EMBEDDING_CACHE_SIZE:
+        return await _aencode_uncached(texts)
+
+    vectors, missing = _cached(texts)
+    computed = await _aencode_uncached([texts[i] for i in missing]) if missing else []
+    return _fill(texts, vectors, missing, computed)
+
+def warm_embeddings():
+    """Load the model (or check the embedding server is reachable) ahead of the first request"""
+    encode(["warmup"])
+
+def run_embedding_server(address=None):
+    """
+    Host the model in this process and serve encode requests from other workers.
+    Requests arriving within EMBEDDING_BATCH_WAIT_MS of each other are encoded as
+    one batch (up to EMBEDDING_BATCH_SIZE texts).
+    """
+    get_embedding_model()
+
+    def serve(conn):
+        try:
+            texts = conn.recv()
+            try:
+                result = batcher.submit(texts)
+            except Exception as e:
+                result = e
+            conn.send(result)
+        except (EOFError, OSError):
+            pass
+        finally:
+            conn.close()
+
+    address = parse_address(address or Config.EMBEDDING_SERVER_ADDRESS)
+    with Listener(address, backlog=128, authkey=_authkey()) as listener:
+        if isinstance(address, str):
+            os.chmod(address, 0o600)
+        print(f"🧬 Embedding server listening on {address} (pid {os.getpid()})")
+        while True:
+            try:
+                conn = listener.accept()
+            except Exception as e:
+                print(f"Embedding server rejected a connection: {e}")
+                continue
+            threading.Thread(target=serve, args=(conn,), daemon=True).start()
@@ -4,6 +4,7 @@ from typing import Optional, List, Tuple
 from fastapi import Request, Response
 from itsdangerous import URLSafeSerializer, BadSignature
 from src.config import Config
+from src.tracing import span
 
 class SessionManager:
     def __init__(self, secret_key: str):
@@ -82,7 +83,8 @@ def render_template(request: Request, template_name: str, context: dict = {}):
         "url_for": url_for,
         **context
     }
-    return templates.TemplateResponse(template_name, full_context)
+    with span("template.render", template=template_name):
+        return templates.TemplateResponse(template_name, full_context)
 
 
 
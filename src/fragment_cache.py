@@ -0,0 +1,99 @@
+import threading
+from collections import OrderedDict
+from markupsafe import Markup
+from src.config import Config
+
+class FragmentCache:
+    """
+    Thread-safe LRU of rendered HTML fragments, indexed by project ID so writes can evict them.
+    Bounded by total size in bytes: cards inline their project's SVG, so sizes vary a lot.
+    """
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._entries = OrderedDict()
+        self._by_project = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_render(self, key, project_id, render):
+        if self.max_bytes <= 0:
+            return render()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+        html = render()
+        size = len(html)
+        if size > self.max_bytes:
+            return html
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.bytes -= old[1]
+            self._entries[key] = (html, size)
+            self.bytes += size
+            self._by_project.setdefault(project_id, set()).add(key)
+            while self.bytes > self.max_bytes:
+                old_key, (_, old_size) = self._entries.popitem(last=False)
+                self.bytes -= old_size
+                self._forget(old_key)
+        return html
+
+    def _forget(self, key):
+        keys = self._by_project.get(key[1])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_project[key[1]]
+
+    def invalidate_projects(self, project_ids):
+        """Drop every cached fragment of these projects (IDs may arrive as strings from JSON)"""
+        with self._lock:
+            for project_id in project_ids:
+                try:
+                    keys = self._by_project.pop(int(project_id), ())
+                except (TypeError, ValueError):
+                    continue
+                for key in keys:
+                    entry = self._entries.pop(key, None)
+                    if entry is not None:
+                        self.bytes -= entry[1]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_project.clear()
+            self.bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self.bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
+
+fragment_cache = FragmentCache(int(Config.FRAGMENT_CACHE_MB * 1024 * 1024))
+
+def project_card_renderer(env):
+    """
+    Jinja global project_card(kind, project): renders templates/cards/<kind>.html once per
+    project version. The key holds the row's version (bumped by a trigger on every update),
+    so another worker's edit (which this process cannot invalidate) still produces a fresh
+    card, even two edits within updated_at's one-second resolution.
+    """
+    def project_card(kind, project):
+        key = (kind, project["id"], project.get("version"), project.get("is_favourite"), project.get("is_public"))
+        template = f"cards/{kind}.html"
+        return fragment_cache.get_or_render(
+            key, project["id"], lambda: Markup(env.get_template(template).render(project=project))
+        )
+    return project_card
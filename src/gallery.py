@@ -0,0 +1,125 @@
+import os
+import json
+import hashlib
+import threading
+from fastapi import Request, Response
+from src.config import Config
+from src.compression import accepted_encoding, compress, etag_matches
+
+class GallerySnapshot:
+    """One version of the public gallery: the rows plus whatever was rendered from them"""
+    def __init__(self, projects, version):
+        self.projects = projects
+        self.version = version
+        self.ids = {project["id"] for project in projects}
+        self._bodies = {}
+        self._lock = threading.Lock()
+
+    def body(self, name, render):
+        """Memoized rendering (page HTML, JSON) for this version, with a content ETag"""
+        cached = self._bodies.get(name)
+        if cached is None:
+            body = render()
+            # Content hash, so every worker hands out the same ETag for the same gallery
+            etag = 'W/"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+            with self._lock:
+                cached = self._bodies.setdefault(name, (body, etag, {}))
+        return cached
+
+    def to_json(self):
+        return json.dumps({"success": True, "projects": self.projects}, default=str).encode()
+
+class PublicGallery:
+    """
+    Shared, in-memory snapshot of the newest public projects. Project writes update it in
+    place; other workers find out through a version file whose size (one byte appended per
+    gallery change) is the version, so reading the gallery only costs a stat().
+    """
+    def __init__(self, size):
+        self.size = size
+        self._snapshot = None
+        self._seen_version = -1
+        self._lock = threading.Lock()
+        self.rebuilds = 0
+
+    @staticmethod
+    def version_path():
+        return Config.DB_PATH + ".gallery-version"
+
+    def _read_version(self):
+        try:
+            return os.stat(self.version_path()).st_size
+        except FileNotFoundError:
+            return 0
+
+    def _bump_version(self):
+        fd = os.open(self.version_path(), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, b".")
+            return os.fstat(fd).st_size
+        finally:
+            os.close(fd)
+
+    def snapshot(self):
+        """Current gallery; rebuilt from SQLite only when another worker changed it"""
+        snapshot = self._snapshot
+        if snapshot is not None and self._read_version() == self._seen_version:
+            return snapshot
+        from src.database import get_public_projects
+        with self._lock:
+            version = self._read_version()
+            if self._snapshot is None or version != self._seen_version:
+                self._snapshot = GallerySnapshot(get_public_projects(self.size), version)
+                self._seen_version = version
+                self.rebuilds += 1
+            return self._snapshot
+
+    def projects_changed(self, project_ids, publish_flag_changed=False):
+        """Apply committed edits, status flips, deletes or restores of these projects"""
+        from src.database import get_public_projects_by_ids
+        ids = set()
+        for project_id in project_ids:
+            try:
+                ids.add(int(project_id))
+            except (TypeError, ValueError):
+                continue
+        fresh = get_public_projects_by_ids(list(ids)) if ids else []
+        with self._lock:
+            snapshot = self._snapshot
+            # Private projects outside the gallery do not concern any worker
+            if not (fresh or publish_flag_changed or snapshot is None or ids & snapshot.ids):
+                return
+            version = self._bump_version()
+            if snapshot is None or version != self._seen_version + 1:
+                # Another worker changed the gallery as well: rebuild on the next read
+                self._snapshot = None
+                return
+            projects = [project for project in snapshot.projects if project["id"] not in ids] + fresh
+            projects.sort(key=lambda project: project["updated_at"] or "", reverse=True)
+            if len(projects) < self.size <= len(snapshot.projects):
+                # A project left a full gallery; only the database knows which one moves up
+                self._snapshot = None
+                return
+            self._snapshot = GallerySnapshot(projects[:self.size], version)
+            self._seen_version = version
+
+    def stats(self):
+        snapshot = self._snapshot
+        return {"projects": len(snapshot.projects) if snapshot else 0, "rebuilds": self.rebuilds}
+
+public_gallery = PublicGallery(Config.GALLERY_SIZE)
+
+def cached_response(request: Request, snapshot, name, render, media_type, cache_control="public, no-cache"):
+    """Serve a memoized snapshot body with ETag/304 and a memoized compressed copy"""
+    body, etag, encoded = snapshot.body(name, render)
+    headers = {"ETag": etag, "Cache-Control": cache_control, "Vary": "Accept-Encoding"}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    encoding = accepted_encoding(request.headers.get("accept-encoding", ""))
+    if Config.COMPRESSION_ENABLED and encoding and len(body) >= Config.COMPRESSION_MIN_SIZE:
+        if encoding not in encoded:
+            encoded[encoding] = compress(body, encoding)
+        headers["Content-Encoding"] = encoding
+        return Response(encoded[encoding], media_type=media_type, headers=headers)
+    return Response(body, media_type=media_type, headers=headers)
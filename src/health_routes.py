@@ -0,0 +1,127 @@
+import time
+import secrets
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
+from src.config import Config
+from src.startup import startup, PROCESS_STARTED
+from src.metrics import registry
+from src.llm_gateway import llm_gateway
+from src.embeddings import embedding_cache, batcher
+from src.fragment_cache import fragment_cache
+from src.project_cache import project_cache
+from src.gallery import public_gallery
+from src.chat_sessions import chat_sessions
+from src.cleanup import cleanup_worker
+from src.email_outbox import email_outbox
+from src.database import get_cleanup_stats, get_outbox_stats
+from src.json_repair import parse_stats
+from src.profiling import profile_trigger
+from src.usage import usage_ledger
+
+health_router = APIRouter(tags=["Health"])
+
+# Gauges read from SQLite are refreshed at most this often, however often /metrics is scraped
+DB_GAUGE_REFRESH_SECONDS = 15
+
+def require_admin(request: Request):
+    """Dependency for operator endpoints: X-Admin-Token (or a Bearer token) must match ADMIN_TOKEN, else 404"""
+    token = request.headers.get("x-admin-token")
+    if token is None and request.headers.get("authorization", "").startswith("Bearer "):
+        # Prometheus scrape configs send credentials this way
+        token = request.headers["authorization"][len("Bearer "):]
+    if not Config.ADMIN_TOKEN or token is None or not secrets.compare_digest(token, Config.ADMIN_TOKEN):
+        raise HTTPException(status_code=404)
+
+def refreshed(fn, seconds=DB_GAUGE_REFRESH_SECONDS):
+    """Wrap a gauge callback so it re-runs at most once every `seconds`"""
+    state = {"at": None, "value": None}
+    def read():
+        now = time.monotonic()
+        if state["at"] is None or now - state["at"] >= seconds:
+            state["value"], state["at"] = fn(), now
+        return state["value"]
+    return read
+
+# Read from the components' own counters at scrape time; nothing extra on the request path
+registry.callback("dreamlayout_llm_in_flight", "LLM calls waiting for or holding a gateway slot",
+                  lambda: llm_gateway.in_flight)
+registry.callback("dreamlayout_llm_breaker_open", "1 while the LLM circuit breaker is open",
+                  lambda: int(llm_gateway.breaker.state == "open"))
+registry.callback("dreamlayout_llm_parse_outcomes_total", "LLM JSON parse outcomes",
+                  lambda: {k: v for k, v in parse_stats().items() if k in ("ok", "repaired", "salvaged", "failed")},
+                  type="counter", label="outcome")
+registry.callback("dreamlayout_embedding_cache_lookups_total", "Embedding cache lookups",
+                  lambda: {"hit": embedding_cache.hits, "miss": embedding_cache.misses}, type="counter", label="result")
+registry.callback("dreamlayout_embedding_cache_entries", "Embeddings held in the LRU cache",
+                  lambda: embedding_cache.stats()["entries"])
+registry.callback("dreamlayout_fragment_cache_lookups_total", "Rendered project card cache lookups",
+                  lambda: {"hit": fragment_cache.hits, "miss": fragment_cache.misses}, type="counter", label="result")
+registry.callback("dreamlayout_fragment_cache_entries", "Rendered project cards held in the LRU cache",
+                  lambda: fragment_cache.stats()["entries"])
+registry.callback("dreamlayout_fragment_cache_bytes", "Size of the rendered project cards in the LRU cache",
+                  lambda: fragment_cache.bytes)
+registry.callback("dreamlayout_project_cache_lookups_total", "Parsed project cache lookups",
+                  lambda: {"hit": project_cache.hits, "miss": project_cache.misses}, type="counter", label="result")
+registry.callback("dreamlayout_project_cache_bytes", "Approximate size of the parsed project cache",
+                  lambda: project_cache.bytes)
+registry.callback("dreamlayout_gallery_rebuilds_total", "Public gallery snapshots rebuilt from SQLite",
+                  lambda: public_gallery.rebuilds, type="counter")
+registry.callback("dreamlayout_embedding_queue_depth", "Encode requests waiting for the micro-batcher",
+                  lambda: batcher.pending.qsize())
+registry.callback("dreamlayout_cleanup_jobs_total", "Background cleanup jobs run by this worker",
+                  lambda: {"completed": cleanup_worker.completed, "failed": cleanup_worker.failed},
+                  type="counter", label="outcome")
+registry.callback("dreamlayout_cleanup_jobs_pending", "Cleanup jobs queued in SQLite (all workers)",
+                  refreshed(lambda: get_cleanup_stats()["pending"]), label="kind")
+registry.callback("dreamlayout_emails_total", "Email delivery attempts by this worker",
+                  lambda: {"sent": email_outbox.sent, "retried": email_outbox.retried, "failed": email_outbox.failed},
+                  type="counter", label="outcome")
+registry.callback("dreamlayout_email_outbox", "Emails in the SQLite outbox (all workers)",
+                  refreshed(get_outbox_stats), label="status")
+registry.callback("dreamlayout_llm_quota_rejections_total", "LLM calls refused by per-user quotas in this worker",
+                  lambda: usage_ledger.rejected, type="counter")
+registry.callback("dreamlayout_chat_sessions", "Layout chat sessions held in memory", lambda: len(chat_sessions))
+registry.callback("dreamlayout_uptime_seconds", "Seconds since the process started",
+                  lambda: round(time.perf_counter() - PROCESS_STARTED, 3))
+
+@health_router.get("/healthz")
+async def healthz():
+    """Liveness: the process is up and serving requests"""
+    return {"status": "alive", "uptime": round(time.perf_counter() - PROCESS_STARTED, 3)}
+
+@health_router.get("/readyz")
+async def readyz():
+    """Readiness: 503 until background initialization finishes and required components are up"""
+    ready, components = startup.readiness()
+    if ready:
+        failed = any(info["status"] == "failed" for info in components.values())
+        state = "degraded" if failed else "ready"
+    else:
+        state = "starting"
+    return JSONResponse(
+        {"status": state, "components": components},
+        status_code=200 if ready else 503
+    )
+
+@health_router.get("/metrics", dependencies=[Depends(require_admin)])
+async def metrics():
+    """Prometheus text format; counters are per worker process (needs the admin token)"""
+    if not Config.METRICS_ENABLED:
+        raise HTTPException(status_code=404)
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+@health_router.get("/admin/llm/stats", dependencies=[Depends(require_admin)])
+async def llm_stats():
+    """Gateway health and LLM output parse outcomes, including the avoided-retry rate (needs X-Admin-Token)"""
+    return {"gateway": llm_gateway.stats(), "parsing": parse_stats()}
+
+@health_router.post("/admin/profile", dependencies=[Depends(require_admin)])
+async def arm_profiler(count: int = 1, path: str = ""):
+    """Profile the next `count` requests whose path starts with `path` (needs X-Admin-Token)"""
+    profile_trigger.arm(max(0, min(count, 100)), path)
+    return {"armed": profile_trigger.remaining, "path_prefix": path, "profile_dir": Config.PROFILE_DIR}
+
+@health_router.get("/admin/usage", dependencies=[Depends(require_admin)])
+async def usage_report(days: int = 7, top: int = 20):
+    """Per-day LLM usage by call kind and the heaviest users, for capacity planning (needs X-Admin-Token)"""
+    return usage_ledger.report(max(1, min(days, 90)), max(1, min(top, 500)))
@@ -0,0 +1,192 @@
+import json
+import threading
+
+CLOSERS = {"{": "}", "[": "]"}
+
+class IncrementalJSONScanner:
+    """
+    Single-pass, chunk-fed scanner for the outermost JSON object in LLM output.
+
+    Text before the first '{' (prose, ```json fences) and after the object closes
+    is ignored. Trailing commas are dropped as they are seen, and `snapshot()` can
+    turn a truncated stream into valid JSON at any point: an unterminated value
+    string is closed, a dangling key/comma/partial literal is rolled back to the
+    last complete value, and open containers are closed in order.
+    """
+    def __init__(self):
+        self.buf = []
+        self.stack = []
+        self.started = False
+        self.done = False
+        self.in_string = False
+        self.string_is_key = False
+        self.escape = False
+        self.safe_len = 0
+        self.safe_stack = ()
+
+    def feed(self, chunk):
+        for ch in chunk:
+            if self.done:
+                return
+            if not self.started:
+                if ch == "{":
+                    self.started = True
+                    self._open(ch)
+                continue
+            if self.in_string:
+                self.buf.append(ch)
+                if self.escape:
+                    self.escape = False
+                elif ch == "\\":
+                    self.escape = True
+                elif ch == '"':
+                    self.in_string = False
+                    if not self.string_is_key:
+                        self._mark_safe()
+                continue
+
+            if ch == '"':
+                self.in_string = True
+                self.string_is_key = self._expecting_key()
+                self.buf.append(ch)
+            elif ch in "{[":
+                self._open(ch)
+            elif ch in "}]":
+                self._strip_trailing_comma()
+                if self.stack:
+                    self.stack.pop()
+                self.buf.append(ch)
+                self._mark_safe()
+                if not self.stack:
+                    self.done = True
+            elif ch == ",":
+                self._strip_trailing_whitespace()
+                # Everything before a comma is a complete value
+                self._mark_safe()
+                self.buf.append(ch)
+            else:
+                self.buf.append(ch)
+
+    def _open(self, ch):
+        self.stack.append(ch)
+        self.buf.append(ch)
+        self._mark_safe()
+
+    def _mark_safe(self):
+        self.safe_len = len(self.buf)
+        self.safe_stack = tuple(self.stack)
+
+    def _expecting_key(self):
+        if not self.stack or self.stack[-1] != "{":
+            return False
+        for ch in reversed(self.buf):
+            if not ch.isspace():
+                return ch in "{,"
+        return False
+
+    def _strip_trailing_whitespace(self):
+        while self.buf and self.buf[-1].isspace():
+            self.buf.pop()
+
+    def _strip_trailing_comma(self):
+        self._strip_trailing_whitespace()
+        if self.buf and self.buf[-1] == ",":
+            self.buf.pop()
+
+    def snapshot(self):
+        """Return the best valid JSON text for what has been fed so far (None if no object started)"""
+        if not self.started:
+            return None
+        if self.done:
+            return "".join(self.buf)
+
+        if self.in_string and not self.string_is_key:
+            # Truncated inside a value string: keep the text and close the string
+            buf = list(self.buf)
+            if self.escape:
+                buf.pop()
+            stack = list(self.stack)
+        else:
+            buf = self.buf[:self.safe_len]
+            stack = list(self.safe_stack)
+
+        text = "".join(buf).rstrip()
+        if text.endswith(","):
+            text = text[:-1]
+        if self.in_string and not self.string_is_key:
+            text += '"'
+        return text + "".join(CLOSERS[opener] for opener in reversed(stack))
+
+def strict_parse(text):
+    """The original extraction: strip markdown fences and json.loads the rest"""
+    content = text
+    if "```json" in content:
+        content = content.split("```json")[1].split("```")[0].strip()
+    elif "```" in content:
+        content = content.split("```")[1].split("```")[0].strip()
+    return json.loads(content)
+
+def salvage_floors(layout):
+    """Drop floors cut off mid-way (no closing </svg>); returns how many were dropped"""
+    floors = layout.get("floors")
+    if not isinstance(floors, list):
+        return 0
+    complete = [
+        floor for floor in floors
+        if isinstance(floor, dict) and str(floor.get("svg", "")).rstrip().endswith("</svg>")
+    ]
+    layout["floors"] = complete
+    return len(floors) - len(complete)
+
+_stats_lock = threading.Lock()
+PARSE_OUTCOMES = {"ok": 0, "repaired": 0, "salvaged": 0, "failed": 0}
+
+def _record(outcome):
+    with _stats_lock:
+        PARSE_OUTCOMES[outcome] += 1
+
+def parse_stats():
+    """Parse outcome counts plus the share of responses rescued that would otherwise need a retry"""
+    with _stats_lock:
+        counts = dict(PARSE_OUTCOMES)
+    total = sum(counts.values())
+    avoided = counts["repaired"] + counts["salvaged"]
+    return {**counts, "total": total, "avoided_retry_rate": (avoided / total) if total else 0.0}
+
+def parse_llm_json(text, required_keys=()):
+    """
+    Parse a JSON object out of LLM output, repairing it if needed.
+    Returns (data, outcome) where outcome is "ok" (parsed as-is), "repaired"
+    (fixed up), "salvaged" (truncated; incomplete floors dropped) or "failed"
+    (data is None). A repaired object must contain one of `required_keys` to count.
+    """
+    try:
+        data = strict_parse(text)
+        if isinstance(data, dict):
+            _record("ok")
+            return data, "ok"
+    except ValueError:
+        pass
+
+    scanner = IncrementalJSONScanner()
+    scanner.feed(text)
+    repaired = scanner.snapshot()
+    try:
+        data = json.loads(repaired) if repaired else None
+    except ValueError:
+        data = None
+    if not isinstance(data, dict) or (required_keys and not any(key in data for key in required_keys)):
+        _record("failed")
+        return None, "failed"
+
+    outcome = "repaired"
+    if not scanner.done:
+        dropped = salvage_floors(data)
+        if "floors" in data and not data["floors"]:
+            # Cut off before a single floor finished: nothing worth keeping
+            _record("failed")
+            return None, "failed"
+        if dropped or "floors" in data:
+            outcome = "salvaged"
+    _record(outcome)
+    return data, outcome
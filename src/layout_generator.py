@@ -1,107 +1,278 @@
 import os
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_core.prompts import PromptTemplate
+import asyncio
 import json
 from src.config import Config
+from src.llm_gateway import llm_gateway
+from src.json_repair import parse_llm_json
+from src.metrics import stage_timer
+
+# Static prefix, identical on every call so providers can cache it by prefix matching (Gemini implicit caching).
+# Everything that varies per request goes in LAYOUT_REQUEST_TEMPLATE after it.
+LAYOUT_SYSTEM_PROMPT = """You are an expert architect and interior designer.
+Each request gives a venture type, its area, a site outline and the user's specific requirements. Design a functional, professional, and aesthetic layout for it.
+
+SITE OUTLINE:
+The site outline is a rough hand-drawn sketch provided as sequential (x, y) points on an 800x400 grid.
+
+INSTRUCTIONS FOR LAYOUT DESIGN:
+1. RECTIFY THE SHAPE: The input coordinates are rough. First, interpret these as a clean geometric polygon. Align edges to be straight and use sharp, professional angles (orthogonal 90° angles preferred unless the sketch clearly implies a diagonal). This "rectified" shape will be the outer boundary of your design.
+2. ROOM PLANNING: Distribute rooms logically within this rectified boundary based on the venture type and area. Ensure efficient circulation and logical flow.
+3. MULTI-FLOOR/PAGE SUPPORT: If the user requirements suggest multiple floors, you MUST provide separate layouts for EACH floor.
+4. AREA ANALYSIS: Carefully consider if the requested area is sufficient for the venture type and user requirements.
+5. CONVERSATIONAL RESPONSE:
+   - Start with a friendly confirmation like: "Great news! I've successfully crafted a custom architectural layout that perfectly aligns with your requirements."
+   - Provide a professional summary of your design decisions and mention if the area is sufficient.
+   - CRITICAL: Provide a CLEAR LEGEND of all rooms/components with their corresponding numbers (from the SVG) and exact dimensions.
+     Example:
+     1. Master Bedroom: 15'x12'
+     2. Modular Kitchen: 10'x12'
+6. SVG STYLING & LABELING (CRITICAL FOR READABILITY):
+   - Use thick, dark lines (2px or 3px) for outer and internal walls.
+   - Use light, professional pastel fill colors for different room types (e.g., #EBF4FF for living, #F0FFF4 for kitchen).
+   - LABEL CLARITY & NUMBERING:
+     * Do NOT place long text names inside rooms as they often overlap.
+     * Instead, assign a unique NUMBER (1, 2, 3...) to each room.
+     * Place a small circle with the number inside it at the center of the room.
+     * If the room is too small, place a dot in the room and draw a thin leader line (line) to the number placed just outside the room outline.
+     * Ensure numbers are bold and legible (font-size: 14px).
+   - Add subtle 1px dashed lines for furniture or area suggestions.
+   - Ensure the SVG viewBox is set correctly to show the entire rectified layout with a 50px padding.
+
+Please provide a detailed floor plan in the following JSON format.
+{
+    "title": "Professional Project Name",
+    "description": "Architectural summary",
+    "conversational_response": "A friendly confirmation followed by expert architectural advice and a numbered legend of components. (ChatGPT style)",
+    "floors": [
+        {
+            "floor_name": "e.g., Ground Floor",
+            "rooms": [
+                {"id": 1, "name": "Room Name", "size": "e.g., 12' x 15'", "position": "Description of location"}
+            ],
+            "svg": "<svg ...>...</svg>"
+        }
+    ]
+}"""
+
+LAYOUT_REQUEST_TEMPLATE = """Venture type: {venture_type}
+Area: {area}
+Site outline: {dimensions}
+User's specific requirements: {user_prompt}"""
+
+def compact_outline(dimensions):
+    """Site outline as "(x,y) (x,y) ..." in whole grid units, instead of JSON with full-precision floats"""
+    points = []
+    for point in dimensions or []:
+        if isinstance(point, dict) and "x" in point and "y" in point:
+            x, y = point["x"], point["y"]
+        elif isinstance(point, (list, tuple)) and len(point) == 2:
+            x, y = point
+        else:
+            return json.dumps(dimensions, separators=(",", ":"))
+        try:
+            points.append(f"({round(float(x))},{round(float(y))})")
+        except (TypeError, ValueError):
+            return json.dumps(dimensions, separators=(",", ":"))
+    return " ".join(points) or "not provided"
 
 class LayoutGenerator:
     def __init__(self):
-        self.api_key = Config.GEMINI_API_KEY
-        if not self.api_key:
-            raise ValueError("GEMINI_API_KEY not found in configuration or .env file. Please add it to proceed.")
-            
-        self.llm = ChatGoogleGenerativeAI(
-            model="gemini-2.5-flash",
-            google_api_key=self.api_key,
-            temperature=0.7
-        )
+        self._llm = None
+        self._json_llm = None
+        self._layout_prompt = None
+
+    @property
+    def llm(self):
+        # Built on first use so importing the app never needs provider credentials
+        if self._llm is None:
+            # langchain and the provider SDK are imported here, off the app's import path
+            from src.llm_backends import create_llm
+            self._llm = create_llm()
+            print(f"🧠 LLM backend ready: {Config.LLM_BACKEND} ({self._llm._llm_type})")
+        return self._llm
+
+    @property
+    def json_llm(self):
+        """Same backend, asked for JSON-only output (structured output mode) where supported"""
+        if self._json_llm is None:
+            from src.llm_backends import create_llm
+            self._json_llm = create_llm(json_mode=Config.LLM_JSON_MODE)
+        return self._json_llm
+
+    def warm(self):
+        """Build the chat models and compile the layout prompt ahead of the first request"""
+        self.llm
+        self.layout_prompt
+
+    @property
+    def layout_prompt(self):
+        """Static system prefix + request chat template, compiled once"""
+        if self._layout_prompt is None:
+            from langchain_core.messages import SystemMessage
+            from langchain_core.prompts import ChatPromptTemplate
+            # The static prefix is a literal message, so its JSON example needs no brace escaping
+            self._layout_prompt = ChatPromptTemplate.from_messages(
+                [SystemMessage(content=LAYOUT_SYSTEM_PROMPT), ("human", LAYOUT_REQUEST_TEMPLATE)]
+            )
+        return self._layout_prompt
+
+    def _build_inputs(self, venture_type, area, dimensions, user_prompt):
+        return {
+            "venture_type": venture_type,
+            "area": area,
+            "dimensions": compact_outline(dimensions),
+            "user_prompt": user_prompt
+        }
+
+    def _parse_response(self, response, required_keys=("floors", "svg")):
+        """
+        Extract the layout JSON from a raw LLM response. Stray text, trailing commas
+        and truncation are repaired where possible (keeping the floors that completed)
+        so a nearly-good generation does not have to be thrown away and retried.
+        """
+        with stage_timer("layout.parse"):
+            data, outcome = parse_llm_json(response.content, required_keys)
+        if data is None:
+            print(f"Error parsing LLM response ({len(response.content)} chars)")
+            return {
+                "error": "Failed to parse layout data",
+                "raw_content": response.content
+            }
+        if outcome != "ok":
+            print(f"🩹 LLM response {outcome}, retry avoided")
+        return data
 
     def generate_layout(self, venture_type, area, dimensions, user_prompt):
         """
         Generate a layout based on user input.
         Returns a JSON object with layout details and potentially SVG code.
         """
-        prompt_template = """
-        You are an expert architect and interior designer. 
-        Your task is to design a functional, professional, and aesthetic layout for a {venture_type} with an area of {area}.
-        
-        CRITICAL INPUT - SITE OUTLINE:
-        The site outline below is a rough hand-drawn sketch provided as sequential (x, y) coordinates on an 800x400 grid:
-        {dimensions}
-
-        INSTRUCTIONS FOR LAYOUT DESIGN:
-        1. RECTIFY THE SHAPE: The input coordinates are rough. First, interpret these as a clean geometric polygon. Align edges to be straight and use sharp, professional angles (orthogonal 90° angles preferred unless the sketch clearly implies a diagonal). This "rectified" shape will be the outer boundary of your design.
-        2. ROOM PLANNING: Distribute rooms logically within this rectified boundary based on the {venture_type} and {area}. Ensure efficient circulation and logical flow.
-        3. MULTI-FLOOR/PAGE SUPPORT: If the user requirements suggest multiple floors, you MUST provide separate layouts for EACH floor.
-        4. AREA ANALYSIS: Carefully consider if the requested {area} is sufficient for the {venture_type} and user requirements. 
-        5. CONVERSATIONAL RESPONSE:
-           - Start with a friendly confirmation like: "Great news! I've successfully crafted a custom architectural layout that perfectly aligns with your requirements."
-           - Provide a professional summary of your design decisions and mention if the area is sufficient.
-           - CRITICAL: Provide a CLEAR LEGEND of all rooms/components with their corresponding numbers (from the SVG) and exact dimensions. 
-             Example:
-             1. Master Bedroom: 15'x12'
-             2. Modular Kitchen: 10'x12'
-        6. SVG STYLING & LABELING (CRITICAL FOR READABILITY):
-           - Use thick, dark lines (2px or 3px) for outer and internal walls.
-           - Use light, professional pastel fill colors for different room types (e.g., #EBF4FF for living, #F0FFF4 for kitchen).
-           - LABEL CLARITY & NUMBERING: 
-             * Do NOT place long text names inside rooms as they often overlap.
-             * Instead, assign a unique NUMBER (1, 2, 3...) to each room.
-             * Place a small circle with the number inside it at the center of the room.
-             * If the room is too small, place a dot in the room and draw a thin leader line (line) to the number placed just outside the room outline.
-             * Ensure numbers are bold and legible (font-size: 14px).
-           - Add subtle 1px dashed lines for furniture or area suggestions.
-           - Ensure the SVG viewBox is set correctly to show the entire rectified layout with a 50px padding.
-        
-        User's specific requirements: {user_prompt}
-
-        Please provide a detailed floor plan in the following JSON format. 
+        return asyncio.run(self.agenerate_layout(venture_type, area, dimensions, user_prompt))
+
+    async def agenerate_layout(self, venture_type, area, dimensions, user_prompt, user_id=None, timeout=None):
+        """Async counterpart of generate_layout; the call goes through the LLM gateway's limits"""
+        inputs = self._build_inputs(venture_type, area, dimensions, user_prompt)
+        messages = self.layout_prompt.format_messages(**inputs)
+        with stage_timer("layout.llm_call"):
+            response = await llm_gateway.call(
+                lambda: self.json_llm.ainvoke(messages), user_id=user_id, timeout=timeout, kind="layout"
+            )
+        return self._parse_response(response)
+
+    async def achat(self, messages, user_id=None):
+        """Send a list of (role, text) messages to the LLM through the gateway"""
+        with stage_timer("chat.llm_call"):
+            return await llm_gateway.call(lambda: self.llm.ainvoke(messages), user_id=user_id, kind="chat")
+
+    async def generate_variants(self, venture_type, area, dimensions, user_prompt, count, user_id=None, timeout=None):
+        """
+        Generate `count` alternative layouts concurrently.
+        Yields (variant_index, result) pairs in completion order. At most
+        Config.LAYOUT_VARIANT_CONCURRENCY calls are in flight at once, each one is
+        bounded by `timeout` seconds, and a failed or unparseable variant is
+        reported on its own without holding up the others. Closing the
+        generator early (e.g. the client disconnected) cancels whatever is
+        still running.
+        """
+        timeout = timeout or Config.LLM_TIMEOUT_SECONDS
+        semaphore = asyncio.Semaphore(Config.LAYOUT_VARIANT_CONCURRENCY)
+
+        async def run_variant(index):
+            async with semaphore:
+                try:
+                    result = await self.agenerate_layout(
+                        venture_type, area, dimensions, user_prompt, user_id=user_id, timeout=timeout
+                    )
+                except Exception as e:
+                    result = {"error": str(e)}
+            return index, result
+
+        tasks = [asyncio.ensure_future(run_variant(i)) for i in range(count)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    async def aedit_layout(self, layout, instruction, floor_index=0, user_id=None):
+        """
+        Turn a chat instruction into a patch for a single floor of an existing layout.
+        Only the target floor is sent in full; the other floors are summarised so the
+        model keeps the overall context at a fraction of the tokens of a regeneration.
+        Returns {"floor_index", "floor", "reply"} or {"error": ...}.
+        """
+        floors = get_layout_floors(layout)
+        if not floors:
+            return {"error": "Layout has no floors to edit"}
+        if not 0 <= floor_index < len(floors):
+            return {"error": f"Floor index {floor_index} is out of range"}
+
+        target = floors[floor_index]
+        other_floors = ""
+        for idx, floor in enumerate(floors):
+            if idx == floor_index:
+                continue
+            other_floors += f"\nFloor: {floor.get('floor_name')}\n"
+            for room in floor.get("rooms", []):
+                other_floors += f"- {room.get('id')}. {room.get('name')} ({room.get('size')})\n"
+
+        system_prompt = f"""
+        You are an expert architect editing ONE floor of an existing layout.
+        Apply the user's change to the floor below and keep everything else as it is:
+        same numbering scheme, same SVG styling, same outer boundary and viewBox.
+        Only move, resize, add or remove the rooms the instruction is about.
+
+        OTHER FLOORS (context only, do not change):{other_floors or " none"}
+
+        FLOOR TO EDIT (JSON):
+        {json.dumps(target)}
+
+        Respond ONLY with JSON in this format:
         {{
-            "title": "Professional Project Name",
-            "description": "Architectural summary",
-            "conversational_response": "A friendly confirmation followed by expert architectural advice and a numbered legend of components. (ChatGPT style)",
-            "floors": [
-                {{
-                    "floor_name": "e.g., Ground Floor",
-                    "rooms": [
-                        {{"id": 1, "name": "Room Name", "size": "e.g., 12' x 15'", "position": "Description of location"}}
-                    ],
-                    "svg": "<svg ...>...</svg>"
-                }}
-            ]
+            "reply": "One or two sentences explaining what you changed",
+            "floor": {{"floor_name": "...", "rooms": [...], "svg": "<svg ...>...</svg>"}}
         }}
         """
 
-        prompt = PromptTemplate(
-            input_variables=["venture_type", "area", "dimensions", "user_prompt"],
-            template=prompt_template
-        )
+        with stage_timer("edit.llm_call"):
+            response = await llm_gateway.call(lambda: self.json_llm.ainvoke([
+                ("system", system_prompt),
+                ("human", instruction)
+            ]), user_id=user_id, kind="edit")
+        result = self._parse_response(response, required_keys=("floor",))
+        if "error" in result:
+            return result
 
-        # Using the new LCEL approach for LangChain
-        chain = prompt | self.llm
-        
-        response = chain.invoke({
-            "venture_type": venture_type,
-            "area": area,
-            "dimensions": json.dumps(dimensions),
-            "user_prompt": user_prompt
-        })
-
-        content = response.content
-        
-        # Clean up JSON if LLM added markdown backticks
-        if "```json" in content:
-            content = content.split("```json")[1].split("```")[0].strip()
-        elif "```" in content:
-            content = content.split("```")[1].split("```")[0].strip()
-            
-        try:
-            return json.loads(content)
-        except Exception as e:
-            print(f"Error parsing Gemini response: {e}")
-            return {
-                "error": "Failed to parse layout data",
-                "raw_content": response.content
-            }
+        floor = result.get("floor")
+        if not isinstance(floor, dict) or not str(floor.get("svg", "")).rstrip().endswith("</svg>"):
+            return {"error": "Edit did not return an updated floor"}
+        floor.setdefault("floor_name", target.get("floor_name"))
+        floor.setdefault("rooms", target.get("rooms", []))
+        return {
+            "floor_index": floor_index,
+            "floor": floor,
+            "reply": result.get("reply", "")
+        }
+
+def get_layout_floors(layout):
+    """Return the floors of a layout, treating legacy single-floor layouts as one floor"""
+    floors = layout.get("floors")
+    if floors:
+        return floors
+    if layout.get("svg"):
+        return [{"floor_name": "Ground Floor", "rooms": layout.get("rooms", []), "svg": layout["svg"]}]
+    return []
+
+def apply_layout_patch(layout, patch):
+    """Return a copy of `layout` with the patched floor swapped in; other floors are untouched"""
+    floors = list(get_layout_floors(layout))
+    floors[patch["floor_index"]] = patch["floor"]
+    updated = dict(layout)
+    updated.pop("svg", None)
+    updated.pop("rooms", None)
+    updated["floors"] = floors
+    return updated
 
 layout_generator = LayoutGenerator()
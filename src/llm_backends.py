@@ -0,0 +1,211 @@
+import re
+import json
+import time
+import random
+import asyncio
+import hashlib
+import httpx
+from typing import Any, Optional
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatResult, ChatGeneration
+from src.config import Config
+
+STUB_ROOM_SETS = [
+    [("Living Room", "15' x 12'"), ("Kitchen", "10' x 12'"), ("Master Bedroom", "14' x 12'"), ("Bathroom", "8' x 6'")],
+    [("Reception", "12' x 10'"), ("Open Workspace", "30' x 20'"), ("Meeting Room", "14' x 12'"), ("Pantry", "8' x 8'")],
+    [("Sales Floor", "30' x 25'"), ("Storage", "12' x 10'"), ("Billing Counter", "8' x 6'"), ("Restroom", "6' x 6'")],
+]
+
+def stub_layout(seed_text):
+    """Deterministic canned layout for a prompt: same prompt, same layout"""
+    digest = int(hashlib.sha256(seed_text.encode("utf-8")).hexdigest(), 16)
+    room_set = STUB_ROOM_SETS[digest % len(STUB_ROOM_SETS)]
+    match = re.search(r"REQUIRED FLOORS:\s*(\d+)", seed_text)
+    floor_count = max(1, min(int(match.group(1)) if match else 1, 4))
+
+    floors = []
+    for floor_idx in range(floor_count):
+        rooms = []
+        shapes = []
+        for room_idx, (name, size) in enumerate(room_set):
+            x = 50 + (room_idx % 2) * 400
+            y = 50 + (room_idx // 2) * 200
+            rooms.append({"id": room_idx + 1, "name": name, "size": size, "position": f"Quadrant {room_idx + 1}"})
+            shapes.append(
+                f'<rect x="{x}" y="{y}" width="400" height="200" fill="#EBF4FF" stroke="#1f2937" stroke-width="3"/>'
+                f'<circle cx="{x + 200}" cy="{y + 100}" r="14" fill="#fff" stroke="#1f2937"/>'
+                f'<text x="{x + 200}" y="{y + 105}" font-size="14" font-weight="bold" text-anchor="middle">{room_idx + 1}</text>'
+            )
+        floors.append({
+            "floor_name": "Ground Floor" if floor_idx == 0 else f"Floor {floor_idx}",
+            "rooms": rooms,
+            "svg": f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 900 500">{"".join(shapes)}</svg>'
+        })
+
+    legend = "\n".join(f"{room['id']}. {room['name']}: {room['size']}" for room in floors[0]["rooms"])
+    return {
+        "title": f"Stub Layout {digest % 10000:04d}",
+        "description": "Deterministic layout produced by the offline stub backend.",
+        "conversational_response": f"Great news! I've successfully crafted a custom architectural layout.\n{legend}",
+        "floors": floors
+    }
+
+def stub_reply(messages):
+    """Pick a canned reply matching what the prompt asks for (full layout, floor edit or chat)"""
+    prompt = "\n".join(str(message.content) for message in messages)
+    if '"floors"' in prompt:
+        return json.dumps(stub_layout(prompt))
+    if '"floor"' in prompt and '"reply"' in prompt:
+        floor = stub_layout(prompt)["floors"][0]
+        return json.dumps({"reply": "Updated the requested rooms on this floor.", "floor": floor})
+    return "That works well with this layout. Keep circulation paths at least 3' wide around the changed rooms."
+
+def parse_latency_spec(spec):
+    """
+    Parse a latency distribution such as "fixed:0.5", "uniform:0.2,1.5",
+    "normal:0.8,0.2" or "lognormal:-0.5,0.4" (seconds) into a sampler.
+    """
+    kind, _, params = (spec or "fixed:0").partition(":")
+    values = [float(v) for v in params.split(",") if v.strip()] or [0.0]
+    if kind == "fixed":
+        return lambda rng: values[0]
+    if kind == "uniform":
+        return lambda rng: rng.uniform(values[0], values[1])
+    if kind == "normal":
+        return lambda rng: max(0.0, rng.gauss(values[0], values[1]))
+    if kind == "lognormal":
+        return lambda rng: rng.lognormvariate(values[0], values[1])
+    raise ValueError(f"Unknown latency distribution '{kind}'")
+
+def estimate_usage(messages, content):
+    input_tokens = sum(len(str(message.content)) for message in messages) // 4
+    output_tokens = len(content) // 4
+    return {"input_tokens": input_tokens, "output_tokens": output_tokens, "total_tokens": input_tokens + output_tokens}
+
+class StubChatModel(BaseChatModel):
+    """Offline chat model returning canned layouts after a simulated, seeded latency"""
+    latency: str = "fixed:0"
+    seed: int = 0
+    rng: Any = None
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.rng = random.Random(self.seed)
+
+    @property
+    def _llm_type(self) -> str:
+        return "dreamlayout-stub"
+
+    def _result(self, messages):
+        content = stub_reply(messages)
+        message = AIMessage(content=content, usage_metadata=estimate_usage(messages, content))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        time.sleep(parse_latency_spec(self.latency)(self.rng))
+        return self._result(messages)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        await asyncio.sleep(parse_latency_spec(self.latency)(self.rng))
+        return self._result(messages)
+
+OPENAI_ROLES = {"system": "system", "human": "user", "ai": "assistant"}
+
+class OpenAICompatibleChatModel(BaseChatModel):
+    """Chat model for any OpenAI-compatible /chat/completions server (vLLM, llama.cpp, Ollama, the fake server)"""
+    base_url: str
+    model: str
+    api_key: Optional[str] = None
+    temperature: float = 0.7
+    timeout: float = 120
+    json_mode: bool = False
+
+    @property
+    def _llm_type(self) -> str:
+        return "openai-compatible"
+
+    def _request(self, messages, stop):
+        payload = {
+            "model": self.model,
+            "temperature": self.temperature,
+            "messages": [{"role": OPENAI_ROLES.get(m.type, "user"), "content": m.content} for m in messages]
+        }
+        if stop:
+            payload["stop"] = stop
+        if self.json_mode:
+            payload["response_format"] = {"type": "json_object"}
+        headers = {"Authorization": f"Bearer {self.api_key}"} if self.api_key else {}
+        return f"{self.base_url.rstrip('/')}/chat/completions", payload, headers
+
+    def _to_result(self, res):
+        res.raise_for_status()
+        body = res.json()
+        content = body["choices"][0]["message"]["content"]
+        usage = body.get("usage") or {}
+        message = AIMessage(content=content, usage_metadata={
+            "input_tokens": usage.get("prompt_tokens", 0),
+            "output_tokens": usage.get("completion_tokens", 0),
+            "total_tokens": usage.get("total_tokens", 0),
+            # Servers with automatic prefix caching (OpenAI, vLLM) report the reused part of the prompt
+            "input_token_details": {"cache_read": (usage.get("prompt_tokens_details") or {}).get("cached_tokens") or 0}
+        })
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        url, payload, headers = self._request(messages, stop)
+        return self._to_result(httpx.post(url, json=payload, headers=headers, timeout=self.timeout))
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        url, payload, headers = self._request(messages, stop)
+        async with httpx.AsyncClient(timeout=self.timeout) as client:
+            return self._to_result(await client.post(url, json=payload, headers=headers))
+
+def create_gemini_llm(json_mode=False):
+    if not Config.GEMINI_API_KEY:
+        raise ValueError("GEMINI_API_KEY not found in configuration or .env file. Please add it to proceed.")
+    # Imported here so the stub and local backends work without the Google SDK installed
+    from langchain_google_genai import ChatGoogleGenerativeAI
+    return ChatGoogleGenerativeAI(
+        model=Config.LLM_MODEL,
+        google_api_key=Config.GEMINI_API_KEY,
+        temperature=Config.LLM_TEMPERATURE,
+        response_mime_type="application/json" if json_mode else None,
+        # LLMGateway is the only retry layer: the SDK would otherwise retry 6 times inside each attempt
+        max_retries=0,
+        timeout=Config.LLM_ATTEMPT_TIMEOUT_SECONDS
+    )
+
+def create_openai_compatible_llm(json_mode=False):
+    return OpenAICompatibleChatModel(
+        base_url=Config.LLM_BASE_URL,
+        model=Config.LLM_MODEL,
+        api_key=Config.LLM_API_KEY or None,
+        temperature=Config.LLM_TEMPERATURE,
+        timeout=Config.LLM_ATTEMPT_TIMEOUT_SECONDS,
+        json_mode=json_mode
+    )
+
+def create_stub_llm(json_mode=False):
+    # The stub already answers layout prompts with bare JSON
+    return StubChatModel(latency=Config.LLM_STUB_LATENCY, seed=Config.LLM_STUB_SEED)
+
+LLM_BACKENDS = {
+    "gemini": create_gemini_llm,
+    "openai": create_openai_compatible_llm,
+    "stub": create_stub_llm,
+}
+
+def register_backend(name, factory):
+    """
+    Register an extra backend factory: a callable taking `json_mode` (ask the
+    provider for JSON-only output where it supports it) and returning a LangChain chat model.
+    """
+    LLM_BACKENDS[name] = factory
+
+def create_llm(name=None, json_mode=False):
+    """Build the chat model for the configured (or given) backend"""
+    name = name or Config.LLM_BACKEND
+    if name not in LLM_BACKENDS:
+        raise ValueError(f"Unknown LLM_BACKEND '{name}'. Available: {', '.join(sorted(LLM_BACKENDS))}")
+    return LLM_BACKENDS[name](json_mode=json_mode)
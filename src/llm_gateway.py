@@ -0,0 +1,245 @@
+import time
+import random
+import asyncio
+from collections import deque
+from src.config import Config
+from src.metrics import llm_calls, record_llm_usage
+from src.tracing import span
+from src.usage import usage_ledger
+
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+RETRYABLE_ERROR_NAMES = (
+    "ResourceExhausted", "ServiceUnavailable", "DeadlineExceeded",
+    "InternalServerError", "TooManyRequests", "RateLimit", "Timeout", "Connect"
+)
+
+class LLMUnavailableError(Exception):
+    """Raised without calling the provider while the circuit breaker is open"""
+
+class LLMTimeoutError(Exception):
+    """Raised when a call (including its retries) runs past its deadline"""
+
+class LLMQueueTimeoutError(LLMTimeoutError):
+    """Raised when the deadline passes while a call waits for a concurrency slot (the provider was never asked)"""
+
+def is_retryable(exc):
+    """Decide whether a provider error is worth retrying (rate limits, 5xx, timeouts, connection drops)"""
+    if isinstance(exc, (asyncio.TimeoutError, ConnectionError)):
+        return True
+    response = getattr(exc, "response", None)
+    for source, attr in ((exc, "status_code"), (exc, "code"), (exc, "status"), (response, "status_code")):
+        value = getattr(source, attr, None)
+        if isinstance(value, int) and value in RETRYABLE_STATUS_CODES:
+            return True
+    name = type(exc).__name__
+    return any(part in name for part in RETRYABLE_ERROR_NAMES)
+
+class CircuitBreaker:
+    """Opens after `threshold` consecutive failures and lets a single trial call through after `cooldown` seconds"""
+    def __init__(self, threshold, cooldown):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.cooldown:
+            return "half-open"
+        return "open"
+
+    def allow(self):
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half-open" and not self.trial_in_flight:
+            self.trial_in_flight = True
+            return True
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+
+    def release_trial(self):
+        """End a trial call that told us nothing about the provider, so the next one can go through"""
+        self.trial_in_flight = False
+
+    def record_failure(self):
+        self.failures += 1
+        self.trial_in_flight = False
+        if self.opened_at is not None or self.failures >= self.threshold:
+            self.opened_at = time.monotonic()
+
+class LLMGateway:
+    """
+    Single choke point for outbound LLM calls: global and per-user concurrency
+    limits, a deadline per call, jittered-backoff retries, optional hedged
+    duplicates for slow calls and a circuit breaker that fails fast.
+    """
+    def __init__(self):
+        self.breaker = CircuitBreaker(Config.LLM_BREAKER_THRESHOLD, Config.LLM_BREAKER_COOLDOWN_SECONDS)
+        self.latencies = deque(maxlen=200)
+        self._loop = None
+        self._global = None
+        self._per_user = {}
+        self.in_flight = 0
+
+    def _limits(self):
+        # asyncio primitives belong to one event loop; rebuild them if we are now on another one
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop = loop
+            self._global = asyncio.Semaphore(Config.LLM_MAX_CONCURRENCY)
+            self._per_user = {}
+        return self._global
+
+    def _user_slot(self, user_id):
+        entry = self._per_user.get(user_id)
+        if entry is None:
+            entry = self._per_user[user_id] = [asyncio.Semaphore(Config.LLM_PER_USER_CONCURRENCY), 0]
+        return entry
+
+    def p95_latency(self):
+        if len(self.latencies) < 20:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[int(len(ordered) * 0.95) - 1]
+
+    def stats(self):
+        return {
+            "breaker": self.breaker.state,
+            "consecutive_failures": self.breaker.failures,
+            "p95_latency": self.p95_latency(),
+            "in_flight": self.in_flight
+        }
+
+    async def call(self, make_call, user_id=None, timeout=None, kind="other"):
+        """
+        Run `make_call()` (a zero-argument function returning an awaitable) under the
+        gateway's limits. `timeout` is the overall deadline in seconds, retries included.
+        The user's quota is checked first, and the call is added to the usage ledger under `kind`.
+        """
+        if user_id is not None:
+            try:
+                await usage_ledger.acheck(user_id)
+            except Exception:
+                llm_calls.inc(outcome="quota")
+                raise
+        if not self.breaker.allow():
+            llm_calls.inc(outcome="unavailable")
+            raise LLMUnavailableError("The layout AI is temporarily unavailable. Please try again shortly.")
+
+        started = time.monotonic()
+        deadline = started + (timeout or Config.LLM_TIMEOUT_SECONDS)
+        global_slot = self._limits()
+        user_entry = self._user_slot(user_id) if user_id is not None else None
+        if user_entry:
+            user_entry[1] += 1
+        self.in_flight += 1
+        held = []
+        try:
+            # Waiting for a slot counts against the deadline too
+            for semaphore in ((user_entry[0],) if user_entry else ()) + (global_slot,):
+                await self._acquire(semaphore, deadline)
+                held.append(semaphore)
+            result = await self._call_with_retries(make_call, deadline)
+        except Exception as e:
+            usage_ledger.record(user_id, kind, None, time.monotonic() - started)
+            if isinstance(e, LLMQueueTimeoutError):
+                llm_calls.inc(outcome="queue_timeout")
+            else:
+                llm_calls.inc(outcome="timeout" if isinstance(e, LLMTimeoutError) else "error")
+            # Only provider trouble counts against the breaker. Local queueing and rejected
+            # requests say nothing about its health, so they leave the failure count alone.
+            if is_retryable(e) and not isinstance(e, LLMQueueTimeoutError):
+                self.breaker.record_failure()
+            else:
+                self.breaker.release_trial()
+            raise
+        finally:
+            for semaphore in held:
+                semaphore.release()
+            self.in_flight -= 1
+            if user_entry:
+                user_entry[1] -= 1
+                if user_entry[1] == 0:
+                    self._per_user.pop(user_id, None)
+        self.breaker.record_success()
+        llm_calls.inc(outcome="ok")
+        record_llm_usage(result)
+        usage_ledger.record(user_id, kind, result, time.monotonic() - started)
+        return result
+
+    async def _acquire(self, semaphore, deadline):
+        try:
+            await asyncio.wait_for(semaphore.acquire(), timeout=max(0, deadline - time.monotonic()))
+        except asyncio.TimeoutError:
+            raise LLMQueueTimeoutError("The layout AI is busy. Please try again shortly.")
+
+    async def _call_with_retries(self, make_call, deadline):
+        attempt = 0
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise LLMTimeoutError("The layout AI did not respond in time.")
+            try:
+                started = time.monotonic()
+                with span("llm.attempt", backend=Config.LLM_BACKEND, attempt=attempt + 1):
+                    result = await self._attempt(make_call, min(remaining, Config.LLM_ATTEMPT_TIMEOUT_SECONDS))
+                self.latencies.append(time.monotonic() - started)
+                return result
+            except Exception as e:
+                attempt += 1
+                # Full jitter: sleep a random amount up to the exponential backoff cap
+                backoff = min(Config.LLM_RETRY_MAX_DELAY, Config.LLM_RETRY_BASE_DELAY * (2 ** attempt))
+                delay = random.uniform(0, backoff)
+                out_of_time = time.monotonic() + delay >= deadline
+                if attempt > Config.LLM_MAX_RETRIES or not is_retryable(e) or out_of_time:
+                    if isinstance(e, asyncio.TimeoutError):
+                        raise LLMTimeoutError("The layout AI did not respond in time.")
+                    raise
+                print(f"🔁 LLM call failed ({type(e).__name__}), retry {attempt} in {delay:.2f}s")
+                await asyncio.sleep(delay)
+
+    async def _attempt(self, make_call, remaining):
+        hedge_after = self.p95_latency() if Config.LLM_HEDGE_ENABLED else None
+        if hedge_after is None or hedge_after >= remaining:
+            return await asyncio.wait_for(make_call(), timeout=remaining)
+
+        # Hedged request: if the primary is slower than our p95, race a duplicate against it
+        deadline = time.monotonic() + remaining
+        primary = asyncio.ensure_future(make_call())
+        tasks = [primary]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=hedge_after)
+            if not done and not self._global.locked():
+                async with self._global:
+                    tasks.append(asyncio.ensure_future(make_call()))
+                    return await self._first_success(tasks, deadline)
+            return await self._first_success(tasks, deadline)
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    async def _first_success(self, tasks, deadline):
+        pending = set(tasks)
+        error = None
+        while pending:
+            done, pending = await asyncio.wait(
+                pending, timeout=max(0, deadline - time.monotonic()), return_when=asyncio.FIRST_COMPLETED
+            )
+            if not done:
+                raise asyncio.TimeoutError()
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                error = task.exception()
+        raise error
+
+llm_gateway = LLMGateway()
@@ -1,38 +1,97 @@
-from fastapi import APIRouter, Request, Form, Depends, File, UploadFile, status, HTTPException
-from fastapi.responses import HTMLResponse, RedirectResponse
+from fastapi import APIRouter, Request, Form, Depends, status, HTTPException
+from fastapi.responses import HTMLResponse, RedirectResponse, StreamingResponse
+from starlette.datastructures import UploadFile as StarletteUploadFile
+from starlette.concurrency import run_in_threadpool
 import time
 import json
+import uuid
 import base64
-import cloudinary
-import cloudinary.uploader
-import cloudinary.api
 
 from src.database import (
     get_user_projects, update_user, delete_user_db, add_user_project, 
-    get_project_by_id, soft_delete_project, restore_project, 
-    hard_delete_project, get_user_archived_projects, update_project_status,
-    get_favourite_projects, get_public_projects
+    get_project_by_id, get_user_archived_projects, update_project_status,
+    get_favourite_projects, update_project_layout, bulk_project_action, BULK_PROJECT_ACTIONS,
+    enqueue_cleanup_job
 )
 from src.config import Config
 from src.fastapi_utils import flash, render_template
-from src.layout_generator import layout_generator
+from src.utils import get_cloudinary
+from src.avatars import AvatarError, read_limited_form, store_avatar, avatar_public_ids
+from src.metrics import stage_timer
+from src.layout_generator import layout_generator, apply_layout_patch, get_layout_floors
+from src.chat_sessions import chat_sessions, project_session_key, preview_session_key
+from src.usage import usage_ledger
+from src.gallery import public_gallery, cached_response
+from src.api import (
+    APIResponse, APIError, api_user, dumps, generated, llm_error, API_ERRORS,
+    GenerateRequest, GenerateVariantsRequest, SaveProjectRequest, BulkActionRequest, ChatRequest,
+    SuccessResponse, LayoutResponse, GenerateLayoutResponse, SaveProjectResponse, BulkActionResponse,
+    ChatResponse, ChatEditResponse, UsageResponse, Layout, Floor
+)
 
 main_router = APIRouter(tags=["Main"])
 
-@main_router.post("/api/generate-layout")
-async def api_generate_layout(request: Request):
-    if not request.state.user:
-        return {"error": "Unauthorized"}, 401
-    
-    data = await request.json()
-    venture_type = data.get("venture_type")
-    area = data.get("area")
-    dimensions = data.get("dimensions")
-    user_prompt = data.get("prompt")
+def normalize_svg(svg_content):
+    """Ensure the SVG has its XML namespace and declaration so Cloudinary processes it"""
+    # Robust SVG normalization: Ensure required XML namespaces are present
+    if 'xmlns=' not in svg_content.lower():
+        svg_content = svg_content.replace('<svg', '<svg xmlns="http://www.w3.org/2000/svg"')
     
+    # Add XML declaration if missing to ensure proper processing
+    if '<?xml' not in svg_content:
+        svg_content = '<?xml version="1.0" encoding="UTF-8"?>' + svg_content
+    return svg_content
+
+def upload_layout_svg(svg_content, title, user_key, suffix=""):
+    """
+    Normalize a layout SVG and upload it to the user's Cloudinary project folder.
+    Returns (svg_content, cloudinary_url); the url is None if there was nothing to
+    upload or the upload failed.
+    """
+    if not svg_content:
+        return svg_content, None
     try:
-        result = layout_generator.generate_layout(venture_type, area, dimensions, user_prompt)
+        with stage_timer("svg.normalize"):
+            svg_content = normalize_svg(svg_content)
+
+        svg_base64 = base64.b64encode(svg_content.encode('utf-8')).decode('utf-8')
+        data_uri = f"data:image/svg+xml;base64,{svg_base64}"
+        
+        timestamp = int(time.time())
+        project_slug = (title or "layout").lower().replace(" ", "_")[:20]
+        
+        print(f"🔄 Syncing to Cloudinary: project={project_slug}, user={user_key[:8]}...")
+        
+        with stage_timer("cloudinary.upload_layout"):
+            upload_res = get_cloudinary().uploader.upload(
+                data_uri,
+                folder=f"dreamlayout_projects/u_{user_key}",
+                public_id=f"{project_slug}{suffix}_{timestamp}",
+                format="svg",
+                resource_type="image"
+            )
         
+        cloudinary_url = upload_res.get('secure_url')
+        print(f"✅ Cloudinary Sync Success: {cloudinary_url}")
+        return svg_content, cloudinary_url
+    except Exception as ce:
+        print(f"❌ Cloudinary Sync Failed: {str(ce)}")
+        return svg_content, None
+
+async def generate_for(body: GenerateRequest, user_id):
+    """Run the layout generator for an /api request; returns (raw result, typed Layout)"""
+    try:
+        result = await layout_generator.agenerate_layout(
+            body.venture_type, body.area, body.dimensions, body.prompt, user_id=user_id
+        )
+    except Exception as e:
+        raise llm_error(e)
+    return result, generated(Layout, result)
+
+@main_router.post("/api/generate-layout", response_model=GenerateLayoutResponse, responses=API_ERRORS)
+async def api_generate_layout(body: GenerateRequest, user=Depends(api_user)):
+    result, layout = await generate_for(body, user.id)
+    try:
         # Handle multiple floors if present
         floors = result.get("floors", [])
         if floors:
@@ -43,57 +102,23 @@ async def api_generate_layout(request: Request):
             rooms_data = json.dumps(result.get("rooms", []))
 
         # Upload SVG to Cloudinary
-        cloudinary_url = None
-        if svg_content:
-            try:
-                # Robust SVG normalization: Ensure required XML namespaces are present
-                if 'xmlns=' not in svg_content.lower():
-                    svg_content = svg_content.replace('<svg', '<svg xmlns="http://www.w3.org/2000/svg"')
-                
-                # Add XML declaration if missing to ensure proper processing
-                if '<?xml' not in svg_content:
-                    svg_content = '<?xml version="1.0" encoding="UTF-8"?>' + svg_content
-
-                svg_base64 = base64.b64encode(svg_content.encode('utf-8')).decode('utf-8')
-                data_uri = f"data:image/svg+xml;base64,{svg_base64}"
-                
-                timestamp = int(time.time())
-                project_slug = result.get("title", "layout").lower().replace(" ", "_")[:20]
-                
-                print(f"🔄 Syncing Preview to Cloudinary: project={project_slug}, user={request.state.user.user_key[:8]}...")
-                
-                upload_res = cloudinary.uploader.upload(
-                    data_uri,
-                    folder=f"dreamlayout_projects/u_{request.state.user.user_key}",
-                    public_id=f"{project_slug}_prev_{timestamp}",
-                    format="svg",
-                    resource_type="image"
-                )
-                
-                cloudinary_url = upload_res.get('secure_url')
-                print(f"✅ Cloudinary Preview Success: {cloudinary_url}")
-            except Exception as ce:
-                print(f"❌ Cloudinary Preview Failed: {str(ce)}")
+        svg_content, cloudinary_url = upload_layout_svg(
+            svg_content, layout.title, user.user_key, suffix="_prev"
+        )
 
         # Save to database
         project_id = add_user_project(
-            user_id=request.state.user.id,
-            title=result.get("title", "New Proposal"),
-            description=result.get("description", ""),
+            user_id=user.id,
+            title=layout.title,
+            description=layout.description,
             thumbnail=cloudinary_url,
             svg_content=svg_content,
             rooms=rooms_data,
-            design_philosophy=result.get("conversational_response", "")
+            design_philosophy=layout.conversational_response
         )
-        
-        return {
-            "success": True,
-            "project_id": project_id,
-            "layout": result,
-            "cloudinary_url": cloudinary_url
-        }
     except Exception as e:
-        return {"success": False, "error": str(e)}
+        raise APIError(500, str(e))
+    return APIResponse(GenerateLayoutResponse(project_id=project_id, layout=layout, cloudinary_url=cloudinary_url))
 
 def get_current_user_req(request: Request):
     if not request.state.user:
@@ -119,52 +144,56 @@ async def settings_page(request: Request):
     return render_template(request, "settings.html")
 
 def allowed_file(filename):
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in {'png', 'jpg', 'jpeg', 'gif'}
+    return '.' in filename and filename.rsplit('.', 1)[1].lower() in Config.ALLOWED_EXTENSIONS
 
 @main_router.post("/settings")
-async def settings(
-    request: Request,
-    name: str = Form(...),
-    about: str = Form(None),
-    location: str = Form(None),
-    profile_pic: UploadFile = File(None)
-):
+async def settings(request: Request):
     if not request.state.user:
         return RedirectResponse(url="/login")
-        
-    current_user = request.state.user
-    profile_pic_filename = current_user.profile_pic
-    
-    if profile_pic and profile_pic.filename:
-        if allowed_file(profile_pic.filename):
+
+    try:
+        # Parsed here rather than through Form()/File() parameters so the body size is capped while it streams
+        form = await read_limited_form(request, int(Config.AVATAR_MAX_UPLOAD_MB * 1024 * 1024))
+    except AvatarError as e:
+        flash(request, str(e), 'error')
+        return RedirectResponse(url="/settings", status_code=status.HTTP_303_SEE_OTHER)
+
+    try:
+        current_user = request.state.user
+        name = form.get("name")
+        about = form.get("about")
+        location = form.get("location")
+        profile_pic = form.get("profile_pic")
+        profile_pic_filename = current_user.profile_pic
+
+        if isinstance(profile_pic, StarletteUploadFile) and profile_pic.filename:
+            if not allowed_file(profile_pic.filename):
+                flash(request, 'Invalid file format. Please upload PNG, JPG, GIF or WebP.', 'error')
+                return RedirectResponse(url="/settings", status_code=status.HTTP_303_SEE_OTHER)
             try:
-                # Read file content
-                content = await profile_pic.read()
-                # Move image to a user-specific folder using their SPECIAL KEY
-                user_folder = f"dreamlayout_profiles/u_{current_user.user_key}"
-                upload_result = cloudinary.uploader.upload(
-                    content,
-                    folder=user_folder,
-                    public_id="avatar",
-                    overwrite=True,
-                    invalidate=True
-                )
-                profile_pic_filename = upload_result['secure_url']
+                # Resized to small WebP files in a worker pool; the user only points at them once all are uploaded
+                profile_pic_filename = await store_avatar(profile_pic, current_user.user_key)
+            except AvatarError as e:
+                flash(request, str(e), 'error')
+                return RedirectResponse(url="/settings", status_code=status.HTTP_303_SEE_OTHER)
             except Exception as e:
                 flash(request, f'Error uploading to Cloudinary: {str(e)}', 'error')
-        else:
-            flash(request, 'Invalid file format. Please upload PNG, JPG, or GIF.', 'error')
-            return RedirectResponse(url="/settings", status_code=status.HTTP_303_SEE_OTHER)
 
-    if not name:
-        flash(request, 'Name is required.', 'error')
-    else:
-        if update_user(current_user.user_key, name, current_user.email, about, profile_pic_filename, location):
-            flash(request, 'Settings updated successfully!', 'success')
+        if not name:
+            flash(request, 'Name is required.', 'error')
         else:
-            flash(request, 'Failed to update settings.', 'error')
-            
-    return RedirectResponse(url="/settings", status_code=status.HTTP_303_SEE_OTHER)
+            if update_user(current_user.user_key, name, current_user.email, about, profile_pic_filename, location):
+                if current_user.profile_pic and profile_pic_filename != current_user.profile_pic:
+                    replaced = set(avatar_public_ids(current_user.profile_pic)) - set(avatar_public_ids(profile_pic_filename))
+                    if replaced:
+                        enqueue_cleanup_job("assets", {"public_ids": sorted(replaced)})
+                flash(request, 'Settings updated successfully!', 'success')
+            else:
+                flash(request, 'Failed to update settings.', 'error')
+
+        return RedirectResponse(url="/settings", status_code=status.HTTP_303_SEE_OTHER)
+    finally:
+        await form.close()
 
 @main_router.post("/delete_account")
 async def delete_account(request: Request):
@@ -173,14 +202,7 @@ async def delete_account(request: Request):
     
     user_key = request.state.user.user_key
     try:
-        # Delete user files from Cloudinary
-        try:
-            cloudinary.api.delete_resources_by_prefix(f"dreamlayout_profiles/u_{user_key}/")
-            cloudinary.api.delete_folder(f"dreamlayout_profiles/u_{user_key}")
-        except Exception as cloud_err:
-            print(f"Cloudinary cleanup notice: {cloud_err}")
-
-        # Delete from SQLite DB
+        # Removes the account now; projects, the FAISS vector and Cloudinary files follow in the background
         delete_user_db(user_key)
         
         # Clear session
@@ -195,8 +217,18 @@ async def delete_account(request: Request):
 # Add dummy routes for other links in templates to avoid 404
 @main_router.get("/templates")
 async def templates_page(request: Request):
-    public_projects = get_public_projects()
-    return render_template(request, "templates.html", {"public_projects": public_projects})
+    gallery = public_gallery.snapshot()
+    context = {"public_projects": gallery.projects}
+    if request.state.user is None and not request.state.session.get("_flashes"):
+        # Every anonymous visitor gets the same page: rendered once per gallery version
+        return cached_response(request, gallery, "anonymous_page",
+                               lambda: render_template(request, "templates.html", context).body, "text/html")
+    return render_template(request, "templates.html", context)
+
+@main_router.get("/api/gallery")
+async def gallery_api(request: Request):
+    gallery = public_gallery.snapshot()
+    return cached_response(request, gallery, "json", gallery.to_json, "application/json")
 
 @main_router.get("/profile", response_class=HTMLResponse)
 async def profile_page(request: Request):
@@ -243,29 +275,28 @@ async def my_projects(request: Request):
     projects = get_user_projects(request.state.user.id, limit=100)
     return render_template(request, "my_projects.html", {"projects": projects})
 
-@main_router.post("/api/projects/bulk-action")
-async def bulk_action(request: Request):
-    if not request.state.user:
-        return {"success": False, "error": "Unauthorized"}
-    
+@main_router.post("/api/projects/bulk-action", response_model=BulkActionResponse, responses=API_ERRORS)
+async def bulk_action(body: BulkActionRequest, user=Depends(api_user)):
     try:
-        data = await request.json()
-        project_ids = data.get("project_ids", [])
-        action = data.get("action") # 'favourite' or 'public'
-        value = data.get("value", 1) # 1 for public/favourite, 0 for private/unfavourite
-        
-        if not project_ids or action not in ['favourite', 'public']:
-            return {"success": False, "error": "Invalid data"}
-            
-        field = "is_favourite" if action == "favourite" else "is_public"
-        success = update_project_status(project_ids, field, value, request.state.user.id)
-        
-        if not success:
-            return {"success": False, "error": "Access denied. You can only manage your own projects."}
-            
-        return {"success": True}
+        if body.action in BULK_PROJECT_ACTIONS:
+            # One transaction for the whole list; per-ID outcome: ok, unchanged or not_found
+            results = bulk_project_action(body.project_ids, body.action, user.id)
+            missing = sum(1 for outcome in results.values() if outcome == "not_found")
+            return APIResponse(BulkActionResponse(
+                success=not missing,
+                results=results,
+                changed=sum(1 for outcome in results.values() if outcome == "ok"),
+                error=f"{missing} of the selected projects were not found." if missing else None
+            ))
+
+        field = "is_favourite" if body.action == "favourite" else "is_public"
+        success = update_project_status(body.project_ids, field, body.value, user.id)
     except Exception as e:
-        return {"success": False, "error": str(e)}
+        raise APIError(500, str(e))
+
+    if not success:
+        raise APIError(403, "Access denied. You can only manage your own projects.")
+    return APIResponse(BulkActionResponse())
 
 @main_router.get("/project/{project_id}")
 async def view_project(request: Request, project_id: int):
@@ -277,12 +308,8 @@ async def view_project(request: Request, project_id: int):
         flash(request, "Project not found or access denied.", "error")
         return RedirectResponse(url="/dashboard")
     
-    # Parse rooms JSON
-    try:
-        project['rooms'] = json.loads(project['rooms'])
-    except:
-        project['rooms'] = []
-        
+    # Rooms JSON comes parsed (once per project version, in the project cache)
+    project['rooms'] = project['rooms_data']
     return render_template(request, "project_view.html", {"project": project})
 
 @main_router.get("/archive")
@@ -292,42 +319,23 @@ async def archive_view(request: Request):
     archived_projects = get_user_archived_projects(request.state.user.id)
     return render_template(request, "archive.html", {"projects": archived_projects})
 
-@main_router.post("/api/project/{project_id}/delete")
-async def api_soft_delete(request: Request, project_id: int):
-    if not request.state.user:
-        return {"error": "Unauthorized"}, 401
-    
-    project = get_project_by_id(project_id)
-    if not project or project['user_id'] != request.state.user.id:
-        return {"error": "Access denied"}, 403
-    
-    soft_delete_project(project_id)
-    return {"success": True}
+def single_project_action(project_id, action, user):
+    # Ownership is checked in the same statement that changes the project
+    if bulk_project_action([project_id], action, user.id)[project_id] == "not_found":
+        raise APIError(403, "Access denied")
+    return APIResponse(SuccessResponse())
 
-@main_router.post("/api/project/{project_id}/restore")
-async def api_restore(request: Request, project_id: int):
-    if not request.state.user:
-        return {"error": "Unauthorized"}, 401
-    
-    # Check project ownership (even if archived)
-    project = get_project_by_id(project_id)
-    if not project or project['user_id'] != request.state.user.id:
-        return {"error": "Access denied"}, 403
-    
-    restore_project(project_id)
-    return {"success": True}
+@main_router.post("/api/project/{project_id}/delete", response_model=SuccessResponse, responses=API_ERRORS)
+async def api_soft_delete(project_id: int, user=Depends(api_user)):
+    return single_project_action(project_id, "delete", user)
 
-@main_router.post("/api/project/{project_id}/permanent-delete")
-async def api_hard_delete(request: Request, project_id: int):
-    if not request.state.user:
-        return {"error": "Unauthorized"}, 401
-    
-    project = get_project_by_id(project_id)
-    if not project or project['user_id'] != request.state.user.id:
-        return {"error": "Access denied"}, 403
-    
-    hard_delete_project(project_id)
-    return {"success": True}
+@main_router.post("/api/project/{project_id}/restore", response_model=SuccessResponse, responses=API_ERRORS)
+async def api_restore(project_id: int, user=Depends(api_user)):
+    return single_project_action(project_id, "restore", user)
+
+@main_router.post("/api/project/{project_id}/permanent-delete", response_model=SuccessResponse, responses=API_ERRORS)
+async def api_hard_delete(project_id: int, user=Depends(api_user)):
+    return single_project_action(project_id, "permanent_delete", user)
 
 @main_router.get("/generate", response_class=HTMLResponse)
 async def generate_page(request: Request):
@@ -335,149 +343,165 @@ async def generate_page(request: Request):
         return RedirectResponse(url="/login")
     return render_template(request, "generate.html")
 
-@main_router.post("/api/generate-preview")
-async def api_generate_preview(request: Request):
-    if not request.state.user:
-        return {"error": "Unauthorized"}, 401
-    
-    data = await request.json()
-    venture_type = data.get("venture_type")
-    area = data.get("area")
-    dimensions = data.get("dimensions")
-    user_prompt = data.get("prompt")
-    
-    try:
-        # Generate layout using Gemini but DO NOT save to database yet
-        result = layout_generator.generate_layout(venture_type, area, dimensions, user_prompt)
-        return {
-            "success": True,
-            "layout": result
-        }
-    except Exception as e:
-        return {"success": False, "error": str(e)}
+@main_router.post("/api/generate-preview", response_model=LayoutResponse, responses=API_ERRORS)
+async def api_generate_preview(body: GenerateRequest, user=Depends(api_user)):
+    # Generate layout using Gemini but DO NOT save to database yet
+    _, layout = await generate_for(body, user.id)
+    return APIResponse(LayoutResponse(layout=layout))
 
-@main_router.post("/api/save-project")
-async def api_save_project(request: Request):
-    if not request.state.user:
-        return {"error": "Unauthorized"}, 401
-    
-    data = await request.json()
-    layout = data.get("layout")
-    if not layout:
-        return {"error": "No layout data provided"}, 400
+@main_router.post("/api/generate-variants", responses=API_ERRORS)
+async def api_generate_variants(body: GenerateVariantsRequest, user=Depends(api_user)):
+    """Generate several preview layouts at once, streamed back as NDJSON as each one finishes"""
+    count = max(1, min(body.count, Config.LAYOUT_VARIANTS_MAX))
+
+    async def stream_variants():
+        variants = layout_generator.generate_variants(
+            body.venture_type, body.area, body.dimensions, body.prompt, count, user_id=user.id
+        )
+        try:
+            async for index, result in variants:
+                if "error" in result:
+                    line = {"variant": index, "success": False, "error": result["error"]}
+                else:
+                    line = {"variant": index, "success": True, "layout": result}
+                yield dumps(line) + b"\n"
+        finally:
+            # Cancels any in-flight variants if the client went away
+            await variants.aclose()
+
+    return StreamingResponse(stream_variants(), media_type="application/x-ndjson")
+
+@main_router.get("/api/usage", response_model=UsageResponse, responses=API_ERRORS)
+async def api_usage(user=Depends(api_user)):
+    """The signed-in user's LLM usage today and their quota limits"""
+    return APIResponse(UsageResponse(**await run_in_threadpool(usage_ledger.user_usage, user.id)))
+
+@main_router.post("/api/save-project", response_model=SaveProjectResponse, responses=API_ERRORS)
+async def api_save_project(body: SaveProjectRequest, user=Depends(api_user)):
+    layout = body.layout
+    floors = get_layout_floors(layout.model_dump())
+    if not floors:
+        raise APIError(400, "No layout data provided")
         
     try:
-        # Handle multiple floors if present
-        floors = layout.get("floors", [])
-        if floors:
-            svg_content = floors[0].get("svg", "")
-            rooms_data = json.dumps(floors) # Store all floors in rooms column
-        else:
-            svg_content = layout.get("svg", "")
-            rooms_data = json.dumps(layout.get("rooms", []))
+        svg_content = floors[0].get("svg", "")
+        rooms_data = json.dumps(floors if layout.floors else layout.rooms or []) # Store all floors in rooms column
 
-        cloudinary_url = None
-        
-        # Upload to Cloudinary
-        # Upload to Cloudinary
-        if svg_content:
-            try:
-                # Robust SVG normalization: Ensure required XML namespaces are present
-                if 'xmlns=' not in svg_content.lower():
-                    svg_content = svg_content.replace('<svg', '<svg xmlns="http://www.w3.org/2000/svg"')
-                
-                # Add XML declaration if missing to ensure proper processing
-                if '<?xml' not in svg_content:
-                    svg_content = '<?xml version="1.0" encoding="UTF-8"?>' + svg_content
-
-                svg_base64 = base64.b64encode(svg_content.encode('utf-8')).decode('utf-8')
-                data_uri = f"data:image/svg+xml;base64,{svg_base64}"
-                
-                timestamp = int(time.time())
-                project_slug = layout.get("title", "layout").lower().replace(" ", "_")[:20]
-                
-                print(f"🔄 Syncing to Cloudinary: project={project_slug}, user={request.state.user.user_key[:8]}...")
-                
-                upload_res = cloudinary.uploader.upload(
-                    data_uri,
-                    folder=f"dreamlayout_projects/u_{request.state.user.user_key}",
-                    public_id=f"{project_slug}_{timestamp}",
-                    format="svg",
-                    resource_type="image"
-                )
-                
-                cloudinary_url = upload_res.get('secure_url')
-                print(f"✅ Cloudinary Sync Success: {cloudinary_url}")
-            except Exception as ce:
-                print(f"❌ Cloudinary Sync Failed: {str(ce)}")
-                # Continue saving the project even if upload fails
+        # Upload to Cloudinary (the project is saved even if the upload fails)
+        svg_content, cloudinary_url = upload_layout_svg(svg_content, layout.title, user.user_key)
 
         # Save to database
         project_id = add_user_project(
-            user_id=request.state.user.id,
-            title=layout.get("title", "New Proposal"),
-            description=layout.get("description", ""),
+            user_id=user.id,
+            title=layout.title,
+            description=layout.description,
             thumbnail=cloudinary_url,
             svg_content=svg_content,
             rooms=rooms_data,
-            design_philosophy=layout.get("conversational_response", ""),
-            design_code=layout.get("design_code")
+            design_philosophy=layout.conversational_response,
+            design_code=layout.design_code
         )
-        
-        return {
-            "success": True,
-            "project_id": project_id
-        }
     except Exception as e:
-        return {"success": False, "error": str(e)}
-
-@main_router.post("/api/chat-layout")
-async def api_chat_layout(request: Request):
-    if not request.state.user:
-        return {"error": "Unauthorized"}, 401
-    
-    data = await request.json()
-    message = data.get("message")
-    layout_data = data.get("layout") # The current layout object
-    
-    if not message or not layout_data:
-        return {"error": "Missing message or layout data"}, 400
+        raise APIError(500, str(e))
+    return APIResponse(SaveProjectResponse(project_id=project_id))
+
+def project_layout(project):
+    """Rebuild a layout dict (title, description, floors) from a stored project row"""
+    floors = project['rooms_data']
+    if floors and not floors[0].get("floor_name"):
+        # Legacy single-floor project: rooms column holds the room list
+        floors = [{"floor_name": "Ground Floor", "rooms": floors, "svg": project['svg_content']}]
+    return {"title": project['title'], "description": project['description'], "floors": floors}
+
+@main_router.post("/api/chat-layout", response_model=ChatResponse, responses=API_ERRORS)
+async def api_chat_layout(body: ChatRequest, user=Depends(api_user)):
+    """
+    Chat about a layout. Conversations are held server-side: saved projects are
+    keyed by project_id, unsaved previews send their layout once and then reuse
+    the returned session_id, so follow-up turns only carry the message.
+    With mode "edit" the reply is a ChatEditResponse instead.
+    """
+    if body.mode == "edit":
+        return await chat_edit_layout(body, user)
+
+    session_id = None
+    if body.project_id:
+        key = project_session_key(user.id, body.project_id)
+        session = chat_sessions.get(key)
+        if session is None:
+            project = get_project_by_id(body.project_id)
+            if not project or project['user_id'] != user.id:
+                raise APIError(403, "Access denied")
+            session = chat_sessions.create(key, project_layout(project))
+    else:
+        session_id = body.session_id
+        session = chat_sessions.get(preview_session_key(user.id, session_id)) if session_id else None
+        if session is None:
+            # The layout is only needed to start a new session
+            if body.layout is None:
+                if session_id:
+                    # Expired, evicted or held by another worker: the page resends its layout
+                    raise APIError(409, "session_expired")
+                raise APIError(400, "Missing message or layout data")
+            session_id = session_id or uuid.uuid4().hex
+            session = chat_sessions.create(preview_session_key(user.id, session_id), body.layout.model_dump())
         
     try:
-        # Create a context-aware prompt for the chat
-        rooms_summary = ""
-        if "floors" in layout_data:
-            for floor in layout_data["floors"]:
-                rooms_summary += f"\nFloor: {floor.get('floor_name')}\n"
-                for room in floor.get("rooms", []):
-                    rooms_summary += f"- {room.get('id')}. {room.get('name')} ({room.get('size')})\n"
-        
-        system_prompt = f"""
-        You are an expert architect assistant. You are discussing a specific layout you just generated.
-        
-        LAYOUT CONTEXT:
-        Venture: {layout_data.get('venture_type', 'Custom Project')}
-        Area: {layout_data.get('area', 'Optimal')}
-        Description: {layout_data.get('description', '')}
-        
-        ROOMS & COMPONENTS:{rooms_summary}
-        
-        The user has a question or comment about this specific design. 
-        Answer professionally, keeping the architectural context in mind. 
-        If they ask for changes, explain how they might be implemented or give professional advice.
-        Keep responses concise but helpful.
-        """
-        
         # Use Gemini to generate a response
-        from src.layout_generator import layout_generator
-        response = layout_generator.llm.invoke([
-            ("system", system_prompt),
-            ("human", message)
-        ])
-        
-        return {
-            "success": True,
-            "response": response.content
-        }
+        response = await layout_generator.achat(session.build_messages(body.message), user_id=user.id)
+    except Exception as e:
+        raise llm_error(e)
+    session.add_turn(body.message, response.content)
+    return APIResponse(ChatResponse(response=response.content, session_id=session_id))
+
+async def chat_edit_layout(body: ChatRequest, user):
+    """
+    Incremental edit mode for /api/chat-layout: the instruction is turned into a
+    patch for one floor, applied server-side and, for saved projects, persisted.
+    """
+    project = None
+    if body.project_id:
+        project = get_project_by_id(body.project_id)
+        if not project or project['user_id'] != user.id:
+            raise APIError(403, "Access denied")
+        layout_data = project_layout(project)
+    elif body.layout is not None:
+        layout_data = body.layout.model_dump()
+    else:
+        raise APIError(400, "Missing message or layout data")
+    if not 0 <= body.floor_index < len(get_layout_floors(layout_data)):
+        raise APIError(400, "Invalid floor index")
+
+    try:
+        patch = await layout_generator.aedit_layout(
+            layout_data, body.message, body.floor_index, user_id=user.id
+        )
+    except Exception as e:
+        raise llm_error(e)
+    if "error" in patch:
+        raise APIError(502, patch["error"])
+    floor = generated(Floor, patch["floor"])
+
+    try:
+        updated = apply_layout_patch(layout_data, patch)
+        if project:
+            floors = get_layout_floors(updated)
+            svg_content = project['svg_content']
+            thumbnail = None
+            if patch["floor_index"] == 0:
+                # Only the primary floor backs the stored SVG and thumbnail
+                svg_content, thumbnail = upload_layout_svg(
+                    floors[0].get("svg", ""), project['title'], user.user_key
+                )
+            update_project_layout(project['id'], svg_content, json.dumps(floors), thumbnail)
+            chat_sessions.refresh_layout(project_session_key(user.id, project['id']), updated)
+        elif body.session_id:
+            chat_sessions.refresh_layout(preview_session_key(user.id, body.session_id), updated)
     except Exception as e:
-        return {"success": False, "error": str(e)}
+        raise APIError(500, str(e))
+
+    return APIResponse(ChatEditResponse(
+        response=patch["reply"],
+        floor_index=patch["floor_index"],
+        floor=floor
+    ))
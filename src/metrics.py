@@ -0,0 +1,195 @@
+import time
+import bisect
+import asyncio
+import threading
+import functools
+from contextlib import contextmanager
+from src.config import Config
+from src.tracing import span
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values)) + (list(extra.items()) if extra else [])
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Counter:
+    """Monotonic counter, optionally split by labels"""
+    type = "counter"
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(name, "") for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        return [(self.name, _format_labels(self.labels, key), value) for key, value in items]
+
+class Histogram:
+    """Cumulative-bucket histogram (Prometheus semantics), optionally split by labels"""
+    type = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(name, "") for name in self.labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def samples(self):
+        with self._lock:
+            items = [(key, list(counts), total, count) for key, (counts, total, count) in self._series.items()]
+        samples = []
+        for key, counts, total, count in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labels, key, {"le": _format_value(bound)})
+                samples.append((f"{self.name}_bucket", labels, cumulative))
+            samples.append((f"{self.name}_sum", _format_labels(self.labels, key), total))
+            samples.append((f"{self.name}_count", _format_labels(self.labels, key), count))
+        return samples
+
+class CallbackMetric:
+    """
+    Value read from existing state at scrape time (queue depths, cache stats), so the
+    hot path pays nothing. `fn` returns a number or a {label_value: number} dict.
+    """
+    def __init__(self, name, help, fn, type="gauge", label=None):
+        self.name = name
+        self.help = help
+        self.fn = fn
+        self.type = type
+        self.label = label
+
+    def samples(self):
+        try:
+            value = self.fn()
+        except Exception:
+            return []
+        if isinstance(value, dict):
+            return [(self.name, _format_labels((self.label,), (key,)), v) for key, v in value.items()]
+        return [(self.name, "", value)]
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name, help, labels=()):
+        return self.register(Counter(name, help, labels))
+
+    def histogram(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, help, labels, buckets))
+
+    def callback(self, name, help, fn, type="gauge", label=None):
+        return self.register(CallbackMetric(name, help, fn, type, label))
+
+    def render(self):
+        """Prometheus text exposition format (version 0.0.4)"""
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{labels} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+registry = MetricsRegistry()
+
+http_requests = registry.counter(
+    "dreamlayout_http_requests_total", "HTTP requests by route and status", ("method", "route", "status")
+)
+http_latency = registry.histogram(
+    "dreamlayout_http_request_duration_seconds", "HTTP request latency by route", ("method", "route")
+)
+stage_latency = registry.histogram(
+    "dreamlayout_stage_duration_seconds", "Time spent in an instrumented stage (LLM call, parse, upload, query)", ("stage",)
+)
+stage_errors = registry.counter(
+    "dreamlayout_stage_errors_total", "Instrumented stages that raised", ("stage",)
+)
+llm_calls = registry.counter(
+    "dreamlayout_llm_calls_total", "LLM gateway calls by outcome", ("outcome",)
+)
+llm_tokens = registry.counter(
+    "dreamlayout_llm_tokens_total", "LLM tokens reported by the provider", ("direction",)
+)
+
+@contextmanager
+def stage_timer(stage):
+    """Time a block into dreamlayout_stage_duration_seconds{stage=...} (and a span, if the request is traced)"""
+    with span(stage):
+        if not Config.METRICS_ENABLED:
+            yield
+            return
+        started = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            stage_errors.inc(stage=stage)
+            raise
+        finally:
+            stage_latency.observe(time.perf_counter() - started, stage=stage)
+
+def timed_stage(prefix):
+    """Decorator: time every call of the function as stage "<prefix>.<function name>" (sync or async)"""
+    def decorator(fn):
+        stage = f"{prefix}.{fn.__name__}"
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with stage_timer(stage):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with stage_timer(stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def record_llm_usage(message):
+    """Add a response's usage_metadata (if the provider sent any) to the token counters"""
+    usage = getattr(message, "usage_metadata", None) or {}
+    if usage.get("input_tokens"):
+        llm_tokens.inc(usage["input_tokens"], direction="input")
+    if usage.get("output_tokens"):
+        llm_tokens.inc(usage["output_tokens"], direction="output")
+    cache_read = (usage.get("input_token_details") or {}).get("cache_read")
+    if cache_read:
+        # Part of the input tokens: the prompt prefix the provider served from its cache
+        llm_tokens.inc(cache_read, direction="cache_read")
@@ -0,0 +1,95 @@
+import os
+import re
+import sys
+import time
+import threading
+from collections import Counter
+from src.config import Config
+
+class StackSampler:
+    """
+    Samples one thread's Python stack every `interval` seconds from a background
+    thread and counts identical stacks ("folded" format, readable by flamegraph.pl
+    and speedscope). Async handlers share the event loop thread, so a profile of
+    one request also shows whatever else the loop ran meanwhile.
+    """
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self.started = time.perf_counter()
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.duration = time.perf_counter() - self.started
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            self.stacks[";".join(reversed(names))] += 1
+            self.samples += 1
+
+    def folded(self):
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common()) + "\n"
+
+    def top_frames(self, limit=5):
+        """Leaf frames that were on-CPU most often"""
+        leaves = Counter()
+        for stack, count in self.stacks.items():
+            leaves[stack.rsplit(";", 1)[-1]] += count
+        return leaves.most_common(limit)
+
+class ProfileTrigger:
+    """Decides which requests get profiled: an X-Profile header with the admin token, or armed by /admin/profile"""
+    def __init__(self):
+        self.remaining = 0
+        self.path_prefix = ""
+        self._lock = threading.Lock()
+
+    def arm(self, count, path_prefix=""):
+        with self._lock:
+            self.remaining = count
+            self.path_prefix = path_prefix
+
+    def should_profile(self, request):
+        if not Config.ADMIN_TOKEN:
+            return False
+        if request.headers.get("x-profile") == Config.ADMIN_TOKEN:
+            return True
+        with self._lock:
+            if self.remaining > 0 and request.url.path.startswith(self.path_prefix):
+                self.remaining -= 1
+                return True
+        return False
+
+profile_trigger = ProfileTrigger()
+
+def start_profile():
+    return StackSampler(threading.get_ident(), Config.PROFILE_INTERVAL_MS / 1000).start()
+
+def save_profile(sampler, label):
+    """Write the folded stacks under PROFILE_DIR; returns the file path"""
+    os.makedirs(Config.PROFILE_DIR, exist_ok=True)
+    slug = re.sub(r"[^A-Za-z0-9]+", "_", label).strip("_")[:60] or "root"
+    path = os.path.join(Config.PROFILE_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}_{slug}_{os.getpid()}.folded")
+    with open(path, "w") as f:
+        f.write(sampler.folded())
+    hot = ", ".join(f"{frame} x{count}" for frame, count in sampler.top_frames(3))
+    print(f"🔬 Profiled {label}: {sampler.samples} samples over {sampler.duration * 1000:.0f} ms -> {path} (hot: {hot})")
+    return path
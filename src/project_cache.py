@@ -0,0 +1,139 @@
+import os
+import threading
+from collections import OrderedDict
+from src.config import Config
+
+# The change log is started afresh past this size; every worker then drops its whole cache once
+CHANGE_LOG_MAX_BYTES = 1024 * 1024
+
+def project_size(project):
+    """Rough in-memory size of a cached project: its strings plus the parsed rooms JSON (~2x the text)"""
+    size = sum(len(value) for value in project.values() if isinstance(value, str))
+    return size + 2 * len(project.get("rooms") or "")
+
+class ProjectCache:
+    """
+    Per-worker LRU of project rows with their rooms JSON already parsed, bounded by total size
+    in bytes. Writes in this process evict entries directly; writes in other workers reach it
+    through an append-only log of changed project IDs (<DB_PATH>.project-changes) that every
+    lookup checks with one stat(). Cached rows are shared: callers get a shallow copy and must
+    treat the parsed rooms as read-only.
+    """
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._log_inode = None
+        self._log_offset = 0
+
+    @staticmethod
+    def log_path():
+        return Config.DB_PATH + ".project-changes"
+
+    def get(self, project_id):
+        if self.max_bytes <= 0:
+            return None
+        self._apply_remote_changes()
+        with self._lock:
+            entry = self._entries.get(project_id)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(project_id)
+            self.hits += 1
+            return dict(entry[0])
+
+    def put(self, project_id, project):
+        size = project_size(project)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            self._evict(project_id)
+            self._entries[project_id] = (project, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, (_, old_size) = self._entries.popitem(last=False)
+                self.bytes -= old_size
+
+    def _evict(self, project_id):
+        entry = self._entries.pop(project_id, None)
+        if entry is not None:
+            self.bytes -= entry[1]
+
+    def invalidate(self, project_ids):
+        """Drop these projects here and tell the other workers (called after the write committed)"""
+        ids = []
+        for project_id in project_ids:
+            try:
+                ids.append(int(project_id))
+            except (TypeError, ValueError):
+                continue
+        if not ids:
+            return
+        with self._lock:
+            for project_id in ids:
+                self._evict(project_id)
+        self._append_change((",".join(map(str, ids)) + "\n").encode())
+
+    def _append_change(self, line):
+        path = self.log_path()
+        fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, line)
+            written = os.fstat(fd)
+        finally:
+            os.close(fd)
+        try:
+            current = os.stat(path)
+        except FileNotFoundError:
+            return
+        if current.st_ino != written.st_ino:
+            # Another worker started a new log while we wrote to the old one
+            self._append_change(line)
+        elif current.st_size > CHANGE_LOG_MAX_BYTES:
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            open(tmp_path, "wb").close()
+            os.replace(tmp_path, path)
+
+    def _apply_remote_changes(self):
+        path = self.log_path()
+        try:
+            stat = os.stat(path)
+            inode, size = stat.st_ino, stat.st_size
+        except FileNotFoundError:
+            inode, size = None, 0
+        if inode == self._log_inode and size == self._log_offset:
+            return
+        with self._lock:
+            if inode != self._log_inode or size < self._log_offset:
+                # New log (first look, or rotated): we cannot tell what changed before it
+                self._entries.clear()
+                self.bytes = 0
+                self._log_inode, self._log_offset = inode, size
+                return
+            try:
+                with open(path, "rb") as f:
+                    f.seek(self._log_offset)
+                    data = f.read(size - self._log_offset)
+            except FileNotFoundError:
+                return
+            # Whole lines only; a write still in flight is picked up on the next lookup
+            end = data.rfind(b"\n") + 1
+            for line in data[:end].split():
+                for project_id in line.split(b","):
+                    self._evict(int(project_id))
+            self._log_offset += end
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self.bytes, "hits": self.hits, "misses": self.misses}
+
+project_cache = ProjectCache(int(Config.PROJECT_CACHE_MB * 1024 * 1024))
@@ -1,14 +1,22 @@
-from fastapi import APIRouter, Request, Form, Depends, HTTPException, status
+from fastapi import APIRouter, BackgroundTasks, Request, Form, Depends, HTTPException, status
 from fastapi.responses import HTMLResponse, RedirectResponse
 from werkzeug.security import generate_password_hash, check_password_hash
 import sqlite3
 
-from src.database import get_user_by_email, create_user, add_user_to_faiss
+from src.database import get_user_by_email, create_user, aadd_user_to_faiss, enqueue_cleanup_job
 from src.models import User
 from src.fastapi_utils import flash, render_template
 
 auth_router = APIRouter(tags=["Authentication"])
 
+async def index_new_user(user_id, email, name):
+    """Add a new account to the FAISS index after the signup response; a failure is retried from the job queue"""
+    try:
+        await aadd_user_to_faiss(user_id, email, name)
+    except Exception as e:
+        print(f"⚠️  Indexing user {user_id} failed, queued a retry: {e}")
+        enqueue_cleanup_job("index_user", {"user_id": user_id})
+
 @auth_router.get("/login", response_class=HTMLResponse)
 async def login_page(request: Request):
     return render_template(request, "login.html")
@@ -34,6 +42,7 @@ async def signup_page(request: Request):
 @auth_router.post("/signup")
 async def signup(
     request: Request, 
+    background_tasks: BackgroundTasks,
     name: str = Form(...), 
     email: str = Form(...), 
     password: str = Form(...), 
@@ -53,7 +62,8 @@ async def signup(
     
     try:
         user_id = create_user(name, email, password_hash)
-        add_user_to_faiss(user_id, email, name)
+        # The embedding model may still be loading; the account must not wait for (or fail with) it
+        background_tasks.add_task(index_new_user, user_id, email, name)
         flash(request, 'Account created successfully! Please login.', 'success')
         return RedirectResponse(url="/login", status_code=status.HTTP_303_SEE_OTHER)
     except sqlite3.IntegrityError:
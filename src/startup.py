@@ -0,0 +1,141 @@
+import sys
+import time
+import threading
+from collections import OrderedDict
+from importlib.abc import MetaPathFinder
+
+PROCESS_STARTED = time.perf_counter()
+
+class _TimedLoader:
+    """Wraps a module loader so exec_module is timed; everything else is passed through"""
+    def __init__(self, loader, profiler):
+        self._loader = loader
+        self._profiler = profiler
+
+    def __getattr__(self, name):
+        return getattr(self._loader, name)
+
+    def create_module(self, spec):
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module):
+        self._profiler._enter()
+        started = time.perf_counter()
+        try:
+            self._loader.exec_module(module)
+        finally:
+            self._profiler._exit(module.__name__, time.perf_counter() - started)
+
+class ImportProfiler(MetaPathFinder):
+    """
+    Records how long each module takes to import, in the spirit of `python -X importtime`,
+    but from inside the running app. Self time (excluding nested imports) is summed per
+    top-level package so the report shows which dependencies the startup is paying for.
+    """
+    def __init__(self):
+        self.self_times = {}
+        self.module_count = 0
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def install(self):
+        if self not in sys.meta_path:
+            sys.meta_path.insert(0, self)
+
+    def find_spec(self, fullname, path, target=None):
+        if getattr(self._local, "finding", False):
+            return None
+        self._local.finding = True
+        try:
+            for finder in sys.meta_path:
+                if finder is self or not hasattr(finder, "find_spec"):
+                    continue
+                spec = finder.find_spec(fullname, path, target)
+                if spec is not None:
+                    if spec.loader is not None and hasattr(spec.loader, "exec_module"):
+                        spec.loader = _TimedLoader(spec.loader, self)
+                    return spec
+            return None
+        finally:
+            self._local.finding = False
+
+    def _enter(self):
+        stack = self._local.__dict__.setdefault("stack", [])
+        stack.append(0.0)
+
+    def _exit(self, name, elapsed):
+        stack = self._local.stack
+        children = stack.pop()
+        if stack:
+            stack[-1] += elapsed
+        package = name.split(".")[0]
+        with self._lock:
+            self.self_times[package] = self.self_times.get(package, 0.0) + elapsed - children
+            self.module_count += 1
+
+    def top(self, limit=15):
+        with self._lock:
+            ordered = sorted(self.self_times.items(), key=lambda item: item[1], reverse=True)
+        return ordered[:limit]
+
+class StartupState:
+    """Startup phase timings and the readiness of each background-initialized component"""
+    def __init__(self, required=()):
+        self.required = set(required)
+        self.phases = OrderedDict()
+        self.components = OrderedDict()
+        self.profiler = None
+        self._lock = threading.Lock()
+
+    def enable_profiling(self):
+        self.profiler = ImportProfiler()
+        self.profiler.install()
+
+    def record(self, name, seconds):
+        with self._lock:
+            self.phases[name] = seconds
+
+    def expect(self, *names):
+        with self._lock:
+            for name in names:
+                self.components.setdefault(name, {"status": "pending"})
+
+    def run(self, name, fn):
+        """Run one initialization step, recording its duration and whether it succeeded"""
+        with self._lock:
+            self.components[name] = {"status": "warming"}
+        started = time.perf_counter()
+        try:
+            fn()
+        except Exception as e:
+            print(f"⚠️  Startup: {name} failed to initialize: {e}")
+            status = {"status": "failed", "error": str(e)}
+        else:
+            status = {"status": "ready"}
+        elapsed = time.perf_counter() - started
+        self.record(name, elapsed)
+        with self._lock:
+            self.components[name] = {**status, "seconds": round(elapsed, 3)}
+
+    def readiness(self):
+        """(ready, components): ready once nothing is still warming and no required component failed"""
+        with self._lock:
+            components = {name: dict(info) for name, info in self.components.items()}
+        warming = any(info["status"] in ("pending", "warming") for info in components.values())
+        failed = any(components.get(name, {}).get("status") == "failed" for name in self.required)
+        return not warming and not failed, components
+
+    def report(self):
+        uptime = time.perf_counter() - PROCESS_STARTED
+        lines = [f"⏱️  Startup profile ({uptime:.2f}s since process start)"]
+        with self._lock:
+            phases = list(self.phases.items())
+        for name, seconds in phases:
+            lines.append(f"   {name:<28} {seconds * 1000:8.1f} ms")
+        if self.profiler:
+            lines.append(f"   Import self time by package ({self.profiler.module_count} modules):")
+            for package, seconds in self.profiler.top():
+                lines.append(f"     {package:<26} {seconds * 1000:8.1f} ms")
+        return "\n".join(lines)
+
+startup = StartupState(required=("database", "faiss"))
@@ -0,0 +1,106 @@
+import os
+import gzip
+import hashlib
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse
+from starlette.staticfiles import StaticFiles
+from src.config import Config
+from src.compression import accepted_encoding, brotli
+
+# Text formats worth precompressing; PNG/JPEG are already compressed and only get long-lived caching
+COMPRESSIBLE_EXTENSIONS = {".css", ".js", ".mjs", ".svg", ".html", ".json", ".txt", ".xml", ".map"}
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+class AssetManifest:
+    """Content hashes of the files under static/, for fingerprinted URLs (logo.png -> logo.<hash>.png)"""
+    def __init__(self, directory):
+        self.directory = directory
+        self.hashes = {}
+        self.originals = {}
+
+    def build(self):
+        for root, dirs, files in os.walk(self.directory):
+            # Uploaded avatars change in place and carry their own ?v= parameter
+            dirs[:] = [d for d in dirs if d != "uploads" and not d.startswith(".")]
+            for name in files:
+                path = os.path.join(root, name)
+                rel_path = os.path.relpath(path, self.directory).replace(os.sep, "/")
+                with open(path, "rb") as f:
+                    digest = hashlib.sha256(f.read()).hexdigest()[:10]
+                self.hashes[rel_path] = digest
+                self.originals[self.fingerprint(rel_path, digest)] = rel_path
+        return self
+
+    @staticmethod
+    def fingerprint(rel_path, digest):
+        base, ext = os.path.splitext(rel_path)
+        return f"{base}.{digest}{ext}"
+
+    def url(self, rel_path):
+        """URL for a file under static/; fingerprinted when the file was there at startup"""
+        digest = self.hashes.get(rel_path)
+        if digest is None:
+            return f"/static/{rel_path}"
+        return f"/static/{self.fingerprint(rel_path, digest)}"
+
+def precompress(manifest, output_dir):
+    """Write .gz (and .br, if brotli is installed) next to each text asset's fingerprinted name in output_dir"""
+    written = 0
+    for rel_path, digest in manifest.hashes.items():
+        if os.path.splitext(rel_path)[1].lower() not in COMPRESSIBLE_EXTENSIONS:
+            continue
+        with open(os.path.join(manifest.directory, rel_path), "rb") as f:
+            data = f.read()
+        target = os.path.join(output_dir, manifest.fingerprint(rel_path, digest))
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        variants = [(".gz", lambda: gzip.compress(data, 9, mtime=0))]
+        if brotli is not None:
+            variants.append((".br", lambda: brotli.compress(data, quality=11)))
+        for suffix, compress in variants:
+            # Names carry the content hash, so an existing file is never stale
+            if not os.path.exists(target + suffix):
+                tmp_path = f"{target}{suffix}.{os.getpid()}.tmp"
+                with open(tmp_path, "wb") as f:
+                    f.write(compress())
+                os.replace(tmp_path, target + suffix)
+                written += 1
+    return written
+
+class FingerprintedStaticFiles(StaticFiles):
+    """
+    StaticFiles that also serves fingerprinted names with immutable caching, and their
+    precompressed .br/.gz variants when the client accepts them. Plain names still work
+    and are revalidated (ETag/Last-Modified) on every use.
+    """
+    def __init__(self, *, directory, manifest, compressed_dir=None, **kwargs):
+        super().__init__(directory=directory, **kwargs)
+        self.manifest = manifest
+        self.compressed_dir = compressed_dir
+
+    async def get_response(self, path, scope):
+        fingerprinted = path.replace(os.sep, "/")
+        original = self.manifest.originals.get(fingerprinted)
+        response = await super().get_response(original.replace("/", os.sep) if original else path, scope)
+        if original is None:
+            response.headers.setdefault("Cache-Control", "no-cache")
+            return response
+        if response.status_code != 200 or not isinstance(response, FileResponse):
+            return response
+
+        if self.compressed_dir:
+            encoding = accepted_encoding(Headers(scope=scope).get("accept-encoding", ""))
+            variant = os.path.join(self.compressed_dir, fingerprinted + {"br": ".br", "gzip": ".gz"}.get(encoding, ""))
+            if encoding and os.path.isfile(variant):
+                response = FileResponse(variant, media_type=response.media_type, headers={
+                    "Content-Encoding": encoding, "Vary": "Accept-Encoding"
+                })
+        response.headers["Cache-Control"] = IMMUTABLE
+        return response
+
+manifest = AssetManifest(Config.STATIC_DIR)
+
+def precompress_static():
+    """Precompress static/ text assets into STATIC_CACHE_DIR (startup, or scripts/build_static.py at deploy time)"""
+    if not manifest.hashes:
+        manifest.build()
+    return precompress(manifest, Config.STATIC_CACHE_DIR)
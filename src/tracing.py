@@ -0,0 +1,242 @@
+import os
+import json
+import time
+import queue
+import random
+import sqlite3
+import threading
+import contextvars
+from contextlib import contextmanager
+from src.config import Config
+
+_trace = contextvars.ContextVar("dreamlayout_trace", default=None)
+_parent_span = contextvars.ContextVar("dreamlayout_parent_span", default=None)
+
+class Trace:
+    """Spans recorded for one request; span times are seconds relative to the trace start"""
+    def __init__(self, name):
+        self.trace_id = os.urandom(16).hex()
+        self.root_id = os.urandom(8).hex()
+        self.name = name
+        self.attrs = {}
+        self.spans = []
+        self.perf_start = time.perf_counter()
+        self.wall_start_ns = time.time_ns()
+        self.duration = None
+
+    def add(self, name, started, duration, attrs, parent_id=None):
+        self.spans.append({
+            "span_id": os.urandom(8).hex(),
+            "parent_id": parent_id or self.root_id,
+            "name": name,
+            "start": started - self.perf_start,
+            "duration": duration,
+            "attrs": attrs
+        })
+
+    def to_dict(self):
+        return {
+            "trace_id": self.trace_id,
+            "name": self.name,
+            "timestamp": self.wall_start_ns / 1e9,
+            "duration_ms": round(self.duration * 1000, 3),
+            "attrs": self.attrs,
+            "spans": [
+                {
+                    "span_id": s["span_id"], "parent_id": s["parent_id"], "name": s["name"],
+                    "start_ms": round(s["start"] * 1000, 3), "duration_ms": round(s["duration"] * 1000, 3),
+                    "attrs": s["attrs"]
+                }
+                for s in self.spans
+            ]
+        }
+
+def current_trace():
+    return _trace.get()
+
+def should_sample(request):
+    if not Config.TRACING_ENABLED:
+        return False
+    return request.headers.get("x-trace") == "1" or random.random() < Config.TRACE_SAMPLE_RATE
+
+def start_trace(name):
+    """Make a new trace current for this request; returns (trace, tokens) for finish_trace"""
+    trace = Trace(name)
+    return trace, (_trace.set(trace), _parent_span.set(trace.root_id))
+
+def finish_trace(trace, tokens):
+    trace.duration = time.perf_counter() - trace.perf_start
+    _trace.reset(tokens[0])
+    _parent_span.reset(tokens[1])
+    exporter.submit(trace)
+
+@contextmanager
+def span(name, **attrs):
+    """Record a span in the current request's trace (a no-op when the request is not traced)"""
+    trace = _trace.get()
+    if trace is None:
+        yield
+        return
+    parent = _parent_span.get()
+    span_id = os.urandom(8).hex()
+    token = _parent_span.set(span_id)
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        attrs["error"] = type(e).__name__
+        raise
+    finally:
+        _parent_span.reset(token)
+        trace.spans.append({
+            "span_id": span_id, "parent_id": parent, "name": name,
+            "start": started - trace.perf_start, "duration": time.perf_counter() - started, "attrs": attrs
+        })
+
+def _compact_sql(sql):
+    return " ".join(sql.split())
+
+def record_query(sql, started, duration, rows):
+    """Slow-query log plus a span for the current trace, for one finished SQLite statement"""
+    if Config.SQLITE_SLOW_QUERY_MS and duration * 1000 >= Config.SQLITE_SLOW_QUERY_MS:
+        print(f"🐢 Slow query ({duration * 1000:.1f} ms, {rows} rows): {_compact_sql(sql)[:500]}")
+    trace = _trace.get()
+    if trace is not None:
+        trace.add("sqlite.query", started, duration,
+                  {"db.statement": _compact_sql(sql)[:1000], "db.rows": rows}, _parent_span.get())
+
+class TracedCursor(sqlite3.Cursor):
+    """Times each statement, including the fetches that finish it, and counts the rows"""
+    _query = None
+
+    def execute(self, sql, parameters=()):
+        self._finish()
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._query = [sql, started, time.perf_counter() - started, 0]
+
+    def executemany(self, sql, seq_of_parameters):
+        self._finish()
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self._query = [sql, started, time.perf_counter() - started, 0]
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = super().fetchone()
+        if self._query:
+            self._query[2] += time.perf_counter() - started
+            self._query[3] += row is not None
+        return row
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = super().fetchall()
+        if self._query:
+            self._query[2] += time.perf_counter() - started
+            self._query[3] += len(rows)
+            self._finish()
+        return rows
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def _finish(self):
+        query = self._query
+        if query is None:
+            return
+        self._query = None
+        sql, started, duration, rows = query
+        record_query(sql, started, duration, rows or max(self.rowcount, 0))
+
+class TracedConnection(sqlite3.Connection):
+    """sqlite3 connection factory whose cursors report to the slow-query log and the request trace"""
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._traced_cursors = []
+
+    def cursor(self, factory=TracedCursor):
+        cursor = super().cursor(factory)
+        self._traced_cursors.append(cursor)
+        return cursor
+
+    def execute(self, sql, parameters=()):
+        # sqlite3.Connection.execute would bypass TracedCursor.execute
+        cursor = self.cursor()
+        cursor.execute(sql, parameters)
+        return cursor
+
+    def close(self):
+        for cursor in self._traced_cursors:
+            if isinstance(cursor, TracedCursor):
+                cursor._finish()
+        self._traced_cursors = []
+        super().close()
+
+def _otlp_value(value):
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+def to_otlp(trace):
+    """OTLP/HTTP JSON payload (resourceSpans) for one trace"""
+    def otlp_span(span_id, parent_id, name, start, duration, attrs):
+        start_ns = trace.wall_start_ns + int(start * 1e9)
+        span = {
+            "traceId": trace.trace_id, "spanId": span_id, "name": name, "kind": 1,
+            "startTimeUnixNano": str(start_ns), "endTimeUnixNano": str(start_ns + int(duration * 1e9)),
+            "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in attrs.items()]
+        }
+        if parent_id:
+            span["parentSpanId"] = parent_id
+        return span
+
+    spans = [otlp_span(trace.root_id, None, trace.name, 0.0, trace.duration, trace.attrs)]
+    spans += [otlp_span(s["span_id"], s["parent_id"], s["name"], s["start"], s["duration"], s["attrs"]) for s in trace.spans]
+    return {"resourceSpans": [{
+        "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": "dreamlayout"}}]},
+        "scopeSpans": [{"scope": {"name": "src.tracing"}, "spans": spans}]
+    }]}
+
+class TraceExporter:
+    """Writes finished traces from a background thread so requests never wait on export"""
+    def __init__(self, max_pending=1000):
+        self.pending = queue.Queue(max_pending)
+        self.dropped = 0
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, trace):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, daemon=True)
+                    self._thread.start()
+        try:
+            self.pending.put_nowait(trace)
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self):
+        while True:
+            trace = self.pending.get()
+            try:
+                if Config.TRACE_EXPORT == "otlp":
+                    import httpx
+                    httpx.post(Config.TRACE_OTLP_ENDPOINT, json=to_otlp(trace), timeout=5)
+                else:
+                    with open(Config.TRACE_FILE, "a") as f:
+                        f.write(json.dumps(trace.to_dict(), default=str) + "\n")
+            except Exception as e:
+                print(f"⚠️  Trace export failed: {e}")
+
+exporter = TraceExporter()
@@ -0,0 +1,177 @@
+import time
+import threading
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from starlette.concurrency import run_in_threadpool
+from src.config import Config
+from src import database
+
+# Ledger key for calls made without a user (warm-up, scripts)
+SYSTEM_USER_ID = 0
+
+class QuotaExceededError(Exception):
+    """Raised before calling the LLM when a user is over their rate limit or daily token budget"""
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+def usage_day(now=None):
+    """The ledger's day: the UTC date, so budgets reset at the same moment on every worker"""
+    return (now or datetime.now(timezone.utc)).strftime("%Y-%m-%d")
+
+def seconds_until_next_day():
+    now = datetime.now(timezone.utc)
+    tomorrow = (now + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+    return (tomorrow - now).total_seconds()
+
+class UsageLedger:
+    """
+    Per-user LLM usage (calls, errors, tokens and wall time) by UTC day and call kind.
+    Calls are added up in memory and a daemon thread flushes them to the llm_usage table
+    every LLM_USAGE_FLUSH_SECONDS, so recording a call never waits on SQLite.
+
+    Quotas are checked before each call: a one-minute sliding window of calls (per worker),
+    and a daily token budget counted from the table (all workers, re-read once per flush
+    interval) plus what this worker has not flushed yet.
+    """
+    def __init__(self):
+        self.rejected = 0
+        self._lock = threading.Lock()
+        self._pending = {}  # (user_id, day, kind) -> [calls, errors, input_tokens, output_tokens, latency_ms]
+        self._unflushed_tokens = {}  # (user_id, day) -> tokens in _pending
+        self._stored_tokens = {}  # user_id -> (day, tokens in the table, monotonic time read)
+        self._recent_calls = {}  # user_id -> deque of monotonic call times in the last minute
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="usage-flush", daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(Config.LLM_USAGE_FLUSH_SECONDS)
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"⚠️  Usage ledger flush: {e}")
+
+    def check(self, user_id):
+        """Raise QuotaExceededError if `user_id` may not call the LLM now; otherwise count the call"""
+        if Config.LLM_USER_DAILY_TOKENS:
+            used = self.tokens_today(user_id)
+            if used >= Config.LLM_USER_DAILY_TOKENS:
+                self.rejected += 1
+                raise QuotaExceededError(
+                    "You have used today's AI budget. It resets at midnight UTC.", seconds_until_next_day()
+                )
+        if Config.LLM_USER_CALLS_PER_MINUTE:
+            now = time.monotonic()
+            with self._lock:
+                calls = self._recent_calls.setdefault(user_id, deque())
+                while calls and now - calls[0] >= 60:
+                    calls.popleft()
+                if len(calls) >= Config.LLM_USER_CALLS_PER_MINUTE:
+                    self.rejected += 1
+                    retry_after = 60 - (now - calls[0])
+                    raise QuotaExceededError(
+                        f"Too many AI requests. Please try again in {int(retry_after) + 1} seconds.", retry_after
+                    )
+                calls.append(now)
+
+    async def acheck(self, user_id):
+        """check() for the event loop: a stale stored total is re-read from SQLite on a worker thread"""
+        if Config.LLM_USER_DAILY_TOKENS and self._stale(user_id, usage_day()):
+            await run_in_threadpool(self.tokens_today, user_id)
+        self.check(user_id)
+
+    def _stale(self, user_id, day):
+        stored = self._stored_tokens.get(user_id)
+        return stored is None or stored[0] != day or time.monotonic() - stored[2] >= Config.LLM_USAGE_FLUSH_SECONDS
+
+    def tokens_today(self, user_id):
+        day = usage_day()
+        with self._lock:
+            stored = self._stored_tokens.get(user_id)
+            unflushed = self._unflushed_tokens.get((user_id, day), 0)
+        if self._stale(user_id, day):
+            # Other workers' usage reaches us through the table, at most one flush interval late
+            tokens = database.get_llm_tokens(user_id, day)
+            with self._lock:
+                self._stored_tokens[user_id] = (day, tokens, time.monotonic())
+                unflushed = self._unflushed_tokens.get((user_id, day), 0)
+            stored = (day, tokens)
+        return stored[1] + unflushed
+
+    def record(self, user_id, kind, message, latency):
+        """Add one finished call; `message` is the LLM response (None if the call failed)"""
+        usage = getattr(message, "usage_metadata", None) or {}
+        input_tokens = usage.get("input_tokens") or 0
+        output_tokens = usage.get("output_tokens") or 0
+        user_id = SYSTEM_USER_ID if user_id is None else user_id
+        day = usage_day()
+        with self._lock:
+            totals = self._pending.setdefault((user_id, day, kind), [0, 0, 0, 0, 0])
+            totals[0] += 1
+            totals[1] += message is None
+            totals[2] += input_tokens
+            totals[3] += output_tokens
+            totals[4] += int(latency * 1000)
+            self._unflushed_tokens[(user_id, day)] = (
+                self._unflushed_tokens.get((user_id, day), 0) + input_tokens + output_tokens
+            )
+
+    def flush(self):
+        """Write the pending totals to SQLite in one transaction; returns how many rows were written"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            flushed, self._unflushed_tokens = self._unflushed_tokens, {}
+            # Forget users whose last call left the rate window
+            now = time.monotonic()
+            for user_id in [u for u, calls in self._recent_calls.items() if not calls or now - calls[-1] >= 60]:
+                del self._recent_calls[user_id]
+        if not pending:
+            return 0
+        started = time.monotonic()
+        try:
+            database.add_llm_usage([key + tuple(totals) for key, totals in pending.items()])
+        except Exception:
+            # Put the batch back so it goes out with the next flush
+            with self._lock:
+                for key, totals in pending.items():
+                    current = self._pending.setdefault(key, [0, 0, 0, 0, 0])
+                    for i, value in enumerate(totals):
+                        current[i] += value
+                for key, tokens in flushed.items():
+                    self._unflushed_tokens[key] = self._unflushed_tokens.get(key, 0) + tokens
+            raise
+        with self._lock:
+            # Now in the table: count them as stored, unless the stored total was re-read after they landed
+            for (user_id, day), tokens in flushed.items():
+                stored = self._stored_tokens.get(user_id)
+                if stored is not None and stored[0] == day and stored[2] <= started:
+                    self._stored_tokens[user_id] = (day, stored[1] + tokens, stored[2])
+        return len(pending)
+
+    def user_usage(self, user_id):
+        """Today's usage and limits for one user (the /api/usage response)"""
+        with self._lock:
+            now = time.monotonic()
+            recent = sum(1 for t in self._recent_calls.get(user_id, ()) if now - t < 60)
+        return {
+            "day": usage_day(),
+            "tokens_used": self.tokens_today(user_id),
+            "daily_token_budget": Config.LLM_USER_DAILY_TOKENS or None,
+            "calls_last_minute": recent,
+            "calls_per_minute_limit": Config.LLM_USER_CALLS_PER_MINUTE or None,
+        }
+
+    def report(self, days=7, top_users=20):
+        """Usage over the last `days` UTC days for capacity planning (this worker's pending calls included)"""
+        self.flush()
+        since = usage_day(datetime.now(timezone.utc) - timedelta(days=days - 1))
+        return database.get_llm_usage_report(since, top_users)
+
+usage_ledger = UsageLedger()
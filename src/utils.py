@@ -1,15 +1,67 @@
+import os
 import random
 import string
-import requests
+from urllib.parse import urlparse
 from src.config import Config
 
+_cloudinary_configured = False
+
+class _StubUploader:
+    def upload(self, file, folder="", public_id=None, format=None, **kwargs):
+        public_id = public_id or "".join(random.choices(string.ascii_lowercase + string.digits, k=12))
+        path = f"{folder}/{public_id}" if folder else public_id
+        return {"public_id": path, "secure_url": f"https://res.cloudinary.invalid/stub/{path}.{format or 'png'}"}
+
+class _StubAdminApi:
+    def delete_resources(self, public_ids, **kwargs):
+        return {"deleted": {public_id: "deleted" for public_id in public_ids}}
+
+    def delete_resources_by_prefix(self, prefix, **kwargs):
+        return {"deleted": {}}
+
+    def delete_folder(self, folder, **kwargs):
+        return {"deleted": [folder]}
+
+class StubCloudinary:
+    """Offline stand-in for the parts of the Cloudinary SDK the app uses (benchmarks, local dev)"""
+    uploader = _StubUploader()
+    api = _StubAdminApi()
+
+def get_cloudinary():
+    """Import and configure the Cloudinary SDK on first use (keeps it off the startup path)"""
+    global _cloudinary_configured
+    if Config.CLOUDINARY_BACKEND == "stub":
+        return StubCloudinary
+    import cloudinary
+    import cloudinary.uploader
+    import cloudinary.api
+    if not _cloudinary_configured:
+        cloudinary.config(
+            cloud_name=Config.CLOUDINARY_CLOUD_NAME,
+            api_key=Config.CLOUDINARY_API_KEY,
+            api_secret=Config.CLOUDINARY_API_SECRET,
+            secure=True
+        )
+        _cloudinary_configured = True
+    return cloudinary
+
+def cloudinary_public_id(url):
+    """Public ID of one of our uploads from its delivery URL (.../dreamlayout_projects/u_<key>/<name>.svg)"""
+    if not url:
+        return None
+    path = urlparse(url).path
+    start = path.find("/dreamlayout_")
+    if start < 0:
+        return None
+    return os.path.splitext(path[start + 1:])[0]
+
 def generate_verification_code(length=6):
     """Generate a random alphanumeric verification code"""
     return ''.join(random.choices(string.ascii_uppercase + string.digits, k=length))
 
 def send_verification_email(recipient, code, step=1):
     """
-    Send verification email using Resend API
+    Queue a verification email (sent through Resend by src/email_outbox.py)
     step 1: Approval for old email
     step 2: Verification for new email
     """
@@ -20,17 +72,7 @@ def send_verification_email(recipient, code, step=1):
         subject = "Verify Your New Email - DreamLayout"
         message = f"Please enter this code to verify your new email address: {code}"
 
-    # Resend API call
-    url = "https://api.resend.com/emails"
-    headers = {
-        "Authorization": f"Bearer {Config.RESEND_API_KEY}",
-        "Content-Type": "application/json"
-    }
-    payload = {
-        "from": f"DreamLayout <{Config.MAIL_DEFAULT_SENDER}>",
-        "to": [recipient],
-        "subject": subject,
-        "html": f"""
+    html = f"""
             <div style="font-family: sans-serif; padding: 40px; background-color: #f9fafb; border-radius: 24px;">
                 <h1 style="color: #4f46e5; font-size: 24px; font-weight: 800; margin-bottom: 20px;">DreamLayout Security</h1>
                 <p style="color: #4b5563; font-size: 16px; font-weight: 600;">{message}</p>
@@ -40,23 +82,8 @@ def send_verification_email(recipient, code, step=1):
                 <p style="margin-top: 30px; color: #9ca3af; font-size: 12px;">If you did not request this change, please ignore this email.</p>
             </div>
         """
-    }
-
-    try:
-        # If no API key is set, we skip the real call and log to console for development
-        if not Config.RESEND_API_KEY or Config.RESEND_API_KEY == '':
-            print(f"--- DEV MODE: EMAIL API KEY MISSING ---")
-            print(f"To: {recipient}")
-            print(f"Subject: {subject}")
-            print(f"Code: {code}")
-            return True
-
-        response = requests.post(url, headers=headers, json=payload)
-        if response.status_code == 200 or response.status_code == 201:
-            return True
-        else:
-            print(f"Resend API Error: {response.text}")
-            return False
-    except Exception as e:
-        print(f"Error calling Email API: {e}")
-        return False
+
+    # Queued in the SQLite outbox and sent in the background; a Resend call never blocks the request
+    from src.email_outbox import email_outbox
+    email_outbox.enqueue(recipient, subject, html)
+    return True
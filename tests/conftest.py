@@ -0,0 +1,21 @@
+import os
+import sys
+
+# Offline defaults, set before src.config reads the environment
+os.environ.setdefault("LLM_BACKEND", "stub")
+os.environ.setdefault("CLOUDINARY_BACKEND", "stub")
+os.environ.setdefault("EMAIL_BACKEND", "capture")
+os.environ.setdefault("HF_HUB_OFFLINE", "1")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from src.config import Config
+from src import database
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """A fresh SQLite database for one test"""
+    monkeypatch.setattr(Config, "DB_PATH", str(tmp_path / "test.db"))
+    database.init_db()
+    return Config.DB_PATH
@@ -0,0 +1,60 @@
+import asyncio
+import sqlite3
+from src import database
+from src.email_outbox import EmailOutbox, CaptureBackend
+
+class TimeoutOnceBackend(CaptureBackend):
+    """Resend accepts the first request but the response is lost to a timeout"""
+    def __init__(self):
+        super().__init__()
+        self.keys = []
+
+    async def send(self, messages, idempotency_key):
+        self.keys.append(idempotency_key)
+        await super().send(messages, idempotency_key)
+        if len(self.keys) == 1:
+            raise TimeoutError("read timed out")
+
+def make_due(db_path):
+    conn = sqlite3.connect(db_path)
+    conn.execute("UPDATE email_outbox SET run_after = 0 WHERE status = 'queued'")
+    conn.commit()
+    conn.close()
+
+def queue(outbox, count, start=0):
+    return [outbox.enqueue(f"user{i}@example.com", f"Hello {i}", "<p>hi</p>") for i in range(start, start + count)]
+
+def test_batch_retry_reuses_grouping_and_key(db):
+    outbox = EmailOutbox()
+    outbox.backend = TimeoutOnceBackend()
+    first_ids = queue(outbox, 3)
+
+    assert asyncio.run(outbox.deliver_pending()) == 3
+    assert outbox.retried == 3
+
+    # More mail arrives before the retry; it must not be folded into the timed-out batch
+    queue(outbox, 2, start=3)
+    make_due(db)
+    assert asyncio.run(outbox.deliver_pending()) == 3
+
+    keys = outbox.backend.keys
+    assert keys[0] == keys[1] and keys[0].startswith("outbox-batch-")
+    assert [m["to"][0] for m in outbox.backend.messages] == [f"user{i}@example.com" for i in range(3)]
+    assert outbox.sent == 3
+
+    assert asyncio.run(outbox.deliver_pending()) == 2
+    assert keys[2] != keys[0]
+    assert len(outbox.backend.messages) == 5
+    assert database.get_outbox_stats()["queued"] == 0
+
+def test_single_email_retry_keeps_row_key(db):
+    outbox = EmailOutbox()
+    outbox.backend = TimeoutOnceBackend()
+    email_id, = queue(outbox, 1)
+
+    asyncio.run(outbox.deliver_pending())
+    make_due(db)
+    asyncio.run(outbox.deliver_pending())
+
+    assert outbox.backend.keys == [f"outbox-{email_id}", f"outbox-{email_id}"]
+    assert len(outbox.backend.messages) == 1
@@ -0,0 +1,21 @@
+import asyncio
+from src.layout_generator import LayoutGenerator, LAYOUT_SYSTEM_PROMPT
+
+def format_layout(generator, venture_type, area, dimensions, user_prompt):
+    return generator.layout_prompt.format_messages(**generator._build_inputs(venture_type, area, dimensions, user_prompt))
+
+def test_static_prefix_is_identical_across_requests():
+    generator = LayoutGenerator()
+    first = format_layout(generator, "Restaurant", "2400 sq ft", [{"x": 0.4, "y": 10.6}, {"x": 80, "y": 0}], "A bar")
+    second = format_layout(generator, "Office", "900 sq ft", None, "Two meeting rooms")
+
+    # Providers reuse a cached prefix only if it matches byte for byte
+    assert first[0].type == second[0].type == "system"
+    assert first[0].content == second[0].content == LAYOUT_SYSTEM_PROMPT
+    assert "Restaurant" not in first[0].content and "Restaurant" in first[1].content
+    assert "(0,11) (80,0)" in first[1].content
+
+def test_layout_call_sends_full_prompt():
+    generator = LayoutGenerator()
+    result = asyncio.run(generator.agenerate_layout("Retail Store", "1200 sq ft", None, "Open sales floor"))
+    assert result["floors"]
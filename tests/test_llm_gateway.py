@@ -0,0 +1,76 @@
+import asyncio
+import httpx
+import pytest
+from src.config import Config
+from src.llm_gateway import LLMGateway
+from scripts.fake_llm_server import create_fake_app
+
+@pytest.fixture(autouse=True)
+def fast_retries(monkeypatch):
+    monkeypatch.setattr(Config, "LLM_MAX_RETRIES", 2)
+    monkeypatch.setattr(Config, "LLM_RETRY_BASE_DELAY", 0.001)
+    monkeypatch.setattr(Config, "LLM_RETRY_MAX_DELAY", 0.01)
+    monkeypatch.setattr(Config, "LLM_HEDGE_ENABLED", False)
+    monkeypatch.setattr(Config, "LLM_BREAKER_THRESHOLD", 2)
+
+def run_calls(count, timeout=5, **fake):
+    """Send `count` gateway calls in turn to a fake server; returns (outcomes, provider requests, gateway)"""
+    app = create_fake_app(latency_ms=fake.pop("latency_ms", 0), **fake)
+    gateway = LLMGateway()
+
+    async def main():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://fake-llm") as client:
+            async def make_call():
+                res = await client.post("/v1/chat/completions", json={"messages": [{"role": "user", "content": "hi"}]})
+                res.raise_for_status()
+                return res.json()
+
+            outcomes = []
+            for _ in range(count):
+                try:
+                    await gateway.call(make_call, timeout=timeout)
+                    outcomes.append("ok")
+                except Exception as e:
+                    outcomes.append(type(e).__name__)
+            return outcomes
+
+    return asyncio.run(main()), app.state.calls, gateway
+
+def test_success_is_a_single_request():
+    outcomes, requests, gateway = run_calls(3)
+    assert outcomes == ["ok"] * 3
+    assert requests == 3
+    assert gateway.breaker.state == "closed"
+
+def test_overload_is_retried_then_raised():
+    outcomes, requests, gateway = run_calls(1, error_rate=1.0)
+    assert outcomes == ["HTTPStatusError"]
+    assert requests == Config.LLM_MAX_RETRIES + 1
+    assert gateway.breaker.failures == 1
+
+def test_breaker_opens_and_fails_fast():
+    outcomes, requests, gateway = run_calls(4, rate_limit_rate=1.0)
+    assert outcomes == ["HTTPStatusError"] * 2 + ["LLMUnavailableError"] * 2
+    # Once open, calls never reach the provider
+    assert requests == 2 * (Config.LLM_MAX_RETRIES + 1)
+    assert gateway.breaker.state == "open"
+
+def test_hung_provider_hits_the_deadline(monkeypatch):
+    monkeypatch.setattr(Config, "LLM_ATTEMPT_TIMEOUT_SECONDS", 0.05)
+    outcomes, requests, _ = run_calls(1, timeout=0.5, hang_rate=1.0)
+    assert outcomes == ["LLMTimeoutError"]
+    assert 1 < requests <= Config.LLM_MAX_RETRIES + 1
+
+def test_breaker_half_open_trial_closes_it(monkeypatch):
+    monkeypatch.setattr(Config, "LLM_BREAKER_COOLDOWN_SECONDS", 0)
+    gateway = LLMGateway()
+    gateway.breaker.record_failure()
+    gateway.breaker.record_failure()
+    assert gateway.breaker.state == "half-open"
+
+    async def ok():
+        return "done"
+
+    assert asyncio.run(gateway.call(ok)) == "done"
+    assert gateway.breaker.state == "closed"